@@ -26,6 +26,13 @@ Fast HTML parser module written in C with the following features:
   A reset() brings the parser back to its initial state, throwing away all
   buffered data.
 
+- Thread-safe
+  Parser objects do not share any state, so each thread can parse its
+  own documents with its own parser object in parallel. The GIL is
+  released while copying and compacting the scanner buffers.
+  Using one parser object from several threads at once raises a
+  RuntimeError.
+
 - Coping with HTML syntax errors
   The parser recognizes as much as it can and passes the rest
   of the data as TEXT tokens.
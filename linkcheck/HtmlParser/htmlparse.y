@@ -121,8 +121,25 @@ typedef struct {
     PyObject* doctype;
     UserData* userData;
     void* scanner;
+    /* flag set while feed(), flush() or reset() is running */
+    int busy;
 } parser_object;
 
+/* Parser objects share no state, so different threads can parse
+   with their own parser objects in parallel. A single parser object
+   must not be used by two threads at once. Since Python code runs
+   during parsing (and the GIL is released while copying buffers) this
+   is checked here instead of corrupting the scanner buffers. */
+#define ENTER_PARSER(self) \
+    if ((self)->busy) { \
+        PyErr_SetString(PyExc_RuntimeError, "parser object is already in use"); \
+        return NULL; \
+    } \
+    (self)->busy = 1
+
+#define LEAVE_PARSER(self) \
+    (self)->busy = 0
+
 /* use Pythons memory management */
 #define YYMALLOC PyMem_Malloc
 #define YYFREE PyMem_Free
@@ -525,6 +542,7 @@ static PyObject* parser_new (PyTypeObject* type, PyObject* args, PyObject* kwds)
     self->userData->exc_val = NULL;
     self->userData->exc_tb = NULL;
     self->scanner = NULL;
+    self->busy = 0;
     if (htmllexInit(&(self->scanner), self->userData)!=0) {
         Py_DECREF(self->handler);
         Py_DECREF(self);
@@ -596,15 +614,7 @@ static void parser_dealloc (parser_object* self) {
 
 
 /* feed a chunk of data to the parser */
-static PyObject* parser_feed (parser_object* self, PyObject* args) {
-    /* set up the parse string */
-    int slen = 0;
-    char* s = NULL;
-    if (!PyArg_ParseTuple(args, "t#", &s, &slen)) {
-	PyErr_SetString(PyExc_TypeError, "string arg required");
-	return NULL;
-    }
-    /* parse */
+static PyObject* _parser_feed (parser_object* self, const char* s, int slen) {
     if (htmllexStart(self->scanner, self->userData, s, slen)!=0) {
 	PyErr_SetString(PyExc_MemoryError, "could not start scanner");
  	return NULL;
@@ -627,13 +637,25 @@ static PyObject* parser_feed (parser_object* self, PyObject* args) {
 }
 
 
+static PyObject* parser_feed (parser_object* self, PyObject* args) {
+    /* set up the parse string */
+    int slen = 0;
+    char* s = NULL;
+    PyObject* res;
+    if (!PyArg_ParseTuple(args, "t#", &s, &slen)) {
+	PyErr_SetString(PyExc_TypeError, "string arg required");
+	return NULL;
+    }
+    ENTER_PARSER(self);
+    res = _parser_feed(self, s, slen);
+    LEAVE_PARSER(self);
+    return res;
+}
+
+
 /* flush all parser buffers */
-static PyObject* parser_flush (parser_object* self, PyObject* args) {
+static PyObject* _parser_flush (parser_object* self) {
     int res = 0;
-    if (!PyArg_ParseTuple(args, "")) {
-	PyErr_SetString(PyExc_TypeError, "no args required");
-        return NULL;
-    }
     /* reset parser variables */
     CLEAR_BUF(self->userData->tmp_buf);
     Py_CLEAR(self->userData->tmp_tag);
@@ -643,13 +665,14 @@ static PyObject* parser_flush (parser_object* self, PyObject* args) {
     self->userData->bufpos = 0;
     if (strlen(self->userData->buf)) {
         int error = 0;
-        int i;
+        size_t i, buflen;
        	PyObject* callback = NULL;
         PyObject* result = NULL;
         const char* enc;
         PyObject* s;
+        buflen = strlen(self->userData->buf);
         /* set line, col */
-        for (i=0; i<strlen(self->userData->buf); ++i) {
+        for (i=0; i<buflen; ++i) {
             if (self->userData->buf[i] == '\n') {
                 ++(self->userData->lineno);
                 self->userData->column = 1;
@@ -658,7 +681,7 @@ static PyObject* parser_flush (parser_object* self, PyObject* args) {
         }
         enc = PyBytes_AsString(self->encoding);
         s = PyUnicode_Decode(self->userData->buf,
-               (Py_ssize_t)strlen(self->userData->buf), enc, "ignore");
+               (Py_ssize_t)buflen, enc, "ignore");
         /* reset buffer */
         CLEAR_BUF(self->userData->buf);
         if (s == NULL) { error = 1; goto finish_flush; }
@@ -689,6 +712,19 @@ static PyObject* parser_flush (parser_object* self, PyObject* args) {
 }
 
 
+static PyObject* parser_flush (parser_object* self, PyObject* args) {
+    PyObject* res;
+    if (!PyArg_ParseTuple(args, "")) {
+	PyErr_SetString(PyExc_TypeError, "no args required");
+        return NULL;
+    }
+    ENTER_PARSER(self);
+    res = _parser_flush(self);
+    LEAVE_PARSER(self);
+    return res;
+}
+
+
 /* return the current parser line number */
 static PyObject* parser_lineno (parser_object* self, PyObject* args) {
     if (!PyArg_ParseTuple(args, "")) {
@@ -766,6 +802,10 @@ static PyObject* parser_reset (parser_object* self, PyObject* args) {
 	PyErr_SetString(PyExc_TypeError, "no args required");
 	return NULL;
     }
+    if (self->busy) {
+        PyErr_SetString(PyExc_RuntimeError, "parser object is already in use");
+        return NULL;
+    }
     if (htmllexDestroy(self->scanner)!=0) {
         PyErr_SetString(PyExc_MemoryError, "could not destroy scanner data");
         return NULL;
@@ -791,7 +831,8 @@ static PyObject* parser_reset (parser_object* self, PyObject* args) {
 }
 
 
-/* set the debug level, if its >0, debugging is on, =0 means off */
+/* set the debug level, if its >0, debugging is on, =0 means off.
+   Note that the bison debug flag is global for all parser objects. */
 static PyObject* parser_debug (parser_object* self, PyObject* args) {
     int debug;
     if (!PyArg_ParseTuple(args, "i", &debug)) {
@@ -0,0 +1,128 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Record the progress of a check in an append-only file, so that an
+interrupted check can be resumed.
+
+The file is a sequence of pickled records:
+- ("url", cache key, keyword arguments of get_url_from()) for each
+  queued URL
+- ("result", cache key, result) for each logged URL
+"""
+import collections
+import os
+import pickle
+import time
+from .. import log, LOG_CACHE
+from ..decorators import synchronized
+from ..lock import get_lock
+
+
+# lock object
+checkpoint_lock = get_lock("checkpoint_lock")
+
+# number of seconds after which written records are flushed to disk
+FLUSH_INTERVAL = 10
+
+
+def get_url_args (url_data):
+    """Get the keyword arguments of get_url_from() to rebuild given
+    URL data."""
+    return dict(base_url=url_data.base_url,
+                recursion_level=url_data.recursion_level,
+                parent_url=url_data.parent_url,
+                base_ref=url_data.base_ref,
+                line=url_data.line,
+                column=url_data.column,
+                page=url_data.page,
+                name=url_data.name,
+                extern=url_data.extern)
+
+
+def read_checkpoint (filename):
+    """Read the records of a checkpoint file. A truncated last record
+    of a killed check is ignored.
+    @return: pending URLs as an ordered dictionary {cache key ->
+      keyword arguments of get_url_from()}, and the results of logged
+      URLs as an ordered dictionary {cache key -> list of results}
+    @rtype: tuple (OrderedDict, OrderedDict)
+    """
+    pending = collections.OrderedDict()
+    logged = collections.OrderedDict()
+    with open(filename, "rb") as fd:
+        while True:
+            try:
+                kind, key, value = pickle.load(fd)
+            except EOFError:
+                break
+            except Exception as msg:
+                log.warn(LOG_CACHE, "ignoring truncated checkpoint record"
+                         " in %s: %s", filename, msg)
+                break
+            if kind == "url":
+                if key not in logged:
+                    pending[key] = value
+            elif kind == "result":
+                pending.pop(key, None)
+                logged.setdefault(key, []).append(value)
+    return pending, logged
+
+
+class Checkpoint (object):
+    """
+    Thread-safe writer of checkpoint records.
+    """
+
+    def __init__ (self, filename):
+        """Open given file for appending records."""
+        self.filename = os.path.expanduser(filename)
+        self.fd = open(self.filename, "ab")
+        self.flushed = time.time()
+
+    @synchronized(checkpoint_lock)
+    def add_url (self, url_data):
+        """Record a queued URL."""
+        self._write(("url", url_data.cache_url, get_url_args(url_data)))
+
+    @synchronized(checkpoint_lock)
+    def add_result (self, key, result):
+        """Record a logged result."""
+        self._write(("result", key, result))
+
+    def _write (self, record):
+        """Write a record and flush the file after FLUSH_INTERVAL
+        seconds. Not thread-safe!"""
+        if self.fd is None:
+            return
+        pickle.dump(record, self.fd, 2)
+        if time.time() - self.flushed >= FLUSH_INTERVAL:
+            self._flush()
+
+    def _flush (self):
+        """Flush written records to disk. Not thread-safe!"""
+        self.fd.flush()
+        os.fsync(self.fd.fileno())
+        self.flushed = time.time()
+
+    @synchronized(checkpoint_lock)
+    def close (self):
+        """Flush all records and close the file."""
+        if self.fd is None:
+            return
+        self._flush()
+        self.fd.close()
+        self.fd = None
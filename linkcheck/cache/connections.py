@@ -0,0 +1,175 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+HTTP connections shared by all checker threads.
+
+Each checker thread keeps its own request session with its own cookies
+and authentication, but all sessions send their requests over the
+connection pools of one transport adapter. The adapter keeps one pool
+per (scheme, host, port) and one pool manager per proxy. The pools never
+block: when all kept connections to a host are in use, a new connection
+is opened and closed again after its request.
+"""
+import time
+import threading
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, \
+    HTTPSConnectionPool
+from ..decorators import synchronized
+from ..lock import get_lock
+
+# lock object
+stats_lock = get_lock("connection_stats_lock")
+
+# maximum number of hosts whose connections are kept open
+MaxHostPools = 100
+
+
+class ConnectionStats (object):
+    """Thread-safe counters of connection reuse."""
+
+    def __init__ (self):
+        """Initialize all counters with zero."""
+        # number of requests sent over an open connection
+        self.hits = 0
+        # number of requests that needed a new connection
+        self.misses = 0
+        # number of connections closed after being idle too long
+        self.evictions = 0
+        # number of TLS handshakes
+        self.handshakes = 0
+
+    @synchronized(stats_lock)
+    def add (self, name):
+        """Increase the counter with given name by one."""
+        setattr(self, name, getattr(self, name) + 1)
+
+    @synchronized(stats_lock)
+    def get_stats (self):
+        """Return dictionary with all counters."""
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, handshakes=self.handshakes)
+
+
+class SharedPoolMixin (object):
+    """Count connection reuse of an urllib3 connection pool and close
+    connections that were idle for too long. Subclasses set the
+    stats and idle_timeout class attributes."""
+
+    stats = None
+    idle_timeout = None
+
+    def _get_conn (self, timeout=None):
+        """Get a connection and update the counters. When the pool is
+        exhausted a new connection is returned."""
+        conn = super(SharedPoolMixin, self)._get_conn(timeout=timeout)
+        if getattr(conn, "sock", None) is not None:
+            idle = time.time() - getattr(conn, "idle_since", 0)
+            if idle > self.idle_timeout:
+                conn.close()
+                self.stats.add("evictions")
+        if getattr(conn, "sock", None) is not None:
+            self.stats.add("hits")
+        else:
+            self.stats.add("misses")
+        return conn
+
+    def _put_conn (self, conn):
+        """Remember when the connection got idle and put it back
+        into the pool. Connections beyond the pool size are closed."""
+        if conn is not None:
+            if self.pool is not None and self.pool.full():
+                conn.close()
+                return
+            conn.idle_since = time.time()
+        super(SharedPoolMixin, self)._put_conn(conn)
+
+    def _validate_conn (self, conn):
+        """Count handshakes of new HTTPS connections."""
+        if self.scheme == "https" and getattr(conn, "sock", None) is None:
+            self.stats.add("handshakes")
+        super(SharedPoolMixin, self)._validate_conn(conn)
+
+
+class SharedAdapter (HTTPAdapter):
+    """Transport adapter mounted in the request sessions of all checker
+    threads."""
+
+    def __init__ (self, pool_classes, maxsize):
+        """Initialize the adapter with non-blocking pools keeping
+        at most maxsize connections."""
+        self.pool_classes = pool_classes
+        self.proxy_lock = threading.Lock()
+        super(SharedAdapter, self).__init__(pool_connections=MaxHostPools,
+            pool_maxsize=maxsize, pool_block=False)
+
+    def init_poolmanager (self, *args, **kwargs):
+        """Create the pool manager with the shared pool classes."""
+        super(SharedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for (self, proxy, **proxy_kwargs):
+        """Return the pool manager for given proxy. SOCKS proxies
+        use their own pool classes."""
+        with self.proxy_lock:
+            manager = super(SharedAdapter, self).proxy_manager_for(proxy,
+                **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+    def close (self):
+        """Keep the connections open when one session gets closed.
+        Use clear() to close all connections."""
+        pass
+
+    def clear (self):
+        """Close all connections."""
+        super(SharedAdapter, self).close()
+
+
+class ConnectionPool (object):
+    """HTTP connection pools shared by the request sessions of all
+    checker threads."""
+
+    def __init__ (self, maxsize, idle_timeout):
+        """Initialize the adapter. At most maxsize connections to each
+        host are kept open, and connections idle for more than idle_timeout
+        seconds are closed. Requests never wait for a free connection."""
+        self.stats = ConnectionStats()
+        attrs = dict(stats=self.stats, idle_timeout=idle_timeout)
+        pool_classes = dict(
+            http=type("SharedHTTPConnectionPool",
+                      (SharedPoolMixin, HTTPConnectionPool), attrs),
+            https=type("SharedHTTPSConnectionPool",
+                       (SharedPoolMixin, HTTPSConnectionPool), attrs),
+        )
+        self.adapter = SharedAdapter(pool_classes, maxsize)
+
+    def mount (self, session):
+        """Send HTTP and HTTPS requests of given session over the
+        shared connections."""
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+
+    def get_stats (self):
+        """Return dictionary with connection reuse counters."""
+        return self.stats.get_stats()
+
+    def clear (self):
+        """Close all connections."""
+        self.adapter.clear()
@@ -0,0 +1,166 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Store check results in a SQLite database, so that later runs can
+reuse or revalidate them.
+"""
+import collections
+import os
+import pickle
+import sqlite3
+import time
+from .. import log, LOG_CACHE
+from ..decorators import synchronized
+from ..lock import get_lock
+
+
+# lock object
+disk_cache_lock = get_lock("disk_cache_lock")
+
+# number of stored results after which they are committed
+COMMIT_INTERVAL = 1000
+
+# version of the database layout; other versions are discarded
+SCHEMA_VERSION = 2
+
+# A stored check result of a valid URL with the check time, the links
+# found in the URL content (or None if the content was not parsed), the
+# HTTP validators ETag and Last-Modified (or None) and the hash of the
+# parsed content (or None).
+StoredResult = collections.namedtuple("StoredResult",
+    "checked result links etag last_modified content_hash")
+
+
+class DiskCache (object):
+    """
+    Thread-safe persistent cache of UrlData.to_wire() results.
+    format: {cache key (string) -> (check time, valid, result, links,
+             etag, last modified, content hash)}
+    """
+
+    def __init__ (self, filename, max_age):
+        """Open or create the database in given file. Stored results
+        are reused for max_age seconds."""
+        filename = os.path.expanduser(filename)
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.filename = filename
+        self.max_age = max_age
+        # the connection is shared by all checker threads
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS results")
+            self.connection.execute("PRAGMA user_version=%d" % SCHEMA_VERSION)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, checked REAL NOT NULL,"
+            " valid INTEGER NOT NULL, result BLOB NOT NULL, links BLOB,"
+            " etag TEXT, lastmodified TEXT, contenthash TEXT)")
+        self.connection.commit()
+        self.uncommitted = 0
+        self.hits = self.misses = 0
+
+    @synchronized(disk_cache_lock)
+    def get_entry (self, key):
+        """Return the StoredResult of a valid URL, or None if not found."""
+        if self.connection is None:
+            return None
+        row = self.connection.execute("SELECT checked, result, links, etag,"
+            " lastmodified, contenthash FROM results WHERE key=? AND valid=1",
+            (key,)).fetchone()
+        if row is not None:
+            try:
+                result = pickle.loads(bytes(row[1]))
+                links = None
+                if row[2] is not None:
+                    links = pickle.loads(bytes(row[2]))
+                self.hits += 1
+                return StoredResult(row[0], result, links, row[3], row[4],
+                                    row[5])
+            except Exception as msg:
+                # stored by an incompatible version
+                log.debug(LOG_CACHE, "could not load cached result of %r: %s",
+                          key, msg)
+        self.misses += 1
+        return None
+
+    def is_fresh (self, entry):
+        """Check if the stored result has been checked less than max_age
+        seconds ago."""
+        return time.time() - entry.checked <= self.max_age
+
+    @synchronized(disk_cache_lock)
+    def get_links (self, key, content_hash):
+        """Return the links stored for the URL content with given hash,
+        or None if the content has changed or was not parsed."""
+        if self.connection is None:
+            return None
+        row = self.connection.execute("SELECT links FROM results"
+            " WHERE key=? AND contenthash=? AND links IS NOT NULL",
+            (key, content_hash)).fetchone()
+        if row is not None:
+            try:
+                return pickle.loads(bytes(row[0]))
+            except Exception as msg:
+                log.debug(LOG_CACHE, "could not load cached links of %r: %s",
+                          key, msg)
+        return None
+
+    @synchronized(disk_cache_lock)
+    def add_result (self, key, result, links=None, etag=None,
+                    last_modified=None, content_hash=None):
+        """Store result object with given key and the current time."""
+        if self.connection is None:
+            return
+        data = sqlite3.Binary(pickle.dumps(result, 2))
+        if links is not None:
+            links = sqlite3.Binary(pickle.dumps(links, 2))
+        self.connection.execute("INSERT OR REPLACE INTO results (key,"
+            " checked, valid, result, links, etag, lastmodified, contenthash)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (key, time.time(),
+            int(result.valid), data, links, etag, last_modified,
+            content_hash))
+        self._changed()
+
+    @synchronized(disk_cache_lock)
+    def renew (self, key):
+        """Set the check time of the stored result to the current time."""
+        if self.connection is None:
+            return
+        self.connection.execute("UPDATE results SET checked=? WHERE key=?",
+                                (time.time(), key))
+        self._changed()
+
+    def _changed (self):
+        """Commit after COMMIT_INTERVAL changes. Not thread-safe!"""
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    @synchronized(disk_cache_lock)
+    def close (self):
+        """Commit the stored results and close the database. Checker
+        threads still running afterwards find and store nothing."""
+        if self.connection is None:
+            return
+        log.debug(LOG_CACHE, "disk cache %s: %d hits, %d misses",
+                  self.filename, self.hits, self.misses)
+        self.connection.commit()
+        self.connection.close()
+        self.connection = None
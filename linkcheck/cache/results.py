@@ -17,6 +17,10 @@
 """
 Cache check results.
 """
+import collections
+import hashlib
+import struct
+import sys
 from ..decorators import synchronized
 from ..lock import get_lock
 
@@ -25,45 +29,105 @@ from ..lock import get_lock
 cache_lock = get_lock("results_cache_lock")
 
 
+def get_key_hash (key):
+    """Return a 64-bit integer hash of the given cache key."""
+    if not isinstance(key, bytes):
+        key = key.encode("utf-8")
+    return struct.unpack("<q", hashlib.md5(key).digest()[:8])[0]
+
+
+def get_result_size (result):
+    """Estimate the memory size of a result object in bytes."""
+    size = sys.getsizeof(result)
+    for attr in getattr(result, "__slots__", ()):
+        value = getattr(result, attr, None)
+        size += sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
 class ResultCache(object):
     """
     Thread-safe cache of UrlData.to_wire() results.
-    the cache is limited in size since we rather recheck the same URL
-    multiple times instead of running out of memory.
+    All cache keys are stored as 64-bit hashes in a set of seen URLs
+    to prevent checking the same URL twice. The keys of queued links
+    are stored the same way, so that duplicate links are skipped before
+    their URL is built. Only the most recently
+    used results are stored, since we rather recheck the same URL
+    instead of running out of memory.
     format: {cache key (string) -> result (UrlData.towire())}
     """
 
-    def __init__(self, max_size=100000):
-        """Initialize result cache."""
-        # mapping {URL -> cached result}
-        self.cache = {}
+    def __init__(self, max_size=100000, max_bytes=None):
+        """Initialize result cache storing at most max_size results with
+        an estimated memory size of at most max_bytes."""
+        # set of hashed cache keys
+        self.seen = set()
+        # set of hashed keys of queued links
+        self.seen_links = set()
+        # mapping {URL -> cached result} in least recently used order
+        self.cache = collections.OrderedDict()
         self.max_size = max_size
+        self.max_bytes = max_bytes
+        # estimated memory size of the cached results
+        self.size = 0
+        # mapping {URL -> estimated memory size of cached result}
+        self.sizes = {}
 
     @synchronized(cache_lock)
     def get_result(self, key):
         """Return cached result or None if not found."""
-        return self.cache.get(key)
+        result = self.cache.pop(key, None)
+        if result is not None:
+            # move to the end of the least recently used order
+            self.cache[key] = result
+        return result
 
     @synchronized(cache_lock)
     def add_result(self, key, result):
         """Add result object to cache with given key.
-        The request is ignored when the cache is already full or the key
-        is None.
+        The key is remembered as seen, and the least recently used results
+        are removed when the cache is full. A result of None only
+        marks the key as seen. The request is ignored when the key is None.
         """
-        if len(self.cache) > self.max_size:
+        if key is None:
             return
-        if key is not None:
-            self.cache[key] = result
+        self.seen.add(get_key_hash(key))
+        if result is None:
+            return
+        if key in self.cache:
+            self._remove(key)
+        self.cache[key] = result
+        self.sizes[key] = get_result_size(result)
+        self.size += self.sizes[key]
+        while self.cache and (len(self.cache) > self.max_size or
+              (self.max_bytes is not None and self.size > self.max_bytes)):
+            self._remove(next(iter(self.cache)))
+
+    def _remove(self, key):
+        """Remove the result of given key. Not thread-safe!"""
+        del self.cache[key]
+        self.size -= self.sizes.pop(key)
 
     def has_result(self, key):
         """Non-thread-safe function for fast containment checks."""
-        return key in self.cache
+        return key is not None and get_key_hash(key) in self.seen
+
+    @synchronized(cache_lock)
+    def add_link(self, key):
+        """Remember the key of a queued link."""
+        self.seen_links.add(get_key_hash(key))
+
+    def has_link(self, key):
+        """Non-thread-safe function for fast containment checks."""
+        return get_key_hash(key) in self.seen_links
 
     def has_non_empty_result(self, key):
         """Non-thread-safe function for fast containment checks."""
         return self.cache.get(key)
 
     def __len__(self):
-        """Get number of cached elements. This is not thread-safe and is
+        """Get number of seen URLs. This is not thread-safe and is
         likely to change before the returned value is used."""
-        return len(self.cache)
+        return len(self.seen)
@@ -65,9 +65,19 @@ class RobotsTxt (object):
         rp.read()
         with cache_lock:
             self.cache[roboturl] = rp
+        self.add_crawl_delay(rp, url_data)
         self.add_sitemap_urls(rp, url_data, roboturl)
         return rp.can_fetch(self.useragent, url_data.url)
 
+    def add_crawl_delay(self, rp, url_data):
+        """Throttle requests to the host with the crawl delay."""
+        delay = rp.get_crawldelay(self.useragent)
+        if delay <= 0:
+            return
+        host = url_data.get_throttled_host()
+        if host is not None:
+            url_data.aggregate.urlqueue.set_host_delay(host, delay)
+
     def add_sitemap_urls(self, rp, url_data, roboturl):
         """Add sitemap URLs to queue."""
         if not rp.sitemap_urls or not url_data.allows_simple_recursion():
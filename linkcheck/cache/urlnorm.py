@@ -0,0 +1,69 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Cache normed URLs, since the same links are found on many pages.
+"""
+import collections
+from ..decorators import synchronized
+from ..lock import get_lock
+
+
+# lock object
+urlnorm_lock = get_lock("urlnorm_cache_lock")
+
+# maximum number of cached URLs
+MaxSize = 10000
+
+
+class UrlNormCache (object):
+    """
+    Thread-safe cache of normed URLs. Only the most recently used
+    URLs are stored.
+    format: {(base URL or None, URL, encoding) -> (normed URL, is_idn)}
+    """
+
+    def __init__ (self, max_size=MaxSize):
+        """Initialize the cache storing at most max_size URLs."""
+        # mapping {key -> normed URL} in least recently used order
+        self.cache = collections.OrderedDict()
+        self.max_size = max_size
+        self.hits = self.misses = 0
+
+    @synchronized(urlnorm_lock)
+    def get (self, key):
+        """Return the cached value of given key or None if not found."""
+        value = self.cache.pop(key, None)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            # move to the end of the least recently used order
+            self.cache[key] = value
+        return value
+
+    @synchronized(urlnorm_lock)
+    def add (self, key, value):
+        """Add a normed URL and remove the least recently used URLs
+        when the cache is full."""
+        self.cache[key] = value
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    @synchronized(urlnorm_lock)
+    def get_stats (self):
+        """Return dictionary with hit and miss counters."""
+        return dict(hits=self.hits, misses=self.misses)
@@ -17,10 +17,16 @@
 """
 Handle a queue of URLs to check.
 """
-import threading
 import collections
+import threading
+import heapq
+import itertools
+import pickle
+import random
+import tempfile
 from time import time as _time
 from .. import log, LOG_CACHE
+from .checkpoint import get_url_args
 
 
 class Timeout(Exception):
@@ -32,17 +38,102 @@ class Empty(Exception):
     pass
 
 
-NUM_PUTS_CLEANUP = 10000
+# maximum number of seconds between two requests to a host
+MAX_HOST_DELAY = 60
+
+# maximum factor to slow down requests to an overloaded host
+MAX_HOST_BACKOFF = 16
+
+# minimum factor of the random wait time part for fast hosts
+MIN_HOST_SPEEDUP = 0.1
+
+
+# A queued URL stored as cache key and pickled record.
+Record = collections.namedtuple("Record", "key data")
+
+
+def is_rebuildable (url_data):
+    """Check if given URL data can be rebuilt from its record, ie. the
+    constructor added no result, warnings or infos. Start URLs are not
+    rebuilt since their constructor adds an intern pattern."""
+    return url_data.recursion_level > 0 and not (url_data.has_result or
+        url_data.warnings or url_data.info)
+
+
+def get_record (url_data):
+    """Get a pickled record of the class and constructor arguments of
+    given URL data."""
+    return pickle.dumps((url_data.__class__, get_url_args(url_data)), 2)
+
 
 class UrlQueue (object):
     """A queue supporting several consumer tasks. The task_done() idea is
-    from the Python 2.5 implementation of Queue.Queue()."""
+    from the Python 2.5 implementation of Queue.Queue().
+
+    The queued URLs are kept in a heap of [class, recursion level, host
+    rank, sequence number, url_data, host] entries. URLs with a result come first, then URLs with a lower
+    recursion level; URLs of the same level are handed out round-robin
+    over their hosts. A queued URL whose result got cached meanwhile,
+    for example as redirect alias, is moved to the front by promote().
+
+    URLs whose requests to a host are throttled wait in a heap per host.
+    A heap of host ready times lets get() hand out the next URL of a host
+    that may be contacted, so the consumers never sleep for a host while
+    URLs of other hosts are waiting.
 
-    def __init__ (self, max_allowed_urls=None):
-        """Initialize the queue state and task counters."""
+    With a window, queued URLs are stored as pickled records of their
+    class and constructor arguments, and rebuilt when they are handed
+    out. URLs beyond the window wait in a temporary file per recursion
+    level; the window is refilled from the lowest level first, and each
+    file in the order its URLs were queued."""
+
+    def __init__ (self, max_allowed_urls=None, max_requests_per_second=None,
+                  checkpoint=None, window=None):
+        """Initialize the queue state and task counters. Without
+        max_requests_per_second the requests to a host are not throttled.
+        Queued URLs are recorded in the given checkpoint. With a window
+        at most that many queued URLs are kept in memory."""
         # Note: don't put a maximum size on the queue since it would
         # lead to deadlocks when all worker threads called put().
-        self.queue = collections.deque()
+        self.queue = []
+        # number of URLs in self.queue
+        self.num_urls = 0
+        # {host -> heap of URLs waiting for that host}
+        self.host_queues = {}
+        # heap of (ready time, host) for each host with waiting URLs
+        self.host_heap = []
+        # {host -> time of the next allowed request}
+        self.host_times = {}
+        # number of URLs in self.host_queues
+        self.num_host_urls = 0
+        # {host -> minimum seconds between requests}
+        self.host_delays = {}
+        # {host -> [average response time, wait time factor]}
+        self.host_stats = {}
+        # {cache key -> queue entry} of URLs without result
+        self.entries = {}
+        # {host -> number of queued URLs} for the round-robin order
+        self.host_ranks = {}
+        # sequence numbers of the queue entries
+        self.counter = itertools.count()
+        if window is not None and window <= 0:
+            raise ValueError("Non-positive queue window: %d" % window)
+        self.window = window
+        # aggregate of the queued URLs, needed to rebuild records
+        self.aggregate = None
+        # {recursion level -> [temporary file, position of the next URL
+        # to read, number of unread URLs]} with the URLs beyond the window
+        self.spill_files = {}
+        # {cache key -> (recursion level, file position)} of spilled URLs
+        self.spilled = {}
+        # number of URLs in self.spilled
+        self.num_spilled = 0
+        if max_requests_per_second is not None:
+            self.wait_time_min = 1.0 / max_requests_per_second
+            self.wait_time_max = max(self.wait_time_min + 0.5, 0.5)
+        else:
+            self.wait_time_min = self.wait_time_max = 0.0
+        self.max_requests_per_second = max_requests_per_second
         # mutex must be held whenever the queue is mutating.  All methods
         # that acquire mutex must release it before returning.  mutex
         # is shared between the two conditions, so acquiring and
@@ -61,12 +152,16 @@ class UrlQueue (object):
         if max_allowed_urls is not None and max_allowed_urls <= 0:
             raise ValueError("Non-positive number of allowed URLs: %d" % max_allowed_urls)
         self.max_allowed_urls = max_allowed_urls
-        self.num_puts = 0
+        self.checkpoint = checkpoint
 
     def qsize (self):
         """Return the approximate size of the queue (not reliable!)."""
         with self.mutex:
-            return len(self.queue)
+            return self._qsize()
+
+    def _qsize (self):
+        """Return the number of queued URLs. Not thread-safe!"""
+        return self.num_urls + self.num_host_urls + self.num_spilled
 
     def empty (self):
         """Return True if the queue is empty, False otherwise.
@@ -78,7 +173,8 @@ class UrlQueue (object):
     def _empty (self):
         """Return True if the queue is empty, False otherwise.
         Not thread-safe!"""
-        return not self.queue
+        return not self.num_urls and not self.num_host_urls and \
+            not self.num_spilled
 
     def get (self, timeout=None):
         """Get first not-in-progress url from the queue and
@@ -89,21 +185,172 @@ class UrlQueue (object):
 
     def _get (self, timeout):
         """Non thread-safe utility function of self.get() doing the real
-        work."""
+        work. Waiting for a host releases the mutex."""
         if timeout is None:
-            while self._empty():
-                self.not_empty.wait()
+            endtime = None
         else:
             if timeout < 0:
                 raise ValueError("'timeout' must be a positive number")
             endtime = _time() + timeout
-            while self._empty():
+        while True:
+            url_data, wait = self._get_ready()
+            if url_data is not None:
+                break
+            if endtime is not None:
                 remaining = endtime - _time()
                 if remaining <= 0.0:
                     raise Empty()
-                self.not_empty.wait(remaining)
+                if wait is None or remaining < wait:
+                    wait = remaining
+            self.not_empty.wait(wait)
         self.in_progress += 1
-        return self.queue.popleft()
+        return url_data
+
+    def _get_ready (self):
+        """Return tuple (url_data, None) with the next URL that can be
+        checked now, else (None, seconds until a host gets ready) or
+        (None, None) if the queue is empty. Not thread-safe!"""
+        self._refill()
+        self._remove_stale(self.queue)
+        if self.queue and self.queue[0][0] == 0:
+            return self._pop(self.queue), None
+        now = _time()
+        while self.host_heap:
+            due_time, host = self.host_heap[0]
+            if due_time > now:
+                break
+            heapq.heappop(self.host_heap)
+            if self.host_times.get(host, due_time) > due_time:
+                # a request outside the queue moved the ready time
+                heapq.heappush(self.host_heap, (self.host_times[host], host))
+                continue
+            host_queue = self.host_queues[host]
+            self._remove_stale(host_queue)
+            if not host_queue:
+                # all URLs of this host have been promoted
+                del self.host_queues[host]
+                continue
+            url_data = self._pop(host_queue)
+            self.num_host_urls -= 1
+            self._reserve_host_time(host, now)
+            if host_queue:
+                heapq.heappush(self.host_heap, (self.host_times[host], host))
+            else:
+                del self.host_queues[host]
+            # the first request of this URL does not need to wait anymore
+            url_data.host_throttled = True
+            return url_data, None
+        if self.queue:
+            return self._pop(self.queue), None
+        if self.host_heap:
+            return None, self.host_heap[0][0] - now
+        return None, None
+
+    def _pop (self, heap):
+        """Remove the first entry from given heap and return its URL.
+        Records are rebuilt. Not thread-safe!"""
+        url_data = heapq.heappop(heap)[4]
+        if heap is self.queue:
+            self.num_urls -= 1
+        if isinstance(url_data, Record):
+            self.entries.pop(url_data.key, None)
+            klass, kwargs = pickle.loads(url_data.data)
+            return klass(aggregate=self.aggregate, **kwargs)
+        if not url_data.has_result:
+            self.entries.pop(url_data.cache_url, None)
+        return url_data
+
+    @staticmethod
+    def _remove_stale (heap):
+        """Remove the entries of promoted URLs from the top of given heap.
+        Not thread-safe!"""
+        while heap and heap[0][4] is None:
+            heapq.heappop(heap)
+
+    def get_wait_time (self):
+        """Return the number of seconds until a queued URL can be checked,
+        or None if the queue is empty. The result is not reliable since
+        the queue could have been changed before it is returned."""
+        with self.mutex:
+            self._refill()
+            if self.num_urls:
+                return 0.0
+            if self.host_heap:
+                return max(0.0, self.host_heap[0][0] - _time())
+            return None
+
+    def reserve_host_time (self, host):
+        """Reserve the next request time for given host without waiting.
+        @return: number of seconds to wait before the request is sent
+        @rtype: float
+        """
+        with self.mutex:
+            now = _time()
+            return self._reserve_host_time(host, now) - now
+
+    def _reserve_host_time (self, host, now):
+        """Reserve the next request time for given host and return it.
+        Not thread-safe!"""
+        due_time = max(now, self.host_times.get(host, now))
+        if self.max_requests_per_second is not None:
+            self.host_times[host] = due_time + self._get_host_wait_time(host)
+        return due_time
+
+    def _get_host_wait_time (self, host):
+        """Get the number of seconds between two requests to given host.
+        Fast hosts wait only a part of the random time above wait_time_min,
+        so they never get more than max_requests_per_second requests.
+        Not thread-safe!"""
+        wait_time = random.uniform(self.wait_time_min, self.wait_time_max)
+        if host in self.host_stats:
+            latency, factor = self.host_stats[host]
+            if factor < 1:
+                wait_time = self.wait_time_min + \
+                    (wait_time - self.wait_time_min) * factor
+                wait_time = max(wait_time, latency)
+            else:
+                wait_time = min(max(wait_time, latency) * factor,
+                                MAX_HOST_DELAY)
+        return max(wait_time, self.host_delays.get(host, 0))
+
+    def set_host_delay (self, host, delay):
+        """Wait at least delay seconds between two requests to given host,
+        for example from a robots.txt Crawl-delay. The delay is limited
+        to MAX_HOST_DELAY seconds."""
+        with self.mutex:
+            self.host_delays[host] = min(delay, MAX_HOST_DELAY)
+
+    def add_host_response (self, host, latency, overloaded=False,
+                           retry_after=None):
+        """Adapt the wait time of given host to a response. Slow responses
+        increase the wait time. An overloaded host doubles its wait time
+        and gets no requests for retry_after seconds; each normal response
+        halves the wait time again. Responses faster than wait_time_min
+        shorten the wait time down to wait_time_min. Without
+        max_requests_per_second the responses are ignored."""
+        if self.max_requests_per_second is None:
+            return
+        with self.mutex:
+            now = _time()
+            if host not in self.host_stats:
+                self.host_stats[host] = [latency, 1.0]
+            stats = self.host_stats[host]
+            if overloaded:
+                stats[1] = min(max(stats[1], 1.0) * 2, MAX_HOST_BACKOFF)
+                if retry_after is None:
+                    retry_after = self._get_host_wait_time(host)
+                due_time = now + min(retry_after, MAX_HOST_DELAY)
+                self.host_times[host] = max(self.host_times.get(host, now),
+                                            due_time)
+            else:
+                # exponential moving average of the response times
+                stats[0] = 0.7 * stats[0] + 0.3 * latency
+                if stats[1] > 1:
+                    stats[1] = max(stats[1] / 2, 1.0)
+                elif latency < self.wait_time_min:
+                    stats[1] = max(stats[1] * 0.8, MIN_HOST_SPEEDUP)
+                else:
+                    stats[1] = 1.0
 
     def put (self, item):
         """Put an item into the queue.
@@ -123,37 +370,132 @@ class UrlQueue (object):
         if cache.has_result(key):
             return
         if url_data.has_result:
-            self.queue.appendleft(url_data)
+            # last in, first out like the URLs checked by the caller
+            self._push([0, 0, 0, -next(self.counter), url_data, None])
         else:
             assert key is not None, "no result for None key: %s" % url_data
             if self.max_allowed_urls is not None:
                 self.max_allowed_urls -= 1
-            self.num_puts += 1
-            if self.num_puts >= NUM_PUTS_CLEANUP:
-                self.cleanup()
-            self.queue.append(url_data)
+            host = url_data.get_throttled_host()
+            if self.window is not None and is_rebuildable(url_data):
+                self.aggregate = url_data.aggregate
+                item = Record(key, get_record(url_data))
+                if self._must_spill(url_data.recursion_level):
+                    self._spill((url_data.recursion_level, host, item))
+                else:
+                    self._add(url_data.recursion_level, host, item)
+            else:
+                self._add(url_data.recursion_level, host, url_data)
+        if self.checkpoint is not None and key is not None:
+            self.checkpoint.add_url(url_data)
         self.unfinished_tasks += 1
         cache.add_result(key, None)  # add none value to cache to prevent checking this url multiple times
 
-    def cleanup(self):
-        """Move cached elements to top."""
-        self.num_puts = 0
-        cached = []
-        for i, url_data in enumerate(self.queue):
-            key = url_data.cache_url
-            cache = url_data.aggregate.result_cache
-            if cache.has_non_empty_result(key):
-                cached.append(i)
-        for pos in cached:
-            self._move_to_top(pos)
-
-    def _move_to_top(self, pos):
-        """Move element at given position to top of queue."""
-        if pos > 0:
-            self.queue.rotate(-pos)
-            item = self.queue.popleft()
-            self.queue.rotate(pos)
-            self.queue.appendleft(item)
+    def _add (self, recursion_level, host, item):
+        """Add a queue entry for given URL data or record of a URL
+        without result. Not thread-safe!"""
+        rank = self.host_ranks.get(host, 0)
+        self.host_ranks[host] = rank + 1
+        if self.max_requests_per_second is None:
+            host = None
+        entry = [1, recursion_level, rank, next(self.counter), item, host]
+        if isinstance(item, Record):
+            self.entries[item.key] = entry
+        else:
+            self.entries[item.cache_url] = entry
+        self._push(entry)
+
+    def _must_spill (self, recursion_level):
+        """Check if a URL of given recursion level must wait in a
+        temporary file, ie. the window is full or URLs of the same or a
+        lower level are waiting there. Not thread-safe!"""
+        if self._qsize() - self.num_spilled >= self.window:
+            return True
+        return any(level <= recursion_level for level in self.spill_files)
+
+    def _spill (self, args):
+        """Append arguments of _add() to the temporary file of their
+        recursion level. Not thread-safe!"""
+        recursion_level, host, item = args
+        spill = self.spill_files.get(recursion_level)
+        if spill is None:
+            spill = self.spill_files[recursion_level] = \
+                [tempfile.TemporaryFile(), 0, 0]
+        spill[0].seek(0, 2)
+        self.spilled[item.key] = (recursion_level, spill[0].tell())
+        pickle.dump(args, spill[0], 2)
+        spill[2] += 1
+        self.num_spilled += 1
+
+    def _refill (self):
+        """Move URLs from the temporary files into the window, lowest
+        recursion level first. Promoted URLs are skipped.
+        Not thread-safe!"""
+        while self.num_spilled and \
+              self._qsize() - self.num_spilled < self.window:
+            recursion_level = min(self.spill_files)
+            spill = self.spill_files[recursion_level]
+            spill[0].seek(spill[1])
+            args = pickle.load(spill[0])
+            spill[1] = spill[0].tell()
+            spill[2] -= 1
+            if not spill[2]:
+                spill[0].close()
+                del self.spill_files[recursion_level]
+            if self.spilled.pop(args[2].key, None) is not None:
+                self.num_spilled -= 1
+                self._add(*args)
+        if not self.num_spilled:
+            self._clear_spill()
+
+    def _clear_spill (self):
+        """Remove the temporary files. Not thread-safe!"""
+        for spill in self.spill_files.values():
+            spill[0].close()
+        self.spill_files.clear()
+        self.spilled.clear()
+        self.num_spilled = 0
+
+    def _push (self, entry):
+        """Push queue entry in the heap of its host, or in the common
+        heap if it has no host. Not thread-safe!"""
+        host = entry[5]
+        if host is None:
+            heapq.heappush(self.queue, entry)
+            self.num_urls += 1
+            return
+        host_queue = self.host_queues.get(host)
+        if host_queue is None:
+            host_queue = self.host_queues[host] = []
+            due_time = self.host_times.get(host, 0)
+            heapq.heappush(self.host_heap, (due_time, host))
+        heapq.heappush(host_queue, entry)
+        self.num_host_urls += 1
+
+    def promote (self, key):
+        """Move the queued URL with given cache key to the front of
+        the queue since its result is cached now. The old heap entry
+        is marked as stale and removed when it reaches the top."""
+        with self.mutex:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                url_data = entry[4]
+                entry[4] = None
+                if entry[5] is None:
+                    self.num_urls -= 1
+                else:
+                    self.num_host_urls -= 1
+            elif key in self.spilled:
+                # read the record; _refill() skips it later
+                recursion_level, pos = self.spilled.pop(key)
+                spill_file = self.spill_files[recursion_level][0]
+                spill_file.seek(pos)
+                url_data = pickle.load(spill_file)[2]
+                self.num_spilled -= 1
+            else:
+                return
+            self._push([0, 0, 0, -next(self.counter), url_data, None])
+            self.not_empty.notify()
 
     def task_done (self, url_data):
         """
@@ -206,8 +548,14 @@ class UrlQueue (object):
     def do_shutdown (self):
         """Shutdown the queue by not accepting any more URLs."""
         with self.mutex:
-            unfinished = self.unfinished_tasks - len(self.queue)
-            self.queue.clear()
+            unfinished = self.unfinished_tasks - self._qsize()
+            del self.queue[:]
+            self.num_urls = 0
+            self.entries.clear()
+            self.host_queues.clear()
+            del self.host_heap[:]
+            self.num_host_urls = 0
+            self._clear_spill()
             if unfinished <= 0:
                 if unfinished < 0:
                     raise ValueError('shutdown is in error')
@@ -218,4 +566,4 @@ class UrlQueue (object):
     def status (self):
         """Get tuple (finished tasks, in progress, queue size)."""
         # no need to acquire self.mutex since the numbers are unreliable anyways.
-        return (self.finished_tasks, self.in_progress, len(self.queue))
+        return (self.finished_tasks, self.in_progress, self._qsize())
@@ -0,0 +1,137 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2005-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Charset detection of downloaded content.
+
+The encoding is determined without parsing the whole document, in this
+order:
+  - the charset given by the server (eg. in the Content-Type header)
+  - a byte order mark at the start of the content
+  - a <meta charset> or <meta http-equiv> tag or an XML declaration
+    in the first bytes of the content
+  - a byte-level heuristic: ASCII and UTF-8 are detected by decoding,
+    everything else is guessed by feeding the start of the content
+    to a charset detector
+"""
+import re
+import codecs
+try:
+    from chardet.universaldetector import UniversalDetector
+except ImportError:
+    has_chardet = False
+else:
+    has_chardet = True
+
+# Number of bytes searched for an encoding declaration.
+MaxSniffBytes = 4096
+# Number of bytes fed to the charset detector.
+MaxGuessBytes = 64*1024
+# Encoding used when no other encoding could be determined.
+DefaultEncoding = "iso-8859-1"
+
+# Byte order marks; the UTF-32 marks must be tested before UTF-16.
+_boms = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# matches both <meta charset="..."> and
+# <meta http-equiv="Content-Type" content="text/html; charset=...">
+_meta_charset_ro = re.compile(
+    br"""<meta[^>]+?charset\s*=\s*["']?\s*(?P<encoding>[-\w.:]+)""", re.I)
+_xml_encoding_ro = re.compile(
+    br"""^\s*<\?xml[^>]+?encoding\s*=\s*["'](?P<encoding>[-\w.:]+)""")
+
+
+def get_encoding_name(encoding):
+    """Return the given encoding name if Python knows a codec for it,
+    else None."""
+    if not encoding:
+        return None
+    if not isinstance(encoding, str) and isinstance(encoding, bytes):
+        # encoding declared in the content, on Python 3
+        encoding = encoding.decode("ascii")
+    try:
+        codecs.lookup(encoding)
+    except (LookupError, ValueError):
+        return None
+    return encoding.lower()
+
+
+def get_bom_encoding(data):
+    """Return the encoding of the byte order mark of data, or None."""
+    for bom, encoding in _boms:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def get_declared_encoding(data):
+    """Return the encoding declared in the start of data, or None."""
+    head = data[:MaxSniffBytes]
+    mo = _xml_encoding_ro.search(head) or _meta_charset_ro.search(head)
+    if mo is None:
+        return None
+    encoding = get_encoding_name(mo.group("encoding"))
+    if encoding is not None and encoding.startswith(("utf-16", "utf-32")):
+        # the declaration could be read as ASCII, so the document
+        # cannot be encoded in UTF-16 or UTF-32
+        encoding = "utf-8"
+    return encoding
+
+
+def guess_encoding(data):
+    """Guess the encoding of data which is not valid UTF-8."""
+    if not has_chardet:
+        return DefaultEncoding
+    detector = UniversalDetector()
+    for i in range(0, min(len(data), MaxGuessBytes), 4096):
+        detector.feed(data[i:i+4096])
+        if detector.done:
+            break
+    detector.close()
+    return get_encoding_name(detector.result["encoding"]) or DefaultEncoding
+
+
+def decode(data, charset=None):
+    """Decode content data to unicode.
+    @param data: the content
+    @ptype data: bytes
+    @param charset: charset given by the server, or None
+    @ptype charset: string or None
+    @return: tuple (text, encoding)
+    """
+    encoding = get_encoding_name(charset) or get_bom_encoding(data) or \
+        get_declared_encoding(data)
+    if encoding is not None:
+        text = data.decode(encoding, "replace")
+        if text.startswith(u"\ufeff"):
+            text = text[1:]
+        return text, encoding
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        encoding = guess_encoding(data)
+        return data.decode(encoding, "replace"), encoding
+    if len(text) == len(data):
+        encoding = "ascii"
+    else:
+        encoding = "utf-8"
+    return text, encoding
@@ -154,9 +154,8 @@ class FileUrl (urlbase.UrlBase):
             # of the base URL are removed first.
             # Otherwise the join function thinks the query is part of
             # the file name.
-            from .urlbase import url_norm
             # norm base url - can raise UnicodeError from url.idna_encode()
-            base_url, is_idn = url_norm(self.base_url, self.encoding)
+            base_url, is_idn = self.get_normed_url(None, self.base_url)
             urlparts = list(urlparse.urlsplit(base_url))
             # ignore query part for filesystem urls
             urlparts[3] = ''
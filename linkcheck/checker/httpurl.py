@@ -31,8 +31,7 @@ from io import BytesIO
 from .. import (log, LOG_CHECK, strformat, mimeutil,
     url as urlutil, LinkCheckerError, httputil)
 from . import (internpaturl, proxysupport)
-from ..HtmlParser import htmlsax
-from ..htmlutil import linkparse
+from ..parser import LinkStream, scan_html
 # import warnings
 from .const import WARN_HTTP_EMPTY_CONTENT
 from requests.sessions import REDIRECT_STATI
@@ -40,6 +39,8 @@ from requests.sessions import REDIRECT_STATI
 # assumed HTTP header encoding
 HEADER_ENCODING = "iso-8859-1"
 HTTP_SCHEMAS = ('http://', 'https://')
+# HEAD request status codes meaning that the server does not support HEAD
+HEAD_NOT_ALLOWED_STATI = (405, 501)
 
 # helper alias
 unicode_safe = strformat.unicode_safe
@@ -60,6 +61,10 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
         self.auth = None
         self.ssl_cipher = None
         self.ssl_cert = None
+        # set if the next request to this host has already been throttled
+        self.host_throttled = False
+        # stored result that is revalidated with a conditional request
+        self.stored_entry = None
 
     def allows_robots (self, url):
         """
@@ -80,23 +85,7 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
         """
         if not self.is_html():
             return True
-        # construct parser object
-        handler = linkparse.MetaRobotsFinder()
-        parser = htmlsax.parser(handler)
-        handler.parser = parser
-        if self.charset:
-            parser.encoding = self.charset
-        # parse
-        try:
-            parser.feed(self.get_raw_content())
-            parser.flush()
-        except linkparse.StopParse as msg:
-            log.debug(LOG_CHECK, "Stopped parsing: %s", msg)
-            pass
-        # break cyclic dependencies
-        handler.parser = None
-        parser.handler = None
-        return handler.follow
+        return scan_html(self).follow
 
     def add_size_info (self):
         """Get size of URL content from HTTP header."""
@@ -143,34 +132,106 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
         self.send_request(request)
         self._add_response_info()
         self.follow_redirections(request)
+        if request.method == "HEAD" and self.url_connection.status_code >= 400:
+            self.retry_with_get()
+        if self.url_connection.status_code == 304 and self.stored_entry:
+            log.debug(LOG_CHECK, "Stored result of %s is not modified", self.url)
+            self.not_modified = True
+            return
         self.check_response()
         if self.allows_simple_recursion():
             self.parse_header_links()
 
-    def build_request(self):
-        """Build a prepared request object."""
+    def retry_with_get(self):
+        """Request the current URL again with GET since the server
+        answered the HEAD request with an error. Remember hosts that
+        do not answer HEAD requests correctly."""
+        host = self.urlparts[1]
+        head_status = self.url_connection.status_code
+        log.debug(LOG_CHECK, "HEAD request failed with status %d, retry with GET", head_status)
+        self.close_connection()
+        request = self.build_request(method='GET')
+        self.send_request(request)
+        self._add_response_info()
+        if head_status in HEAD_NOT_ALLOWED_STATI or \
+           self.url_connection.status_code < 400:
+            log.debug(LOG_CHECK, "Send only GET requests to %s", host)
+            self.aggregate.disallow_head(host)
+        self.follow_redirections(request)
+
+    def get_request_method(self):
+        """Return HEAD if headrequests is enabled and the content of this
+        URL is not needed, else GET."""
+        if not self.aggregate.config["headrequests"]:
+            return 'GET'
+        if self.aggregate.plugin_manager.content_plugins:
+            # content plugins could need the content
+            return 'GET'
+        if self.allows_simple_recursion():
+            return 'GET'
+        if not self.aggregate.allows_head(self.urlparts[1]):
+            return 'GET'
+        return 'HEAD'
+
+    def build_request(self, method=None):
+        """Build a prepared request object. If no method is given
+        it is determined with get_request_method()."""
+        if method is None:
+            method = self.get_request_method()
         clientheaders = {}
         if (self.parent_url and
             self.parent_url.lower().startswith(HTTP_SCHEMAS)):
             clientheaders["Referer"] = self.parent_url
         kwargs = dict(
-            method='GET',
+            method=method,
             url=self.url,
             headers=clientheaders,
         )
         if self.auth:
             kwargs['auth'] = self.auth
+        self.add_conditional_headers(clientheaders)
         log.debug(LOG_CHECK, "Prepare request with %s", kwargs)
         request = requests.Request(**kwargs)
         return self.session.prepare_request(request)
 
+    def add_conditional_headers(self, headers):
+        """Add If-None-Match and If-Modified-Since headers if the disk
+        cache has a usable result of this URL with validators."""
+        self.stored_entry = None
+        disk_cache = self.aggregate.disk_cache
+        if disk_cache is None:
+            return
+        entry = disk_cache.get_entry(self.cache_url)
+        if entry is None or not (entry.etag or entry.last_modified):
+            return
+        if not self.can_reuse_stored_result(entry.result, entry.links):
+            return
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        self.stored_entry = entry
+
     def send_request(self, request):
-        """Send request and store response in self.url_connection."""
+        """Send request and store response in self.url_connection.
+        A request to an overloaded host is sent once more after the
+        host is ready again."""
+        host = self.urlparts[1]
         # throttle the number of requests to each host
-        self.aggregate.wait_for_host(self.urlparts[1])
+        if self.host_throttled:
+            self.host_throttled = False
+        else:
+            self.aggregate.wait_for_host(host)
         kwargs = self.get_request_kwargs()
         kwargs["allow_redirects"] = False
         self._send_request(request, **kwargs)
+        if self.aggregate.add_host_response(host, self.url_connection):
+            log.debug(LOG_CHECK, "Host %s is overloaded, retry %s", host,
+                      request.url)
+            self.url_connection.close()
+            self.aggregate.wait_for_host(host)
+            self._send_request(request, **kwargs)
+            self.aggregate.add_host_response(host, self.url_connection)
 
     def _send_request(self, request, **kwargs):
         """Send GET request."""
@@ -250,6 +311,9 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
 
     def get_redirects(self, request):
         """Return iterator of redirects for given request."""
+        # the validators do not apply to the redirection targets
+        for name in ("If-None-Match", "If-Modified-Since"):
+            request.headers.pop(name, None)
         kwargs = self.get_request_kwargs()
         return self.session.resolve_redirects(self.url_connection,
             request, **kwargs)
@@ -310,14 +374,55 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
 
     def read_content(self):
         """Return data and data size for this URL.
-        Can be overridden in subclasses."""
+        Can be overridden in subclasses.
+        HTML content is parsed for links while it is downloaded if
+        possible. Then the content is only kept if a content plugin
+        reads it."""
         maxbytes = self.aggregate.config["maxfilesizedownload"]
-        buf = BytesIO()
-        for data in self.url_connection.iter_content(chunk_size=self.ReadChunkBytes):
-            if buf.tell() + len(data) > maxbytes:
-                raise LinkCheckerError(_("File size too large"))
-            buf.write(data)
-        return buf.getvalue()
+        self.link_stream = self.get_link_stream()
+        if self.link_stream is None or \
+           self.aggregate.plugin_manager.needs_content(self):
+            buf = BytesIO()
+        else:
+            buf = None
+        numbytes = 0
+        try:
+            for data in self.url_connection.iter_content(chunk_size=self.ReadChunkBytes):
+                numbytes += len(data)
+                if numbytes > maxbytes:
+                    raise LinkCheckerError(_("File size too large"))
+                if buf is not None:
+                    buf.write(data)
+                if self.link_stream is not None:
+                    self.link_stream.feed(data)
+            if self.link_stream is not None:
+                self.link_stream.finish()
+        except Exception:
+            self.link_stream = None
+            raise
+        return b"" if buf is None else buf.getvalue()
+
+    def get_link_stream(self):
+        """Get a parser finding the links of HTML content while it is
+        downloaded, or None if the content is parsed after the download.
+        The found links are queued when the download has finished if
+        the content size is known to be small enough to be downloaded
+        and parsed, and no content plugin can mark the URL invalid after
+        the download. Otherwise
+        they are held until the content check allows recursion."""
+        aggregate = self.aggregate
+        config = aggregate.config
+        parser_pool = aggregate.parser_pool
+        if not self.is_html() or aggregate.disk_cache is not None or \
+           (parser_pool is not None and parser_pool.handles("html")) or \
+           not self.allows_simple_recursion():
+            return None
+        maxbytes = min(config["maxfilesizeparse"],
+                       config["maxfilesizedownload"])
+        hold_links = "Content-Encoding" in self.headers or \
+          not (0 <= self.size <= maxbytes) or \
+          aggregate.plugin_manager.has_content_plugins(self)
+        return LinkStream(self, hold_links)
 
     def parse_header_links(self):
         """Parse URLs in HTTP headers Link:."""
@@ -358,6 +463,31 @@ class HttpUrl (internpaturl.InternPatternUrl, proxysupport.ProxySupport):
             return False
         return True
 
+    def get_cache_validators (self):
+        """
+        Get the ETag and Last-Modified headers of a successful response
+        without redirections.
+
+        @return: ETag and Last-Modified values, or None if not available
+        @rtype: tuple (string or None, string or None)
+        """
+        if self.url_connection is None or self.aliases or \
+           self.url_connection.status_code != 200:
+            return None, None
+        return self.getheader("ETag"), self.getheader("Last-Modified")
+
+    def get_throttled_host (self):
+        """
+        Get the host of this URL, since the requests to each host are
+        throttled.
+
+        @return: host name, or None if the URL syntax is invalid
+        @rtype: string or None
+        """
+        if self.urlparts is None:
+            return None
+        return self.urlparts[1]
+
     def get_robots_txt_url (self):
         """
         Get the according robots.txt URL for this URL.
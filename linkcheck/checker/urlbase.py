@@ -38,20 +38,15 @@ import time
 import errno
 import socket
 import select
+import hashlib
 from io import BytesIO
 from builtins import str as str_text
 from future.utils import python_2_unicode_compatible
-from warnings import filterwarnings
-
-filterwarnings("ignore",
-    message="The soupsieve package is not installed. CSS selectors cannot be used.",
-    category=UserWarning, module="bs4")
-
-from bs4 import BeautifulSoup
 
 from . import absolute_url, get_url_from
 from .. import (log, LOG_CHECK,
-  strformat, LinkCheckerError, url as urlutil, trace, get_link_pat)
+  strformat, LinkCheckerError, url as urlutil, trace, get_link_pat,
+  charsetutil)
 from ..network import iputil
 from .const import (WARN_URL_EFFECTIVE_URL,
     WARN_URL_ERROR_GETTING_CONTENT, WARN_URL_OBFUSCATED_IP,
@@ -88,6 +83,22 @@ def url_norm (url, encoding=None):
         raise LinkCheckerError(msg)
 
 
+def join_url (parent, url):
+    """Join the normed url with the parent url if given, and norm the
+    path again since urljoin can unnorm it.
+
+    @return joined url
+    """
+    if parent:
+        url = urljoin(parent, url)
+    urlparts = list(urlparse.urlsplit(url))
+    if urlparts[2]:
+        urlparts[2] = urlutil.collapse_segments(urlparts[2])
+        if not urlparts[0].startswith("feed"):
+            urlparts[2] = url_fix_wayback_query(urlparts[2]) # restore second / in http[s]:// in wayback path
+    return urlutil.urlunsplit(urlparts)
+
+
 @python_2_unicode_compatible
 class UrlBase (object):
     """An URL with additional information like validity etc."""
@@ -235,6 +246,15 @@ class UrlBase (object):
         self.content_type = u""
         # URLs seen through redirections
         self.aliases = []
+        # links added from the content, stored in the disk cache
+        self.found_links = []
+        # set if the stored result of this URL is still valid
+        self.not_modified = False
+        # hash of the raw content, computed by get_content_hash()
+        self.content_hash = None
+        # parser searching the HTML content in one pass, see
+        # parser.scan_html()
+        self.link_stream = None
 
     def set_result (self, msg, valid=True, overwrite=False):
         """
@@ -370,35 +390,53 @@ class UrlBase (object):
         url information self.base_url, self.parent_url and self.base_ref.
         """
         # norm base url - can raise UnicodeError from url.idna_encode()
-        base_url, is_idn = url_norm(self.base_url, self.encoding)
+        base_url, is_idn = self.get_normed_url(None, self.base_url)
         # make url absolute
         if self.base_ref:
             # use base reference as parent url
             if ":" not in self.base_ref:
                 # some websites have a relative base reference
                 self.base_ref = urljoin(self.parent_url, self.base_ref)
-            self.url = urljoin(self.base_ref, base_url)
+            parent_url = self.base_ref
         elif self.parent_url:
             # strip the parent url query and anchor
             urlparts = list(urlparse.urlsplit(self.parent_url))
             urlparts[4] = ""
             parent_url = urlutil.urlunsplit(urlparts)
-            self.url = urljoin(parent_url, base_url)
         else:
-            self.url = base_url
-        # urljoin can unnorm the url path, so norm it again
-        urlparts = list(urlparse.urlsplit(self.url))
-        if urlparts[2]:
-            urlparts[2] = urlutil.collapse_segments(urlparts[2])
-            if not urlparts[0].startswith("feed"):
-                urlparts[2] = url_fix_wayback_query(urlparts[2]) # restore second / in http[s]:// in wayback path
-        self.url = urlutil.urlunsplit(urlparts)
+            parent_url = u""
+        self.url = self.get_normed_url(parent_url, base_url)[0]
         # split into (modifiable) list
         self.urlparts = strformat.url_unicode_split(self.url)
         self.build_url_parts()
         # and unsplit again
         self.url = urlutil.urlunsplit(self.urlparts)
 
+    def get_normed_url (self, parent_url, url):
+        """Norm url with the URL encoding if parent_url is None, else
+        join the normed url with parent_url (if not empty) and norm its
+        path. The results are cached in the URL norm cache of the
+        aggregate.
+
+        @return: tuple (normed url, is_idn)
+        """
+        if parent_url is None:
+            key = (None, url, self.encoding)
+        else:
+            key = (parent_url, url, None)
+        cache = self.aggregate.urlnorm_cache
+        if cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                return value
+        if parent_url is None:
+            value = url_norm(url, self.encoding)
+        else:
+            value = (join_url(parent_url, url), False)
+        if cache is not None:
+            cache.add(key, value)
+        return value
+
     def build_url_parts (self):
         """Set userinfo, host, port and anchor from self.urlparts.
         Also checks for obfuscated IP addresses.
@@ -497,6 +535,15 @@ class UrlBase (object):
                      {"msg": str_text(value)}, tag=WARN_URL_ERROR_GETTING_CONTENT)
         return False
 
+    def get_throttled_host (self):
+        """
+        Get the host whose requests are throttled when checking this URL.
+
+        @return: host name, or None if no requests are throttled
+        @rtype: string or None
+        """
+        return None
+
     def close_connection (self):
         """
         Close an opened url connection.
@@ -560,6 +607,24 @@ class UrlBase (object):
             return False
         return True
 
+    def can_reuse_stored_result (self, result, links):
+        """Check if a stored result can be used instead of checking this
+        URL. Without stored links the result is only usable if the content
+        need not be parsed for recursion."""
+        if links is not None or not self.allows_simple_recursion():
+            return True
+        return not self.ContentMimetypes.get(result.content_type)
+
+    def get_cache_validators (self):
+        """
+        Get the validators that tell if the URL content has changed
+        since the check.
+
+        @return: ETag and Last-Modified values, or None if not available
+        @rtype: tuple (string or None, string or None)
+        """
+        return None, None
+
     def allows_recursion (self):
         """
         Return True iff we can recurse into the url's content.
@@ -602,20 +667,16 @@ class UrlBase (object):
         if not url:
             self.extern = (1, 1)
             return
-        for entry in self.aggregate.config["externlinks"]:
-            match = entry['pattern'].search(url)
-            if (entry['negate'] and not match) or \
-               (match and not entry['negate']):
-                log.debug(LOG_CHECK, "Extern URL %r", url)
-                self.extern = (1, entry['strict'])
-                return
-        for entry in self.aggregate.config["internlinks"]:
-            match = entry['pattern'].search(url)
-            if (entry['negate'] and not match) or \
-               (match and not entry['negate']):
-                log.debug(LOG_CHECK, "Intern URL %r", url)
-                self.extern = (0, 0)
-                return
+        strict = self.aggregate.get_link_matcher("externlinks").match(url)
+        if strict is not None:
+            log.debug(LOG_CHECK, "Extern URL %r", url)
+            self.extern = (1, strict)
+            return
+        if self.aggregate.get_link_matcher("internlinks").match(url) \
+           is not None:
+            log.debug(LOG_CHECK, "Intern URL %r", url)
+            self.extern = (0, 0)
+            return
         if self.aggregate.config['checkextern']:
             self.extern = (1, 0)
         else:
@@ -634,7 +695,11 @@ class UrlBase (object):
         log.debug(LOG_CHECK, "Get content of %r", self.url)
         t = time.time()
         content = self.read_content()
-        self.size = len(content)
+        if self.link_stream is not None:
+            # the content may not have been kept
+            self.size = self.link_stream.size
+        else:
+            self.size = len(content)
         self.dltime = time.time() - t
         if self.size == 0:
             self.add_warning(_("Content size is zero."),
@@ -648,12 +713,17 @@ class UrlBase (object):
             self.data = self.download_content()
         return self.data
 
+    def get_content_hash (self):
+        """Return the SHA-1 hex digest of the raw content."""
+        if self.content_hash is None:
+            self.content_hash = hashlib.sha1(self.get_raw_content()).hexdigest()
+        return self.content_hash
+
     def get_content (self):
         if self.text is None:
             self.get_raw_content()
-            soup = BeautifulSoup(self.data, "html.parser")
-            self.text = self.data.decode(soup.original_encoding)
-            self.encoding = soup.original_encoding
+            self.text, self.encoding = charsetutil.decode(self.data,
+                                                          self.charset)
         return self.text
 
     def read_content(self):
@@ -683,7 +753,14 @@ class UrlBase (object):
         return self.aggregate.config.get_user_password(self.url)
 
     def add_url (self, url, line=0, column=0, page=0, name=u"", base=None):
-        """Add new URL to queue."""
+        """Add new URL to queue. Links that were already queued from
+        this page or another page with the same URL are skipped without
+        building their URL data."""
+        self.found_links.append((url, line, column, page, name, base))
+        cache = self.aggregate.result_cache
+        link_key = self.get_link_key(url, base)
+        if cache.has_link(link_key):
+            return
         if base:
             base_ref = urlutil.url_norm(base)[0]
         else:
@@ -692,6 +769,30 @@ class UrlBase (object):
             parent_url=self.url, base_ref=base_ref, line=line, column=column,
             page=page, name=name, parent_content_type=self.content_type)
         self.aggregate.urlqueue.put(url_data)
+        if url_data.cache_url is not None and not url_data.has_result:
+            # URLs with a result are logged for each link
+            cache.add_link(link_key)
+
+    def get_link_key (self, url, base):
+        """Get a key of a link found in the content of this URL. Links
+        with the same key resolve to the same URL, so the key only
+        contains the part of this URL that a relative link depends on."""
+        href = url.strip()
+        if base or not href or not self.is_http() or self.urlparts is None:
+            context = u"%s\n%s" % (base or u"", self.url or u"")
+        elif urlutil.url_is_absolute(href) and \
+             href.split(u":", 1)[1].startswith(u"//"):
+            context = u""
+        elif href.startswith(u"/") and not href.startswith(u"//"):
+            context = u"%s://%s" % tuple(self.urlparts[:2])
+        elif href[0].isalnum() or href[0] in u"._-~%":
+            # the directory of this URL
+            path = self.urlparts[2]
+            context = u"%s://%s%s" % (self.urlparts[0], self.urlparts[1],
+                                      path[:path.rfind(u"/")+1])
+        else:
+            context = self.url
+        return u"%s\n%s\n%s" % (url, context, self.content_type or u"")
 
     def serialized (self, sep=os.linesep):
         """
@@ -169,13 +169,27 @@ class Configuration (dict):
         self["maxfilesizeparse"] = 1*1024*1024
         self["maxfilesizedownload"] = 5*1024*1024
         self["maxnumurls"] = None
+        self["resultcachesize"] = 100000
+        self["resultcachebytes"] = 100*1024*1024
+        self["queuewindow"] = 0
+        self["cachefile"] = None
+        self["cachemaxage"] = 24*60*60
+        self["checkpoint"] = None
+        self["resume"] = False
         self["maxrunseconds"] = None
         self["maxrequestspersecond"] = 10
+        self["headrequests"] = False
+        self["adaptivethrottling"] = False
+        self["maxconnectionsperhost"] = 10
+        self["idletimeout"] = 30
         self["maxhttpredirects"] = 10
         self["nntpserver"] = os.environ.get("NNTP_SERVER", None)
         self["proxy"] = request.getproxies()
         self["sslverify"] = True
         self["threads"] = 10
+        self["parseprocesses"] = 0
+        self["workers"] = 0
+        self["coordinator"] = None
         self["timeout"] = 60
         self["aborttimeout"] = 300
         self["recursionlevel"] = -1
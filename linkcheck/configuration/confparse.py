@@ -139,13 +139,25 @@ class LCConfigParser (RawConfigParser, object):
         section = "checking"
         self.read_int_option(section, "threads", min=-1)
         self.config['threads'] = max(0, self.config['threads'])
+        self.read_int_option(section, "parseprocesses", min=0)
+        self.read_int_option(section, "workers", min=0)
+        self.read_string_option(section, "coordinator")
         self.read_int_option(section, "timeout", min=1)
         self.read_int_option(section, "aborttimeout", min=1)
         self.read_int_option(section, "recursionlevel", min=-1)
         self.read_string_option(section, "nntpserver")
         self.read_string_option(section, "useragent")
         self.read_int_option(section, "maxrequestspersecond", min=1)
+        self.read_boolean_option(section, "headrequests")
+        self.read_boolean_option(section, "adaptivethrottling")
+        self.read_int_option(section, "maxconnectionsperhost", min=1)
+        self.read_int_option(section, "idletimeout", min=1)
         self.read_int_option(section, "maxnumurls", min=0)
+        self.read_int_option(section, "resultcachesize", min=0)
+        self.read_int_option(section, "resultcachebytes", min=0)
+        self.read_int_option(section, "queuewindow", min=0)
+        self.read_string_option(section, "cachefile")
+        self.read_int_option(section, "cachemaxage", min=0)
         self.read_int_option(section, "maxfilesizeparse", min=1)
         self.read_int_option(section, "maxfilesizedownload", min=1)
         if self.has_option(section, "allowedschemes"):
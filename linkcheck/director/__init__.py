@@ -24,7 +24,10 @@ except ImportError: # Python 2
     from thread import error as thread_error
 import time
 from .. import log, LOG_CHECK, LinkCheckerInterrupt, plugins
-from ..cache import urlqueue, robots_txt, results
+from ..cache import urlqueue, robots_txt, results, connections, diskcache, \
+    checkpoint, urlnorm
+from ..checker import get_url_from
+from ..parser import pool
 from . import aggregator, console
 
 
@@ -130,9 +133,55 @@ def abort_now ():
 
 def get_aggregate (config):
     """Get an aggregator instance with given configuration."""
-    _urlqueue = urlqueue.UrlQueue(max_allowed_urls=config["maxnumurls"])
+    if config["resume"]:
+        pending, logged = checkpoint.read_checkpoint(config["checkpoint"])
+    if config["checkpoint"]:
+        _checkpoint = checkpoint.Checkpoint(config["checkpoint"])
+    else:
+        _checkpoint = None
+    if config["workers"] or config["coordinator"]:
+        # the worker processes throttle the requests to their hosts
+        max_requests_per_second = None
+    else:
+        max_requests_per_second = config["maxrequestspersecond"]
+    _urlqueue = urlqueue.UrlQueue(max_allowed_urls=config["maxnumurls"],
+        max_requests_per_second=max_requests_per_second,
+        checkpoint=_checkpoint, window=config["queuewindow"] or None)
     _robots_txt = robots_txt.RobotsTxt(config["useragent"])
     plugin_manager = plugins.PluginManager(config)
-    result_cache = results.ResultCache()
-    return aggregator.Aggregate(config, _urlqueue, _robots_txt, plugin_manager,
-        result_cache)
+    result_cache = results.ResultCache(max_size=config["resultcachesize"],
+        max_bytes=config["resultcachebytes"])
+    if config["parseprocesses"] > 0:
+        # start the worker processes before any checker thread runs
+        parser_pool = pool.ParserPool(config["parseprocesses"], config,
+                                      plugin_manager)
+    else:
+        parser_pool = None
+    if config["cachefile"]:
+        disk_cache = diskcache.DiskCache(config["cachefile"],
+                                         config["cachemaxage"])
+    else:
+        disk_cache = None
+    connection_pool = connections.ConnectionPool(
+        config["maxconnectionsperhost"], config["idletimeout"])
+    aggregate = aggregator.Aggregate(config, _urlqueue, _robots_txt,
+        plugin_manager, result_cache, parser_pool=parser_pool,
+        connection_pool=connection_pool, disk_cache=disk_cache,
+        checkpoint=_checkpoint, urlnorm_cache=urlnorm.UrlNormCache())
+    if config["resume"]:
+        resume(aggregate, pending, logged)
+    return aggregate
+
+
+def resume (aggregate, pending, logged):
+    """Continue an interrupted check: the logged URLs are not checked
+    again but counted in the logger statistics, and the pending URLs are
+    queued again."""
+    log.info(LOG_CHECK, _("Resuming check with %(logged)d logged and"
+             " %(pending)d pending URLs.") %
+             dict(logged=len(logged), pending=len(pending)))
+    for key, results in logged.items():
+        aggregate.result_cache.add_result(key, None)
+        aggregate.logger.resumed_results.extend(results)
+    for kwargs in pending.values():
+        aggregate.urlqueue.put(get_url_from(aggregate=aggregate, **kwargs))
@@ -29,12 +29,12 @@ try:  # Python 3
     from urllib import parse
 except ImportError:
     import urlparse as parse
-import random
-from .. import log, LOG_CHECK, strformat, LinkCheckerError
+from .. import log, LOG_CHECK, strformat, httputil, LinkCheckerError
 from ..decorators import synchronized
 from ..cache import urlqueue
 from ..htmlutil import formsearch
 from ..cookies import from_file
+from ..linkmatch import LinkMatcher
 from . import logger, status, checker, interrupt
 
 
@@ -42,9 +42,14 @@ _threads_lock = threading.RLock()
 _hosts_lock = threading.RLock()
 _downloadedbytes_lock = threading.RLock()
 
-def new_request_session(config, cookies):
+# HTTP status codes of overloaded servers
+OVERLOADED_STATI = (429, 503)
+
+def new_request_session(config, cookies, connection_pool=None):
     """Create a new request session."""
     session = requests.Session()
+    if connection_pool is not None:
+        connection_pool.mount(session)
     if cookies:
         session.cookies = cookies
     session.max_redirects = config["maxhttpredirects"]
@@ -61,8 +66,12 @@ class Aggregate (object):
     """Store thread-safe data collections for checker threads."""
 
     def __init__ (self, config, urlqueue, robots_txt, plugin_manager,
-                  result_cache):
-        """Store given link checking objects."""
+                  result_cache, parser_pool=None, connection_pool=None,
+                  disk_cache=None, checkpoint=None, urlnorm_cache=None,
+                  link_names=None):
+        """Store given link checking objects. The names of found links
+        are searched if link_names is set, or by default if a logger
+        logs them or the disk cache stores them."""
         self.config = config
         self.urlqueue = urlqueue
         self.logger = logger.Logger(config)
@@ -71,11 +80,20 @@ class Aggregate (object):
         self.robots_txt = robots_txt
         self.plugin_manager = plugin_manager
         self.result_cache = result_cache
-        self.times = {}
+        self.parser_pool = parser_pool
+        self.connection_pool = connection_pool
+        self.disk_cache = disk_cache
+        self.checkpoint = checkpoint
+        self.urlnorm_cache = urlnorm_cache
+        if link_names is None:
+            link_names = disk_cache is not None or \
+                         self.logger.logs_link_names()
+        self.link_names = link_names
+        # compiled externlinks and internlinks patterns
+        self.link_matchers = {}
+        # hosts that do not answer HEAD requests correctly
+        self.no_head_hosts = set()
         self.cookies = None
-        requests_per_second = config["maxrequestspersecond"]
-        self.wait_time_min = 1.0 / requests_per_second
-        self.wait_time_max = max(self.wait_time_min + 0.5, 0.5)
         self.downloaded_bytes = 0
 
     def visit_loginurl(self):
@@ -113,19 +131,25 @@ class Aggregate (object):
             t.start()
             self.threads.append(t)
         num = self.config["threads"]
-        if num > 0:
+        if self.config["workers"] or self.config["coordinator"]:
+            from . import distributed
+            t = distributed.Coordinator(self)
+            self.threads.append(t)
+            t.start()
+        elif num > 0:
             for dummy in range(num):
                 t = checker.Checker(self.urlqueue, self.logger, self.add_request_session)
                 self.threads.append(t)
                 t.start()
         else:
-            self.request_sessions[_thread.get_ident()] = new_request_session(self.config, self.cookies)
+            self.add_request_session()
             checker.check_urls(self.urlqueue, self.logger)
 
     @synchronized(_threads_lock)
     def add_request_session(self):
         """Add a request session for current thread."""
-        session = new_request_session(self.config, self.cookies)
+        session = new_request_session(self.config, self.cookies,
+                                      connection_pool=self.connection_pool)
         self.request_sessions[_thread.get_ident()] = session
 
     @synchronized(_threads_lock)
@@ -133,18 +157,55 @@ class Aggregate (object):
         """Get the request session for current thread."""
         return self.request_sessions[_thread.get_ident()]
 
-    @synchronized(_hosts_lock)
     def wait_for_host(self, host):
-        """Throttle requests to one host."""
-        t = time.time()
-        if host in self.times:
-            due_time = self.times[host]
-            if due_time > t:
-                wait = due_time - t
-                time.sleep(wait)
-                t = time.time()
-        wait_time = random.uniform(self.wait_time_min, self.wait_time_max)
-        self.times[host] = t + wait_time
+        """Throttle requests to one host. The ready times of the hosts
+        are shared with the URL queue, and no lock is held while
+        waiting."""
+        wait = self.urlqueue.reserve_host_time(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def add_host_response(self, host, response):
+        """Adapt the request rate of one host to given response when
+        adaptive throttling is enabled.
+        @return: True if the host is overloaded and the request should
+          be sent again
+        @rtype: bool
+        """
+        if not self.config["adaptivethrottling"]:
+            return False
+        overloaded = response.status_code in OVERLOADED_STATI
+        retry_after = None
+        if overloaded:
+            retry_after = httputil.get_retry_after(response.headers)
+            if retry_after is not None and retry_after > urlqueue.MAX_HOST_DELAY:
+                # do not wait that long
+                return False
+        latency = response.elapsed.total_seconds()
+        self.urlqueue.add_host_response(host, latency, overloaded=overloaded,
+                                        retry_after=retry_after)
+        return overloaded
+
+    def get_link_matcher(self, name):
+        """Get the compiled patterns of the externlinks or internlinks
+        option. Patterns added while checking (eg. by add_intern_pattern())
+        get compiled on the next call."""
+        patterns = self.config[name]
+        matcher = self.link_matchers.get(name)
+        if matcher is None or matcher.size != len(patterns):
+            matcher = LinkMatcher(patterns)
+            self.link_matchers[name] = matcher
+        return matcher
+
+    @synchronized(_hosts_lock)
+    def allows_head(self, host):
+        """Check if HEAD requests can be sent to given host."""
+        return host not in self.no_head_hosts
+
+    @synchronized(_hosts_lock)
+    def disallow_head(self, host):
+        """Send only GET requests to given host from now on."""
+        self.no_head_hosts.add(host)
 
     @synchronized(_threads_lock)
     def print_active_threads (self):
@@ -201,6 +262,16 @@ class Aggregate (object):
             t.stop()
         for t in self.threads:
             t.join(timeout=1.0)
+        if self.parser_pool is not None:
+            self.parser_pool.terminate()
+        if self.connection_pool is not None:
+            log.debug(LOG_CHECK, "Connection stats: %s",
+                      self.connection_pool.get_stats())
+            self.connection_pool.clear()
+        if self.disk_cache is not None:
+            self.disk_cache.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
 
     @synchronized(_threads_lock)
     def is_finished (self):
@@ -219,4 +290,8 @@ class Aggregate (object):
             downloaded_bytes=self.downloaded_bytes,
             num_urls = len(self.result_cache),
         ))
+        if self.connection_pool is not None:
+            kwargs["connections"] = self.connection_pool.get_stats()
+        if self.urlnorm_cache is not None:
+            kwargs["urlnorm"] = self.urlnorm_cache.get_stats()
         self.logger.end_log_output(**kwargs)
@@ -21,7 +21,7 @@ import copy
 import time
 from . import task
 from ..cache import urlqueue
-from .. import parser
+from .. import parser, log, LOG_CACHE
 
 # Interval in which each check thread looks if it's stopped.
 QUEUE_POLL_INTERVALL_SECS = 1.0
@@ -40,42 +40,129 @@ def check_urls (urlqueue, logger):
 def check_url(url_data, logger):
     """Check a single URL with logging."""
     if url_data.has_result:
-        logger.log_url(url_data.to_wire())
+        result = url_data.to_wire()
+        logger.log_url(result)
     else:
         cache = url_data.aggregate.result_cache
         key = url_data.cache_url
         result = cache.get_result(key)
+        if result is None:
+            result = get_stored_result(url_data)
+            if result is not None:
+                cache.add_result(key, result)
         if result is None:
             # check
             check_start = time.time()
             try:
                 url_data.check()
-                do_parse = url_data.check_content()
-                url_data.checktime = time.time() - check_start
-                # Add result to cache
-                result = url_data.to_wire()
-                cache.add_result(key, result)
-                for alias in url_data.aliases:
-                    # redirect aliases
-                    cache.add_result(alias, result)
-                # parse content recursively
-                # XXX this could add new warnings which should be cached.
-                if do_parse:
-                    parser.parse_url(url_data)
+                if url_data.not_modified:
+                    result = get_revalidated_result(url_data)
+                else:
+                    do_parse = url_data.check_content()
+                    url_data.checktime = time.time() - check_start
+                    # Add result to cache
+                    result = url_data.to_wire()
+                    cache.add_result(key, result)
+                    for alias in url_data.aliases:
+                        # redirect aliases
+                        cache.add_result(alias, result)
+                        url_data.aggregate.urlqueue.promote(alias)
+                    # parse content recursively
+                    # XXX this could add new warnings which should be cached.
+                    if do_parse:
+                        parse_url(url_data)
+                    store_result(url_data, result, do_parse)
             finally:
                 # close/release possible open connection
                 url_data.close_connection()
         else:
-            # copy data from cache and adjust it
-            result = copy.copy(result)
-            result.parent_url = url_data.parent_url
-            result.base_ref = url_data.base_ref or u""
-            result.base_url = url_data.base_url or u""
-            result.line = url_data.line
-            result.column = url_data.column
-            result.level = url_data.recursion_level
-            result.name = url_data.name
+            result = copy_result(result, url_data)
         logger.log_url(result)
+    checkpoint = url_data.aggregate.checkpoint
+    if checkpoint is not None and url_data.cache_url is not None:
+        checkpoint.add_result(url_data.cache_url, result)
+
+
+def copy_result(result, url_data):
+    """Copy data from cache and adjust it to given URL."""
+    result = copy.copy(result)
+    result.parent_url = url_data.parent_url or u""
+    result.base_ref = url_data.base_ref or u""
+    result.base_url = url_data.base_url or u""
+    result.line = url_data.line
+    result.column = url_data.column
+    result.level = url_data.recursion_level
+    result.name = url_data.name or u""
+    return result
+
+
+def get_stored_result(url_data):
+    """Get a recent valid result from the disk cache and queue the
+    stored links of its content."""
+    disk_cache = url_data.aggregate.disk_cache
+    if disk_cache is None:
+        return None
+    entry = disk_cache.get_entry(url_data.cache_url)
+    if entry is None or not disk_cache.is_fresh(entry):
+        return None
+    if not url_data.can_reuse_stored_result(entry.result, entry.links):
+        return None
+    add_stored_links(url_data, entry.links)
+    return entry.result
+
+
+def get_revalidated_result(url_data):
+    """Get the stored result of a URL whose content has not been
+    modified since it was stored, and queue the stored links of
+    its content."""
+    key = url_data.cache_url
+    entry = url_data.stored_entry
+    url_data.aggregate.disk_cache.renew(key)
+    url_data.aggregate.result_cache.add_result(key, entry.result)
+    add_stored_links(url_data, entry.links)
+    return copy_result(entry.result, url_data)
+
+
+def add_stored_links(url_data, links):
+    """Queue the stored links of the URL content for recursion, except
+    the links already found in the HTTP headers."""
+    if links and url_data.allows_simple_recursion():
+        found = set(url_data.found_links)
+        for link in links:
+            if link not in found:
+                url_data.add_url(*link)
+
+
+def parse_url(url_data):
+    """Parse the URL content, or queue the links stored in the disk
+    cache if the content has not changed since it was parsed."""
+    disk_cache = url_data.aggregate.disk_cache
+    if disk_cache is not None:
+        links = disk_cache.get_links(url_data.cache_url,
+                                     url_data.get_content_hash())
+        if links is not None:
+            log.debug(LOG_CACHE, "Content of %s not changed, add %d stored"
+                      " links", url_data.url, len(links))
+            add_stored_links(url_data, links)
+            return
+    parser.parse_url(url_data)
+
+
+def store_result(url_data, result, do_parse):
+    """Store the check result in the disk cache, with the found links
+    if the content has been parsed."""
+    disk_cache = url_data.aggregate.disk_cache
+    if disk_cache is None:
+        return
+    if do_parse:
+        links = url_data.found_links
+        content_hash = url_data.get_content_hash()
+    else:
+        links = content_hash = None
+    etag, last_modified = url_data.get_cache_validators()
+    disk_cache.add_result(url_data.cache_url, result, links=links,
+                          etag=etag, last_modified=last_modified,
+                          content_hash=content_hash)
 
 
 class Checker(task.LoggedCheckedTask):
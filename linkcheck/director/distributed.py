@@ -0,0 +1,509 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Check URLs with several worker processes.
+
+The coordinator thread owns the URL queue and the set of seen URLs.
+It hands out the queued URLs to worker processes, which connect over
+a local or TCP socket. Local workers run in new Python interpreters,
+since a forked process would inherit the locks held by other threads
+of the coordinator process. All URLs of one host go to the same worker, so
+the throttling, robots.txt and connection state of a host stays in one
+process. Each worker checks its URLs with the usual check_url() function
+in its own checker threads, and sends back the found links, the check
+results and a notice when a URL is done.
+
+The connection is authenticated with a shared key, but not encrypted.
+The configuration sent to the workers includes the authentication
+passwords and the cookies of the login URL.
+
+Messages are pickled tuples (kind, ...):
+- coordinator to worker: ("config", options, login cookies or None),
+  ("url", task id, keyword arguments of get_url_from()), ("stop",)
+- worker to coordinator: ("url", keyword arguments of get_url_from()),
+  ("result", CompactUrlData), ("done", task id), ("error",),
+  ("bytes", number of downloaded bytes)
+"""
+import binascii
+import collections
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+try: # Python 3
+    import queue
+except ImportError: # Python 2
+    import Queue as queue
+from . import aggregator, checker, task
+from .. import log, LOG_CHECK, plugins, configuration
+from ..cache import urlqueue, robots_txt, results, connections, urlnorm
+from ..cache.checkpoint import get_url_args
+from ..checker import get_url_from
+
+# Interval in which the threads look if they are stopped.
+QUEUE_POLL_INTERVALL_SECS = 0.5
+
+# Maximum number of URLs handed out to a worker per checker thread
+# of the worker.
+URLS_PER_THREAD = 2
+
+# Number of seconds after which the check stops if no worker is connected.
+WORKER_CONNECT_TIMEOUT = 60
+
+# Environment variable with the key that workers need to connect.
+KEY_ENV = "LINKCHECKER_WORKER_KEY"
+
+# Options that are not sent to the workers, since they only apply to the
+# coordinator. The workers use the default values.
+CoordinatorOptions = frozenset((
+    "logger", "fileoutput", "cachefile", "checkpoint", "resume",
+    "parseprocesses", "workers", "coordinator", "status", "maxrunseconds",
+    "trace",
+))
+
+# Python code of a local worker process, connecting to the address
+# given as first argument.
+WORKER_CODE = (
+    "import sys\n"
+    "from linkcheck import logconf\n"
+    "from linkcheck.director import distributed\n"
+    "logconf.init_log_config()\n"
+    "distributed.run_worker(distributed.parse_address(sys.argv[1]),\n"
+    "                       distributed.get_key())\n"
+)
+
+
+def get_key ():
+    """Get the key that workers need to connect to the coordinator.
+    Without the environment variable a random key for local workers
+    is generated."""
+    key = os.environ.get(KEY_ENV)
+    if key:
+        return key.encode("utf-8")
+    return binascii.hexlify(os.urandom(16))
+
+
+def parse_address (address):
+    """Parse an address of the form HOST:PORT.
+    @return: tuple (host, port)
+    @raises: ValueError on syntax errors
+    """
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def start_worker (address, key):
+    """Start a local worker process connecting to the coordinator at
+    given address with given key.
+    @return: the worker process
+    @rtype: subprocess.Popen
+    """
+    env = dict(os.environ)
+    env[KEY_ENV] = str(key.decode("ascii"))
+    # the worker imports the same linkcheck package
+    pythonpath = [os.path.dirname(os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))))]
+    if env.get("PYTHONPATH"):
+        pythonpath.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(pythonpath)
+    return subprocess.Popen([sys.executable, "-c", WORKER_CODE,
+                             "%s:%d" % address], env=env, close_fds=True)
+
+
+def stop_process (process, timeout):
+    """Wait at most timeout seconds for given process to exit and
+    terminate it afterwards."""
+    end = time.time() + timeout
+    while process.poll() is None and time.time() < end:
+        time.sleep(0.05)
+    if process.poll() is None:
+        process.terminate()
+        process.wait()
+
+
+class Worker (object):
+    """Connection to one worker process."""
+
+    def __init__ (self, conn, num_threads):
+        """Store connection and the maximum number of handed out URLs."""
+        self.conn = conn
+        self.max_urls = max(1, num_threads) * URLS_PER_THREAD
+        # {task id -> handed out URL data}
+        self.urls = {}
+        # URLs of the hosts of this worker waiting for a free slot
+        self.pending = collections.deque()
+        self.alive = True
+
+
+class Coordinator (task.LoggedCheckedTask):
+    """Thread handing out the queued URLs to worker processes."""
+
+    def __init__ (self, aggregate):
+        """Store aggregate, URL queue and logger."""
+        super(Coordinator, self).__init__(aggregate.logger)
+        self.aggregate = aggregate
+        self.urlqueue = aggregate.urlqueue
+        self.setName("CheckThread-coordinator")
+        self.key = get_key()
+        address = aggregate.config["coordinator"]
+        if address:
+            address = parse_address(address)
+            if not os.environ.get(KEY_ENV):
+                log.warn(LOG_CHECK, _("Set the environment variable %s to"
+                         " let workers on other machines connect.") % KEY_ENV)
+        else:
+            address = ("localhost", 0)
+        self.listener = Listener(address, authkey=self.key)
+        self.address = self.listener.address
+        self.workers = []
+        self.processes = []
+        # {host -> worker}
+        self.hosts = {}
+        # URLs waiting for a worker to connect
+        self.unassigned = []
+        # time since when no worker is connected, or None
+        self.no_worker_since = time.time()
+        self.task_id = 0
+        self.lock = threading.Lock()
+        self.receivers = []
+
+    def run_checked (self):
+        """Start the local workers and hand out URLs until stopped."""
+        log.debug(LOG_CHECK, "Coordinator listens at %s:%d", *self.address)
+        for dummy in range(self.aggregate.config["workers"]):
+            self.processes.append(start_worker(self.address, self.key))
+        t = threading.Thread(target=self.accept_workers,
+                             name="Coordinator-accept")
+        t.daemon = True
+        t.start()
+        try:
+            while not self.stopped(0):
+                if self.connect_timed_out():
+                    break
+                try:
+                    url_data = self.urlqueue.get(
+                        timeout=QUEUE_POLL_INTERVALL_SECS)
+                except urlqueue.Empty:
+                    continue
+                if url_data.has_result:
+                    # only log the result
+                    try:
+                        checker.check_url(url_data, self.logger)
+                    finally:
+                        self.urlqueue.task_done(url_data)
+                else:
+                    self.hand_out(url_data)
+        finally:
+            self.shutdown()
+
+    def accept_workers (self):
+        """Accept connections of workers until the coordinator is
+        stopped."""
+        while not self.stopped(0):
+            try:
+                conn = self.listener.accept()
+            except (EOFError, IOError, OSError) as msg:
+                log.debug(LOG_CHECK, "Worker could not connect: %s", msg)
+                continue
+            if self.stopped(0):
+                conn.close()
+                break
+            options = dict((key, value) for key, value in
+                           self.aggregate.config.items()
+                           if key not in CoordinatorOptions)
+            conn.send(("config", options, self.aggregate.cookies))
+            num_threads = conn.recv()
+            worker = Worker(conn, num_threads)
+            with self.lock:
+                self.workers.append(worker)
+                self.no_worker_since = None
+                urls = self.unassigned
+                self.unassigned = []
+                for url_data in urls:
+                    self.assign(url_data)
+            t = threading.Thread(target=self.receive, args=(worker,),
+                                 name="Coordinator-receive")
+            t.daemon = True
+            t.start()
+            self.receivers.append(t)
+
+    def get_worker (self, url_data):
+        """Get the worker for the host of given URL. New hosts go to the
+        worker with the least handed out URLs. Must hold self.lock.
+        @return: worker or None if there is no worker
+        """
+        host = url_data.urlparts[1] if url_data.urlparts else None
+        worker = self.hosts.get(host)
+        if worker is not None and worker.alive:
+            return worker
+        workers = [w for w in self.workers if w.alive]
+        if not workers:
+            return None
+        worker = min(workers, key=lambda w: len(w.urls))
+        if host:
+            self.hosts[host] = worker
+        return worker
+
+    def connect_timed_out (self):
+        """Check if no worker has been connected for
+        WORKER_CONNECT_TIMEOUT seconds. The URLs waiting for a worker
+        are dropped, and the check is cancelled with an error."""
+        with self.lock:
+            if self.no_worker_since is None or \
+               time.time() - self.no_worker_since < WORKER_CONNECT_TIMEOUT:
+                return False
+            urls = self.unassigned
+            self.unassigned = []
+        log.error(LOG_CHECK, _("No worker connected within %(num)d seconds,"
+                  " stopping the check.") % dict(num=WORKER_CONNECT_TIMEOUT))
+        self.logger.log_internal_error()
+        for url_data in urls:
+            self.urlqueue.task_done(url_data)
+        self.aggregate.cancel()
+        return True
+
+    def hand_out (self, url_data):
+        """Send URL to the worker of its host, or let it wait for a free
+        slot of that worker. Without workers the URL waits for the next
+        worker to connect. This never blocks, so a busy host does not
+        hold up the URLs of other workers."""
+        with self.lock:
+            if self.stopped(0):
+                self.urlqueue.task_done(url_data)
+            else:
+                self.assign(url_data)
+
+    def assign (self, url_data):
+        """Add URL to the pending URLs of the worker of its host and
+        send the pending URLs. Must hold self.lock."""
+        worker = self.get_worker(url_data)
+        if worker is None:
+            self.unassigned.append(url_data)
+        else:
+            worker.pending.append(url_data)
+            self.send_pending(worker)
+
+    def send_pending (self, worker):
+        """Send pending URLs to given worker until it has its maximum
+        number of handed out URLs. Must hold self.lock."""
+        while worker.alive and worker.pending and \
+              len(worker.urls) < worker.max_urls:
+            url_data = worker.pending.popleft()
+            self.task_id += 1
+            worker.urls[self.task_id] = url_data
+            try:
+                worker.conn.send(("url", self.task_id,
+                                  get_url_args(url_data)))
+            except (IOError, OSError) as msg:
+                log.warn(LOG_CHECK, _("Lost connection to worker: %(msg)s")
+                         % dict(msg=msg))
+                # the receive thread hands out the URLs again
+                break
+
+    def receive (self, worker):
+        """Handle the messages of a worker until it disconnects."""
+        while True:
+            try:
+                msg = worker.conn.recv()
+            except (EOFError, IOError, OSError):
+                break
+            kind = msg[0]
+            if kind == "url":
+                self.urlqueue.put(get_url_from(aggregate=self.aggregate,
+                                               **msg[1]))
+            elif kind == "result":
+                self.log_result(msg[1])
+            elif kind == "done":
+                with self.lock:
+                    url_data = worker.urls.pop(msg[1])
+                    self.send_pending(worker)
+                self.urlqueue.task_done(url_data)
+            elif kind == "error":
+                self.logger.log_internal_error()
+            elif kind == "bytes":
+                self.aggregate.add_downloaded_bytes(msg[1])
+        self.remove_worker(worker)
+
+    def log_result (self, result):
+        """Log the check result of a worker."""
+        self.logger.log_url(result)
+        checkpoint = self.aggregate.checkpoint
+        if checkpoint is not None and result.cache_url is not None:
+            checkpoint.add_result(result.cache_url, result)
+
+    def remove_worker (self, worker):
+        """Hand out the unfinished and pending URLs of a disconnected
+        worker again."""
+        with self.lock:
+            worker.alive = False
+            urls = list(worker.urls.values()) + list(worker.pending)
+            worker.urls.clear()
+            worker.pending.clear()
+            if not any(w.alive for w in self.workers):
+                self.no_worker_since = time.time()
+        worker.conn.close()
+        if urls and not self.stopped(0):
+            log.warn(LOG_CHECK, _("Worker disconnected, checking its"
+                     " %(num)d unfinished URLs again.") % dict(num=len(urls)))
+        for url_data in urls:
+            self.hand_out(url_data)
+
+    def shutdown (self):
+        """Stop all workers and wait for their last messages."""
+        with self.lock:
+            for worker in self.workers:
+                if worker.alive:
+                    try:
+                        worker.conn.send(("stop",))
+                    except (IOError, OSError):
+                        pass
+        # wake up the accept() call
+        try:
+            Client(self.address, authkey=self.key).close()
+        except (EOFError, IOError, OSError):
+            pass
+        self.listener.close()
+        for t in self.receivers:
+            t.join(QUEUE_POLL_INTERVALL_SECS)
+        for p in self.processes:
+            stop_process(p, QUEUE_POLL_INTERVALL_SECS)
+
+
+class WorkerUrlQueue (urlqueue.UrlQueue):
+    """URL queue of a worker process. Found URLs are sent to the
+    coordinator. The queue only keeps the throttling state of the
+    hosts of this worker."""
+
+    def __init__ (self, send, **kwargs):
+        """Store the function sending messages to the coordinator."""
+        super(WorkerUrlQueue, self).__init__(**kwargs)
+        self.send = send
+
+    def put (self, url_data):
+        """Send found URL to the coordinator."""
+        self.send(("url", get_url_args(url_data)))
+
+
+class WorkerLogger (object):
+    """Logger of a worker process sending the results to the
+    coordinator."""
+
+    def __init__ (self, send):
+        """Store the function sending messages to the coordinator."""
+        self.send = send
+
+    def log_url (self, url_data):
+        """Send the check result."""
+        self.send(("result", url_data))
+
+    def log_internal_error (self):
+        """Report an internal error."""
+        self.send(("error",))
+
+
+class WorkerChecker (task.LoggedCheckedTask):
+    """URL check thread of a worker process."""
+
+    def __init__ (self, aggregate, urls, send):
+        """Store aggregate, the queue of handed out URLs and the
+        function sending messages to the coordinator."""
+        super(WorkerChecker, self).__init__(WorkerLogger(send))
+        self.aggregate = aggregate
+        self.urls = urls
+        self.send = send
+
+    def run_checked (self):
+        """Check handed out URLs until stopped."""
+        self.aggregate.add_request_session()
+        while not self.stopped(0):
+            try:
+                task_id, kwargs = self.urls.get(
+                    timeout=QUEUE_POLL_INTERVALL_SECS)
+            except queue.Empty:
+                continue
+            try:
+                url_data = get_url_from(aggregate=self.aggregate, **kwargs)
+                checker.check_url(url_data, self.logger)
+            except Exception:
+                self.internal_error()
+            finally:
+                self.send(("done", task_id))
+
+
+def get_worker_aggregate (config, send):
+    """Get an aggregator instance for a worker process. Link names are
+    always searched, since the coordinator loggers may log them."""
+    _urlqueue = WorkerUrlQueue(send,
+        max_requests_per_second=config["maxrequestspersecond"])
+    _robots_txt = robots_txt.RobotsTxt(config["useragent"])
+    plugin_manager = plugins.PluginManager(config)
+    result_cache = results.ResultCache(max_size=config["resultcachesize"],
+        max_bytes=config["resultcachebytes"])
+    connection_pool = connections.ConnectionPool(
+        config["maxconnectionsperhost"], config["idletimeout"])
+    return aggregator.Aggregate(config, _urlqueue, _robots_txt,
+        plugin_manager, result_cache, connection_pool=connection_pool,
+        urlnorm_cache=urlnorm.UrlNormCache(), link_names=True)
+
+
+def run_worker (address, key):
+    """Connect to the coordinator at given address and check the
+    handed out URLs until the coordinator stops this worker."""
+    # interrupts are handled by the coordinator
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    conn = Client(address, authkey=key)
+    send_lock = threading.Lock()
+    def send (msg):
+        with send_lock:
+            conn.send(msg)
+    kind, options, cookies = conn.recv()
+    config = configuration.Configuration()
+    config.update(options)
+    socket.setdefaulttimeout(config["timeout"])
+    num_threads = max(1, config["threads"])
+    conn.send(num_threads)
+    aggregate = get_worker_aggregate(config, send)
+    # the login URL has been visited by the coordinator
+    aggregate.cookies = cookies
+    urls = queue.Queue()
+    threads = [WorkerChecker(aggregate, urls, send)
+               for dummy in range(num_threads)]
+    for t in threads:
+        t.start()
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, IOError, OSError):
+            break
+        if msg[0] == "url":
+            urls.put(msg[1:])
+        elif msg[0] == "stop":
+            break
+    for t in threads:
+        t.stop()
+    for t in threads:
+        t.join()
+    aggregate.finish()
+    try:
+        send(("bytes", aggregate.downloaded_bytes))
+    except (IOError, OSError):
+        pass
+    conn.close()
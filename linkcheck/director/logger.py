@@ -33,13 +33,24 @@ class Logger (object):
         self.loggers.extend(config['fileoutput'])
         self.verbose = config["verbose"]
         self.warnings = config["warnings"]
+        # results logged by the interrupted check that is resumed
+        self.resumed_results = []
+
+    def logs_link_names (self):
+        """See if a configured logger logs link names. A logger that is
+        not configured yet might log them."""
+        return any(logger is None or logger.logs_link_names()
+                   for logger in self.loggers)
 
     def start_log_output (self):
         """
-        Start output of all configured loggers.
+        Start output of all configured loggers. The results of a resumed
+        check are counted in the statistics without logging them again.
         """
         for logger in self.loggers:
             logger.start_output()
+            for url_data in self.resumed_results:
+                logger.stats.log_url(url_data, self.do_print(url_data))
 
     def end_log_output (self, **kwargs):
         """
@@ -56,6 +56,9 @@ def href_name (txt):
     if not endtag:
         return name
     name = txt[:endtag.start()]
+    if u"<" not in name and u"&" not in name:
+        # plain text without markup or entities
+        return name
     if img_re.search(name):
         return image_name(name)
     return _unquote(name)
@@ -104,6 +104,10 @@ class TagFinder (object):
     """Base class handling HTML start elements.
     TagFinder instances are used as HtmlParser handlers."""
 
+    # names of the tags given to start_element() by a TagDispatcher,
+    # or None for all tags
+    handled_tags = None
+
     def __init__ (self):
         """Initialize local variables."""
         super(TagFinder, self).__init__()
@@ -124,6 +128,8 @@ class TagFinder (object):
 class MetaRobotsFinder (TagFinder):
     """Class for finding robots.txt meta values in HTML."""
 
+    handled_tags = frozenset(('meta', 'body'))
+
     def __init__ (self):
         """Initialize follow and index flags."""
         super(MetaRobotsFinder, self).__init__()
@@ -167,10 +173,15 @@ class LinkFinder (TagFinder):
     """Find HTML links, and apply them to the callback function with the
     format (url, lineno, column, name, codebase)."""
 
-    def __init__ (self, callback, tags):
-        """Store content in buffer and initialize URL list."""
+    def __init__ (self, callback, tags, link_names=True):
+        """Store content in buffer and initialize URL list. If
+        link_names is not set, all found links get an empty name."""
         super(LinkFinder, self).__init__()
         self.callback = callback
+        self.link_names = link_names
+        # log each tag only on debug level; checked once per parsed content
+        # since start_element() runs for every tag
+        self.debug_tags = log.is_debug(LOG_CHECK)
         # set universal tag attributes using tagname None
         self.universal_attrs = set(tags.get(None, []))
         self.tags = dict()
@@ -178,12 +189,16 @@ class LinkFinder (TagFinder):
             self.tags[tag] = set(attrs)
             # add universal tag attributes
             self.tags[tag].update(self.universal_attrs)
+        if not self.universal_attrs:
+            # the <base> tag is always searched for the base URL
+            self.handled_tags = frozenset(self.tags).union(['base'])
         self.base_ref = u''
 
     def start_element (self, tag, attrs):
         """Search for links and store found URLs in a list."""
-        log.debug(LOG_CHECK, "LinkFinder tag %s attrs %s", tag, attrs)
-        log.debug(LOG_CHECK, "line %d col %d old line %d old col %d", self.parser.lineno(), self.parser.column(), self.parser.last_lineno(), self.parser.last_column())
+        if self.debug_tags:
+            log.debug(LOG_CHECK, "LinkFinder tag %s attrs %s", tag, attrs)
+            log.debug(LOG_CHECK, "line %d col %d old line %d old col %d", self.parser.lineno(), self.parser.column(), self.parser.last_lineno(), self.parser.last_column())
         if tag == "base" and not self.base_ref:
             self.base_ref = attrs.get_true("href", u'')
         tagattrs = self.tags.get(tag, self.universal_attrs)
@@ -194,7 +209,10 @@ class LinkFinder (TagFinder):
             if tag == "form" and not is_form_get(attr, attrs):
                 continue
             # name of this link
-            name = self.get_link_name(tag, attrs, attr)
+            if self.link_names:
+                name = self.get_link_name(tag, attrs, attr)
+            else:
+                name = u""
             # possible codebase
             base = u''
             if tag  == 'applet':
@@ -209,7 +227,8 @@ class LinkFinder (TagFinder):
                 value = 'dns:' + value.rstrip('/')
             # parse tag for URLs
             self.parse_tag(tag, attr, value, name, base)
-        log.debug(LOG_CHECK, "LinkFinder finished tag %s", tag)
+        if self.debug_tags:
+            log.debug(LOG_CHECK, "LinkFinder finished tag %s", tag)
 
     def get_link_name (self, tag, attrs, attr):
         """Parse attrs for link name. Return name of link."""
@@ -261,3 +280,50 @@ class LinkFinder (TagFinder):
         assert isinstance(url, str_text) or url is None, repr(url)
         self.callback(url, line=self.parser.last_lineno(),
                       column=self.parser.last_column(), name=name, base=base)
+
+
+class TagDispatcher (TagFinder):
+    """Feed the start elements of one parser run to several TagFinder
+    handlers. A handler only gets the tags in its handled_tags set.
+    A handler raising StopParse gets no more tags, and parsing stops
+    when no handler is left."""
+
+    def __init__ (self, handlers):
+        """Store handlers."""
+        self.handlers = tuple(handlers)
+        super(TagDispatcher, self).__init__()
+
+    @property
+    def parser (self):
+        """The parser object feeding the tags."""
+        return self._parser
+
+    @parser.setter
+    def parser (self, parser):
+        """Set the parser object of all handlers."""
+        self._parser = parser
+        for handler in self.handlers:
+            handler.parser = parser
+
+    def handles (self, handler):
+        """Check if given handler still gets tags."""
+        return handler in self.handlers
+
+    def remove_handler (self, handler):
+        """Stop feeding tags to given handler."""
+        if handler in self.handlers:
+            self.handlers = tuple(x for x in self.handlers if x is not handler)
+            handler.parser = None
+
+    def start_element (self, tag, attrs):
+        """Feed tag to all handlers interested in it."""
+        for handler in self.handlers:
+            if handler.handled_tags is None or tag in handler.handled_tags:
+                try:
+                    handler.start_element(tag, attrs)
+                except StopParse as msg:
+                    log.debug(LOG_CHECK, "Stopped %s: %s",
+                              handler.__class__.__name__, msg)
+                    self.remove_handler(handler)
+        if not self.handlers:
+            raise StopParse("all handlers stopped")
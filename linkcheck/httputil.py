@@ -15,6 +15,8 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 import base64
+import email.utils
+import time
 from datetime import datetime
 
 
@@ -163,3 +165,25 @@ def get_content_encoding (headers):
     @rtype: string
     """
     return headers.get("Content-Encoding", "").strip()
+
+
+def get_retry_after (headers, now=None):
+    """
+    Get the number of seconds to wait before the next request from the
+    Retry-After header value, which is either a number of seconds or
+    a HTTP date.
+
+    @return: seconds to wait, or None if not found or invalid
+    @rtype: float or None
+    """
+    value = headers.get("Retry-After", "").strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, email.utils.mktime_tz(parsed) - now)
@@ -0,0 +1,131 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Match URLs against the link patterns of the externlinks and internlinks
+options.
+"""
+import re
+
+# characters with a special meaning in regular expressions
+RegexChars = ".^$*+?{}[]|()"
+
+# flags of a regular expression compiled without flags
+DefaultFlags = re.compile(u"").flags
+
+
+def get_literal_prefix (pattern):
+    """Get the ASCII string that a pattern of the form ^literal matches
+    at the start of URLs.
+
+    @return: the literal prefix, or None if the pattern has another form
+    @rtype: string or None
+    """
+    if not pattern.startswith("^"):
+        return None
+    chars = []
+    escaped = False
+    for c in pattern[1:]:
+        if ord(c) > 127:
+            return None
+        if escaped:
+            if c.isalnum() or c == "_":
+                # character class or backreference
+                return None
+            chars.append(c)
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c in RegexChars:
+            return None
+        else:
+            chars.append(c)
+    if escaped or not chars:
+        return None
+    return str("".join(chars))
+
+
+def can_combine (regex):
+    """Check if given compiled pattern can be part of an alternation
+    without changing its meaning."""
+    return (regex.groups == 0 and regex.flags == DefaultFlags and
+            "(?" not in regex.pattern)
+
+
+class LinkMatcher (object):
+    """Match URLs against a list of link patterns from get_link_pat().
+    Consecutive patterns without negation and with the same strict
+    flag are matched at once: literal prefixes with one startswith()
+    call and the other patterns with one combined regular expression.
+    As before, the first matching pattern of the list wins."""
+
+    def __init__ (self, entries):
+        """Compile the link pattern entries."""
+        # number of compiled entries
+        self.size = len(entries)
+        # list of (negate, prefixes, regexes, strict)
+        self.groups = []
+        run = []
+        for entry in entries:
+            if run and (entry["negate"] or
+                        entry["strict"] != run[0]["strict"]):
+                self.add_run(run)
+                run = []
+            if entry["negate"]:
+                self.groups.append((True, (), [entry["pattern"]],
+                                    entry["strict"]))
+            else:
+                run.append(entry)
+        if run:
+            self.add_run(run)
+
+    def add_run (self, run):
+        """Add a group of patterns without negation and with the same
+        strict flag."""
+        prefixes = []
+        combined = []
+        regexes = []
+        for entry in run:
+            regex = entry["pattern"]
+            prefix = get_literal_prefix(regex.pattern)
+            if prefix is not None:
+                prefixes.append(prefix)
+            elif can_combine(regex):
+                combined.append(regex.pattern)
+            else:
+                regexes.append(regex)
+        if len(combined) > 1:
+            try:
+                regex = re.compile(u"|".join(u"(?:%s)" % pattern
+                                             for pattern in combined))
+                regexes.insert(0, regex)
+            except (re.error, UnicodeError):
+                regexes[0:0] = [re.compile(pattern) for pattern in combined]
+        elif combined:
+            regexes.insert(0, re.compile(combined[0]))
+        self.groups.append((False, tuple(prefixes), regexes, run[0]["strict"]))
+
+    def match (self, url):
+        """Get the strict flag of the first link pattern matching given
+        URL, or None if no pattern matches."""
+        for negate, prefixes, regexes, strict in self.groups:
+            if negate:
+                if not regexes[0].search(url):
+                    return strict
+            elif (prefixes and url.startswith(prefixes)) or \
+                 any(regex.search(url) for regex in regexes):
+                return strict
+        return None
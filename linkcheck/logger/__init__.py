@@ -92,6 +92,10 @@ class LogStatistics (object):
         self.avg_number = 0
         # overall downloaded bytes
         self.downloaded_bytes = None
+        # connection reuse counters
+        self.connections = None
+        # URL norm cache counters
+        self.urlnorm = None
 
     def log_url (self, url_data, do_print):
         """Log URL statistics."""
@@ -335,6 +339,13 @@ class _Logger (object):
             return True
         return name in self.logparts
 
+    def logs_link_names (self):
+        """
+        See if link names are logged. Else the names of links found in
+        the checked content need not be searched.
+        """
+        return self.has_part("name")
+
     def part (self, name):
         """
         Return translated part name.
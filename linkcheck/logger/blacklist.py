@@ -52,6 +52,10 @@ class BlacklistLogger (_Logger):
         """
         pass
 
+    def logs_link_names (self):
+        """Link names are not logged."""
+        return False
+
     def log_url (self, url_data):
         """
         Put invalid url in blacklist, delete valid url from blacklist.
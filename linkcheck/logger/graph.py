@@ -42,6 +42,10 @@ class _GraphLogger (_Logger):
         if url_data.valid:
             self.log_url(url_data)
 
+    def logs_link_names (self):
+        """Link names are logged regardless of the log parts."""
+        return True
+
     def get_node (self, url_data):
         """Return new node data or None if node already exists."""
         if not url_data.url:
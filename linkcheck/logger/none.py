@@ -43,6 +43,10 @@ class NoneLogger (_Logger):
         """Do nothing."""
         pass
 
+    def logs_link_names (self):
+        """Link names are not logged."""
+        return False
+
     def end_output (self, **kwargs):
         """
         Do nothing.
@@ -102,6 +102,10 @@ class SitemapXmlLogger (xmllog._XMLLogger):
             and url_data.content_type in HTML_TYPES):
             self.log_url(url_data, priority=priority)
 
+    def logs_link_names (self):
+        """Link names are not logged."""
+        return False
+
     def log_url (self, url_data, priority=None):
         """Log URL data in sitemap format."""
         self.xml_starttag(u'url')
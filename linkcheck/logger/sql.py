@@ -84,6 +84,10 @@ class SQLLogger (_Logger):
             self.writeln()
             self.flush()
 
+    def logs_link_names (self):
+        """Link names are logged regardless of the log parts."""
+        return True
+
     def log_url (self, url_data):
         """
         Store url check info into the database.
@@ -271,6 +271,17 @@ class TextLogger (_Logger):
         self.writeln(_("Statistics:"))
         if self.stats.downloaded_bytes is not None:
             self.writeln(_("Downloaded: %s.") % strformat.strsize(self.stats.downloaded_bytes))
+        if self.stats.connections is not None:
+            self.writeln(_("Connections: %(hits)d reused, %(misses)d new, "
+              "%(handshakes)d TLS handshakes, %(evictions)d closed after "
+              "idle timeout.") % self.stats.connections)
+        if self.stats.urlnorm is not None:
+            hits = self.stats.urlnorm["hits"]
+            total = hits + self.stats.urlnorm["misses"]
+            if total:
+                self.writeln(_("Normed URLs: %(hits)d of %(total)d cached"
+                  " (%(rate)d%%).") % dict(hits=hits, total=total,
+                  rate=hits * 100 // total))
         if self.stats.number > 0:
             self.writeln(_(
               "Content types: %(image)d image, %(text)d text, %(video)d video, "
@@ -287,6 +298,8 @@ class TextLogger (_Logger):
         """Write end of output info, and flush all output buffers."""
         self.stats.downloaded_bytes = kwargs.get("downloaded_bytes")
         self.stats.num_urls = kwargs.get("num_urls")
+        self.stats.connections = kwargs.get("connections")
+        self.stats.urlnorm = kwargs.get("urlnorm")
         if self.has_part('stats'):
             self.write_stats()
         if self.has_part('outro'):
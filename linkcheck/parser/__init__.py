@@ -17,19 +17,32 @@
 """
 Main functions for link parsing
 """
-import threading
-
+import re
 from .. import log, LOG_CHECK, strformat, url as urlutil
 from ..htmlutil import linkparse
 from ..HtmlParser import htmlsax
 from ..bookmarks import firefox
 
-# Is needed within find_links around non-threadsafe call
-parse_mutex = threading.Lock()
+# end tag of a HTML link in raw content
+a_end_re = re.compile(br"(?i)</a\s*>")
+
+# start of a HTML link end tag at the end of raw content
+a_end_start_re = re.compile(br"(?i)<(?:/(?:a\s*)?)?\Z")
 
 
 def parse_url(url_data):
-    """Parse a URL."""
+    """Parse a URL. If a parser pool is configured, the content is parsed
+    in a worker process."""
+    key = get_pagetype(url_data)
+    parser_pool = url_data.aggregate.parser_pool
+    if parser_pool is not None and parser_pool.handles(key):
+        parser_pool.parse(url_data, key)
+    else:
+        parse_pagetype(url_data, key)
+
+
+def get_pagetype(url_data):
+    """Determine the parse routine key for given URL."""
     if url_data.is_directory():
         # both ftp and file links represent directories as HTML data
         key = "html"
@@ -41,6 +54,11 @@ def parse_url(url_data):
         # determine parse routine according to content types
         mime = url_data.content_type
         key = url_data.ContentMimetypes[mime]
+    return key
+
+
+def parse_pagetype(url_data, key):
+    """Parse URL content with the parse routine for given key."""
     funcname = "parse_"+key
     if funcname in globals():
         globals()[funcname](url_data)
@@ -52,7 +70,13 @@ def parse_html (url_data):
     """Parse into HTML content and search for URLs to check.
     Found URLs are added to the URL queue.
     """
-    find_links(url_data, url_data.add_url, linkparse.LinkTags)
+    if url_data.link_stream is not None and \
+       url_data.link_stream.search_links:
+        # the links have been searched in one pass with the meta
+        # robots flags and the plugin tags
+        url_data.link_stream.add_links()
+    else:
+        find_links(url_data, url_data.add_url, linkparse.LinkTags)
 
 
 def parse_opera (url_data):
@@ -123,7 +147,8 @@ def find_links (url_data, callback, tags):
     Found URLs are added to the URL queue.
     """
     # construct parser object
-    handler = linkparse.LinkFinder(callback, tags)
+    handler = linkparse.LinkFinder(callback, tags,
+                                   link_names=url_data.aggregate.link_names)
     parser = htmlsax.parser(handler)
     if url_data.charset:
         parser.encoding = url_data.charset
@@ -131,9 +156,8 @@ def find_links (url_data, callback, tags):
     # parse
     try:
         content = url_data.get_raw_content()
-        with parse_mutex:
-            parser.feed(content)
-            parser.flush()
+        parser.feed(content)
+        parser.flush()
     except linkparse.StopParse as msg:
         log.debug(LOG_CHECK, "Stopped parsing: %s", msg)
         pass
@@ -142,6 +166,202 @@ def find_links (url_data, callback, tags):
     parser.handler = None
 
 
+def get_parse_end (data):
+    """Get the length of the content part that can be parsed before
+    more content is available: up to one byte after the last </a> end
+    tag. Link names are read ahead of the parse position up to this end
+    tag, and the parser does not read ahead the last byte."""
+    pos = 0
+    for mo in a_end_re.finditer(data):
+        if mo.end() < len(data):
+            pos = mo.end() + 1
+    return pos
+
+
+def get_scan_start (data, pos):
+    """Get the position of an incomplete </a> end tag at the end of
+    data, which is searched again with more content. The search starts
+    at pos."""
+    start = data.rfind(b"<", pos)
+    if start >= 0 and a_end_start_re.match(data, start):
+        return start
+    mo = a_end_re.match(data, start) if start >= 0 else None
+    if mo is not None and mo.end() == len(data):
+        # the end tag needs one more byte
+        return start
+    return len(data)
+
+
+class LinkStream (object):
+    """Parse HTML content in one pass, while it is downloaded or after
+    the download. The meta robots flags, the links and the tags of
+    interest to content plugins are searched in the same parser run.
+    Found links are held during the download, so that a failed download
+    queues none of them. They are queued when the download has finished,
+    unless they are held until add_links() is called after the content
+    check."""
+
+    def __init__ (self, url_data, hold_links, search_links=True):
+        """Construct the parser. If hold_links is set, all links are
+        held until add_links() is called. If search_links is not set,
+        only the meta robots flags and the plugin tags are searched."""
+        self.url_data = url_data
+        self.hold_links = hold_links
+        self.search_links = search_links
+        self.robots = linkparse.MetaRobotsFinder()
+        handlers = [self.robots]
+        if search_links:
+            self.link_finder = linkparse.LinkFinder(self.found_link,
+                linkparse.LinkTags, link_names=url_data.aggregate.link_names)
+            handlers.append(self.link_finder)
+        else:
+            self.link_finder = None
+        plugin_manager = url_data.aggregate.plugin_manager
+        # handlers of content plugins by plugin class name
+        self.plugin_handlers = plugin_manager.get_tag_handlers(url_data)
+        handlers.extend(self.plugin_handlers.values())
+        self.handler = linkparse.TagDispatcher(handlers)
+        self.parser = htmlsax.parser(self.handler)
+        if url_data.charset:
+            self.parser.encoding = url_data.charset
+        self.handler.parser = self.parser
+        self.maxbytes = url_data.aggregate.config["maxfilesizeparse"]
+        # number of downloaded bytes
+        self.size = 0
+        # chunks of downloaded content that have not been parsed yet
+        self.tail = []
+        # number of bytes in self.tail
+        self.tail_size = 0
+        # end of self.tail that may contain the start of a </a> end tag
+        self.scan_data = b""
+        # list of (url, keyword arguments) of held links
+        self.links = []
+        self.stopped = False
+
+    @property
+    def follow (self):
+        """False if the meta robots flags forbid recursion."""
+        return self.robots.follow
+
+    @property
+    def robots_found (self):
+        """True if the meta robots flags are known."""
+        return not self.handler.handles(self.robots)
+
+    def get_handler (self, plugin):
+        """Get the tag handler of given content plugin."""
+        return self.plugin_handlers[plugin.__class__.__name__]
+
+    def feed (self, data):
+        """Parse the next chunk of content."""
+        self.size += len(data)
+        if self.stopped:
+            return
+        if self.size > self.maxbytes and self.link_finder is not None:
+            log.debug(LOG_CHECK, "Stopped searching links: maximum parse size")
+            self.stop_links()
+        # only the new data is searched for </a> end tags
+        scan_data = self.scan_data + data
+        scan_pos = self.tail_size - len(self.scan_data)
+        self.tail.append(data)
+        self.tail_size += len(data)
+        end = get_parse_end(scan_data)
+        self.scan_data = scan_data[get_scan_start(scan_data, end):]
+        if end:
+            pos = scan_pos + end
+            data = b"".join(self.tail)
+            self.tail = [data[pos:]]
+            self.tail_size = len(self.tail[0])
+            self.parse(data[:pos])
+
+    def finish (self):
+        """Parse the rest of the content after the download, and queue
+        the found links unless they are held."""
+        if not self.stopped:
+            data = b"".join(self.tail)
+            self.tail = []
+            self.parse(data, flush=True)
+        if not self.stopped:
+            self.stop()
+        if not self.hold_links and self.robots_found and self.follow:
+            self.add_links()
+
+    def parse_content (self, content):
+        """Parse the complete content after the download."""
+        self.size = len(content)
+        self.tail = [content]
+        self.finish()
+
+    def parse (self, data, flush=False):
+        """Feed data to the parser. Stop searching links if the meta
+        robots flags forbid recursion."""
+        try:
+            self.parser.feed(data)
+            if flush:
+                self.parser.flush()
+        except linkparse.StopParse as msg:
+            log.debug(LOG_CHECK, "Stopped parsing: %s", msg)
+            self.stop()
+        if self.link_finder is not None and self.robots_found and \
+           not self.follow:
+            log.debug(LOG_CHECK, "Stopped searching links: found <meta name=robots>")
+            self.stop_links()
+
+    def stop_links (self):
+        """Stop searching links and drop the held links, since the
+        content is not parsed for recursion."""
+        self.links = []
+        self.handler.remove_handler(self.link_finder)
+        self.link_finder = None
+        if not self.handler.handlers:
+            self.stop()
+
+    def stop (self):
+        """Stop parsing."""
+        self.stopped = True
+        self.tail = []
+        self.tail_size = 0
+        self.scan_data = b""
+        # break cyclic dependencies
+        self.handler.parser = None
+        self.parser.handler = None
+
+    def found_link (self, url, **kwargs):
+        """Hold the found link."""
+        self.links.append((url, kwargs))
+
+    def add_links (self):
+        """Queue the held links."""
+        links, self.links = self.links, []
+        for url, kwargs in links:
+            self.url_data.add_url(url, **kwargs)
+
+
+def scan_html (url_data):
+    """Get the LinkStream of the HTML content of url_data. If the content
+    has not been parsed while it was downloaded, it is parsed now.
+    Links are searched only if they are needed for recursion, not
+    searched in a parser process and not stored in the disk cache for
+    the same content."""
+    # downloading the content can start parsing it
+    content = url_data.get_raw_content()
+    if url_data.link_stream is None:
+        aggregate = url_data.aggregate
+        parser_pool = aggregate.parser_pool
+        search_links = url_data.allows_simple_recursion() and \
+          url_data.size <= aggregate.config["maxfilesizeparse"] and \
+          not (parser_pool is not None and parser_pool.handles("html"))
+        disk_cache = aggregate.disk_cache
+        if search_links and disk_cache is not None:
+            # the links of unchanged content are queued from the disk cache
+            search_links = disk_cache.get_links(url_data.cache_url,
+                url_data.get_content_hash()) is None
+        stream = LinkStream(url_data, True, search_links=search_links)
+        stream.parse_content(content)
+        url_data.link_stream = stream
+    return url_data.link_stream
+
+
 def parse_firefox (url_data):
     """Parse a Firefox3 bookmark file."""
     filename = url_data.get_os_filename()
@@ -0,0 +1,171 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2000-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Parse downloaded content in a pool of worker processes.
+
+The checker threads parse content while holding the Python interpreter
+lock, so pages are effectively parsed one at a time. The parser pool
+ships the raw content of a page together with its charset and base URL
+to a worker process which runs the parse routine and sends back the
+found URLs as compact tuples. The checker thread then adds those URLs
+to the queue as if the page had been parsed locally.
+"""
+import multiprocessing
+import signal
+from . import parse_pagetype
+from .. import log, LOG_CHECK, plugins, charsetutil
+
+# Page types whose parse routines only need the downloaded content.
+# Directory listings, bookmark databases and itms-services URLs need
+# access to the local file system or the URL itself and are parsed by
+# the checker threads.
+PoolPageTypes = frozenset((
+    "html", "wml", "css", "swf", "text", "opera", "chromium", "safari",
+    "sitemap", "sitemapindex", "pdf",
+))
+
+# The plugin manager of a worker process, set by init_worker().
+_plugin_manager = None
+
+
+class ParserPool(object):
+    """Dispatch parse jobs of checker threads to worker processes."""
+
+    def __init__(self, processes, config, plugin_manager):
+        """Start given number of worker processes. Enabled plugins that
+        can run in a worker are loaded in each worker process."""
+        names = plugin_manager.get_worker_plugin_names()
+        plugin_config = dict(
+            pluginfolders=config["pluginfolders"],
+            enabledplugins=names,
+        )
+        for name in names:
+            plugin_config[name] = config[name]
+        log.debug(LOG_CHECK, "Start %d parser processes with plugins %s",
+                  processes, names)
+        self.pool = multiprocessing.Pool(processes, init_worker,
+                                         (plugin_config,))
+
+    def handles(self, pagetype):
+        """Return True iff pages of given type can be parsed in a
+        worker process."""
+        return pagetype in PoolPageTypes
+
+    def parse(self, url_data, pagetype):
+        """Parse content of url_data with the parse routine for pagetype."""
+        self.run_job(url_data, "parse", pagetype)
+
+    def run_plugin(self, plugin, url_data):
+        """Run the check method of given plugin for url_data."""
+        self.run_job(url_data, "plugin", plugin.__class__.__name__)
+
+    def run_job(self, url_data, kind, name):
+        """Send content of url_data to a worker process and add the
+        found URLs and warnings to url_data."""
+        job = (kind, name, url_data.url, url_data.base_url,
+               url_data.charset, url_data.get_raw_content(),
+               url_data.aggregate.link_names)
+        urls, warnings = self.pool.apply_async(run_job, (job,)).get()
+        for tag, msg in warnings:
+            url_data.add_warning(msg, tag=tag)
+        for url, line, column, page, name, base in urls:
+            url_data.add_url(url, line=line, column=column, page=page,
+                             name=name, base=base)
+
+    def terminate(self):
+        """Stop all worker processes."""
+        self.pool.terminate()
+        self.pool.join()
+
+
+def init_worker(plugin_config):
+    """Initialize a worker process. Interrupts are handled by the
+    main process only."""
+    global _plugin_manager
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _plugin_manager = plugins.PluginManager(plugin_config)
+
+
+def run_job(job):
+    """Parse content in a worker process.
+    @return: tuple (urls, warnings) with found URL tuples
+      (url, line, column, page, name, base) and warning tuples (tag, msg)
+    """
+    kind, name, url, base_url, charset, data, link_names = job
+    url_data = ContentData(url, base_url, charset, data, link_names)
+    if kind == "parse":
+        parse_pagetype(url_data, name)
+    else:
+        _plugin_manager.get_plugin(name).check(url_data)
+    return url_data.urls, url_data.warnings
+
+
+class WorkerAggregate(object):
+    """Aggregate replacement for parse routines in a worker process."""
+
+    parser_pool = None
+
+    def __init__(self, link_names):
+        """Store if the names of found links are searched."""
+        self.link_names = link_names
+
+    @property
+    def plugin_manager(self):
+        """Return the plugin manager of this worker process."""
+        return _plugin_manager
+
+
+class ContentData(object):
+    """URL data replacement holding the downloaded content in a worker
+    process. Found URLs and warnings are recorded instead of being
+    added to the URL queue."""
+
+    # the content is parsed after the download
+    link_stream = None
+
+    def __init__(self, url, base_url, charset, data, link_names=True):
+        """Store content data."""
+        self.aggregate = WorkerAggregate(link_names)
+        self.url = url
+        self.base_url = base_url
+        self.charset = charset
+        self.data = data
+        self.text = None
+        self.encoding = None
+        self.urls = []
+        self.warnings = []
+
+    def get_raw_content(self):
+        """Return the downloaded content."""
+        return self.data
+
+    def get_content(self):
+        """Return the downloaded content decoded to unicode."""
+        if self.text is None:
+            self.text, self.encoding = charsetutil.decode(self.data,
+                                                          self.charset)
+        return self.text
+
+    def add_warning(self, s, tag=None):
+        """Record a warning."""
+        item = (tag, s)
+        if item not in self.warnings:
+            self.warnings.append(item)
+
+    def add_url(self, url, line=0, column=0, page=0, name=u"", base=None):
+        """Record a found URL."""
+        self.urls.append((url, line, column, page, name, base))
@@ -25,6 +25,10 @@ class _PluginBase(object):
     """Basic plugin class featuring plugin identification and
     helper functions."""
 
+    # Set to True if check() only reads the URL content and adds found
+    # URLs and warnings. The plugin can then run in a parser process.
+    ParseInWorker = False
+
     def __init__(self, config):
         """Add plugin-specific configuration."""
         pass
@@ -52,7 +56,17 @@ class _ConnectionPlugin(_PluginBase):
 
 class _ContentPlugin(_PluginBase):
     """Plugins run for valid URLs with content."""
-    pass
+
+    # Set to True if check() only uses the handler of get_tag_handler()
+    # and does not read the URL content itself.
+    OnlyParsesTags = False
+
+    def get_tag_handler(self, url_data):
+        """Return a TagFinder searching the HTML content of url_data
+        in the same parser run as the links, or None. The check() method
+        gets the handler back with parser.scan_html(url_data).get_handler().
+        """
+        return None
 
 
 class _ParserPlugin(_PluginBase):
@@ -105,10 +119,49 @@ class PluginManager(object):
                 else:
                     raise ValueError("Invalid plugin class %s" % pluginclass)
 
+    def get_plugin(self, name):
+        """Get the enabled plugin instance with given class name."""
+        for plugin in self.get_plugins():
+            if plugin.__class__.__name__ == name:
+                return plugin
+        raise ValueError("Plugin %s is not enabled" % name)
+
+    def get_plugins(self):
+        """Get all enabled plugin instances."""
+        return self.connection_plugins + self.content_plugins + \
+            self.parser_plugins
+
+    def get_worker_plugin_names(self):
+        """Get class names of enabled plugins that can run in a parser
+        process."""
+        return [plugin.__class__.__name__ for plugin in self.get_plugins()
+                if plugin.ParseInWorker]
+
     def run_connection_plugins(self, url_data):
         """Run all connection plugins."""
         run_plugins(self.connection_plugins, url_data)
 
+    def get_tag_handlers(self, url_data):
+        """Get the HTML tag handlers of the content plugins applying to
+        given URL as a dictionary {plugin class name: handler}."""
+        handlers = {}
+        for plugin in self.content_plugins:
+            if plugin.applies_to(url_data):
+                handler = plugin.get_tag_handler(url_data)
+                if handler is not None:
+                    handlers[plugin.__class__.__name__] = handler
+        return handlers
+
+    def needs_content(self, url_data):
+        """Check if a content plugin reads the content of given URL."""
+        return any(not plugin.OnlyParsesTags and plugin.applies_to(url_data)
+                   for plugin in self.content_plugins)
+
+    def has_content_plugins(self, url_data):
+        """Check if a content plugin applies to given URL."""
+        return any(plugin.applies_to(url_data)
+                   for plugin in self.content_plugins)
+
     def run_content_plugins(self, url_data):
         """Run all content plugins."""
         run_plugins(self.content_plugins, url_data)
@@ -123,6 +176,10 @@ def run_plugins(plugins, url_data, stop_after_match=False, **kwargs):
     for plugin in plugins:
         log.debug(LOG_PLUGIN, "Run plugin %s", plugin.__class__.__name__)
         if plugin.applies_to(url_data, **kwargs):
-            plugin.check(url_data)
+            parser_pool = url_data.aggregate.parser_pool
+            if parser_pool is not None and plugin.ParseInWorker:
+                parser_pool.run_plugin(plugin, url_data)
+            else:
+                plugin.check(url_data)
             if stop_after_match:
                 break
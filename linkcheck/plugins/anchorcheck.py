@@ -20,38 +20,66 @@ Check HTML anchors
 from . import _ContentPlugin
 from .. import log, LOG_PLUGIN, url as urlutil
 from ..htmlutil import linkparse
-from ..parser import find_links
+from ..parser import scan_html
+
+
+class AnchorFinder(linkparse.TagFinder):
+    """Collect the anchor names of HTML content: the id attributes of
+    all tags and the name attributes of <a> tags. Parsing stops when
+    the searched anchor is found."""
+
+    def __init__(self, anchor, encoding):
+        """Initialize the searched anchor in quoted form, the URL
+        encoding used for quoting and the set of found anchors."""
+        super(AnchorFinder, self).__init__()
+        self.anchor = anchor
+        self.encoding = encoding
+        self.found = False
+        # set of parsed anchors
+        self.anchors = set()
+
+    def start_element(self, tag, attrs):
+        """Search for id and name attributes."""
+        self.add_anchor(attrs.get(u'id'))
+        if tag == u'a':
+            self.add_anchor(attrs.get(u'name'))
+
+    def add_anchor(self, name):
+        """Add anchor name and stop if it is the searched anchor."""
+        if name:
+            self.anchors.add(name)
+            if urlutil.url_quote_part(name, encoding=self.encoding) == \
+               self.anchor:
+                self.found = True
+                raise linkparse.StopParse("found anchor %r" % name)
 
 
 class AnchorCheck(_ContentPlugin):
     """Checks validity of HTML anchors."""
 
+    OnlyParsesTags = True
+
     def applies_to(self, url_data):
         """Check for HTML anchor existence."""
         return url_data.is_html() and url_data.anchor
 
+    def get_tag_handler(self, url_data):
+        """Search anchors in the parser run of the URL content."""
+        return AnchorFinder(url_data.anchor, url_data.encoding)
+
     def check(self, url_data):
         """Check content for invalid anchors."""
         log.debug(LOG_PLUGIN, "checking content for invalid anchors")
-        # list of parsed anchors
-        self.anchors = []
-        find_links(url_data, self.add_anchor, linkparse.AnchorTags)
-        self.check_anchor(url_data)
-
-    def add_anchor (self, url, line, column, name, base):
-        """Add anchor URL."""
-        self.anchors.append((url, line, column, name, base))
-
-    def check_anchor(self, url_data):
-        """If URL is valid, parseable and has an anchor, check it.
-        A warning is logged and True is returned if the anchor is not found.
-        """
-        log.debug(LOG_PLUGIN, "checking anchor %r in %s", url_data.anchor, self.anchors)
-        enc = lambda anchor: urlutil.url_quote_part(anchor, encoding=url_data.encoding)
-        if any(x for x in self.anchors if enc(x[0]) == url_data.anchor):
-            return
-        if self.anchors:
-            anchornames = sorted(set(u"`%s'" % x[0] for x in self.anchors))
+        handler = scan_html(url_data).get_handler(self)
+        if not handler.found:
+            self.add_anchor_warning(url_data, handler.anchors)
+
+    def add_anchor_warning(self, url_data, anchors):
+        """Warn that the anchor of the URL is not one of the found
+        anchors."""
+        log.debug(LOG_PLUGIN, "anchor %r not in %s", url_data.anchor, anchors)
+        if anchors:
+            anchornames = sorted(u"`%s'" % x for x in anchors)
             anchors = u", ".join(anchornames)
         else:
             anchors = u"-"
@@ -36,6 +36,8 @@ from builtins import str as str_text
 class MarkdownCheck(_ContentPlugin):
     """Markdown parsing plugin."""
 
+    ParseInWorker = True
+
     _filename_re_key = "filename_re"
     _default_filename_re = re.compile(r'.*\.(markdown|md(own)?|mkdn?)$')
 
@@ -66,6 +66,8 @@ def search_url(obj, url_data, pageno, seen_objs):
 class PdfParser(_ParserPlugin):
     """PDF parsing plugin."""
 
+    ParseInWorker = True
+
     def __init__(self, config):
         """Check for pdfminer."""
         if not has_pdflib:
@@ -19,7 +19,10 @@ Robots.txt parser.
 
 The robots.txt Exclusion Protocol is implemented as specified in
 http://www.robotstxt.org/wc/norobots-rfc.html
+Rule lines are matched like the major search engines do: the longest
+matching rule path wins, and paths can use the wildcards * and $.
 """
+import re
 try:  # Python 3
     from urllib import parse
 except ImportError:  # Python 2
@@ -64,6 +67,8 @@ class RobotFileParser (object):
         self.last_checked = 0
         # list of tuples (sitemap url, line number)
         self.sitemap_urls = []
+        # mapping {user agent -> applying entry or None}
+        self.agent_entries = {}
 
     def mtime (self):
         """Returns the time the robots.txt file was last fetched.
@@ -213,6 +218,7 @@ class RobotFileParser (object):
                 pass
         if state in (1, 2):
             self.entries.append(entry)
+        self.agent_entries = {}
         self.modified()
         log.debug(LOG_CHECK, "Parsed rules:\n%s", str(self))
 
@@ -233,18 +239,34 @@ class RobotFileParser (object):
         if self.allow_all:
             log.debug(LOG_CHECK, " ... allow all.")
             return True
-        # search for given user agent matches
-        # the first match counts
-        url = parse.quote(urlparse(parse.unquote(url))[2]) or "/"
+        entry = self.get_entry(useragent)
+        if entry is None:
+            # agent not found ==> access granted
+            log.debug(LOG_CHECK, " ... agent not found, allow.")
+            return True
+        allowed = entry.allowance(get_rule_path(url))
+        log.debug(LOG_CHECK, " ... %s.", "allow" if allowed else "disallow")
+        return allowed
+
+    def get_entry (self, useragent):
+        """Get the entry applying to given user agent. The first
+        matching entry counts, the default entry is tried last.
+        The entry of each user agent is only searched once.
+
+        @return: applying entry, or None if no entry applies
+        @rtype: Entry or None
+        """
+        try:
+            return self.agent_entries[useragent]
+        except KeyError:
+            pass
         for entry in self.entries:
             if entry.applies_to(useragent):
-                return entry.allowance(url)
-        # try the default entry last
-        if self.default_entry is not None:
-            return self.default_entry.allowance(url)
-        # agent not found ==> access granted
-        log.debug(LOG_CHECK, " ... agent not found, allow.")
-        return True
+                break
+        else:
+            entry = self.default_entry
+        self.agent_entries[useragent] = entry
+        return entry
 
     def get_crawldelay (self, useragent):
         """Look for a configured crawl delay.
@@ -270,9 +292,21 @@ class RobotFileParser (object):
         return "\n\n".join(lines)
 
 
+def get_rule_path (url):
+    """Get the quoted path and query of given URL, in the form
+    that rule line paths are matched against."""
+    parts = urlparse(parse.unquote(url))
+    path = parts[2]
+    if parts[4]:
+        path += "?" + parts[4]
+    return parse.quote(path) or "/"
+
+
 class RuleLine (object):
     """A rule line is a single "Allow:" (allowance==1) or "Disallow:"
-    (allowance==0) followed by a path.
+    (allowance==0) followed by a path. The path may contain the
+    wildcard * matching any characters, and end with $ to match
+    only whole paths.
     """
 
     def __init__ (self, path, allowance):
@@ -281,8 +315,19 @@ class RuleLine (object):
             # an empty value means allow all
             allowance = True
             path = '/'
-        self.path = urlutil.url_quote_part(path)
+        end = path.endswith("$")
+        if end:
+            path = path[:-1]
+        parts = [urlutil.url_quote_part(part) for part in path.split("*")]
+        self.path = "*".join(parts) + ("$" if end else "")
         self.allowance = allowance
+        if end or len(parts) > 1:
+            pattern = ".*".join(re.escape(part) for part in parts)
+            if end:
+                pattern += r"\Z"
+            self.regex = re.compile(pattern, re.DOTALL)
+        else:
+            self.regex = None
 
     def applies_to (self, path):
         """Look if given path applies to this rule.
@@ -290,7 +335,9 @@ class RuleLine (object):
         @return: True if pathname applies to this rule, else False
         @rtype: bool
         """
-        return self.path == "*" or path.startswith(self.path)
+        if self.regex is not None:
+            return self.regex.match(path) is not None
+        return path.startswith(self.path)
 
     def __str__ (self):
         """Construct string representation in robots.txt format.
@@ -301,6 +348,55 @@ class RuleLine (object):
         return ("Allow" if self.allowance else "Disallow")+": "+self.path
 
 
+class RuleMatcher (object):
+    """Find the longest rule line path matching a path. Paths without
+    wildcards are looked up by their length, paths with wildcards are
+    tried longest first. If an Allow and a Disallow path of the same
+    length match, the Allow line wins."""
+
+    def __init__ (self, rulelines):
+        """Sort the rule lines of an entry."""
+        # mapping {literal path -> allowance}
+        self.prefixes = {}
+        wildcards = {}
+        for line in rulelines:
+            if line.regex is None:
+                rules, key = self.prefixes, line.path
+            else:
+                rules, key = wildcards, (line.path, line.regex)
+            rules[key] = rules.get(key, False) or line.allowance
+        # distinct lengths of literal paths, longest first
+        self.lengths = sorted(set(len(path) for path in self.prefixes),
+                              reverse=True)
+        # list of (path length, allowance, regex), longest first
+        self.wildcards = sorted(((len(path), allowance, regex)
+            for (path, regex), allowance in wildcards.items()),
+            key=lambda rule: (-rule[0], not rule[1]))
+
+    def allowance (self, path):
+        """Check if the longest matching rule line allows given path.
+
+        @return: True if allowed or no rule line matches, else False
+        @rtype: bool
+        """
+        length = -1
+        allowance = True
+        for prefix_length in self.lengths:
+            if prefix_length > len(path):
+                continue
+            value = self.prefixes.get(path[:prefix_length])
+            if value is not None:
+                length, allowance = prefix_length, value
+                break
+        for rule_length, value, regex in self.wildcards:
+            if rule_length < length or \
+               (rule_length == length and (allowance or not value)):
+                break
+            if regex.match(path) is not None:
+                return value
+        return allowance
+
+
 class Entry (object):
     """An entry has one or more user-agents and zero or more rulelines."""
 
@@ -309,6 +405,8 @@ class Entry (object):
         self.useragents = []
         self.rulelines = []
         self.crawldelay = 0
+        # compiled rule lines
+        self.matcher = None
 
     def __str__ (self):
         """string representation in robots.txt format.
@@ -345,14 +443,11 @@ class Entry (object):
         - filename is URL decoded
 
         Check if given filename is allowed to acces this entry.
+        The rule lines are compiled on the first call.
 
         @return: True if allowed, else False
         @rtype: bool
         """
-        for line in self.rulelines:
-            log.debug(LOG_CHECK, "%s %s %s", filename, str(line), line.allowance)
-            if line.applies_to(filename):
-                log.debug(LOG_CHECK, " ... rule line %s", line)
-                return line.allowance
-        log.debug(LOG_CHECK, " ... no rule lines of %s applied to %s; allowed.", self.useragents, filename)
-        return True
+        if self.matcher is None:
+            self.matcher = RuleMatcher(self.rulelines)
+        return self.matcher.allowance(filename)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright (C) 2012-2014 Bastian Kleineidam
+"""Compare the per-page CPU time and peak memory of content decoding
+with BeautifulSoup encoding sniffing and with linkcheck.charsetutil.
+
+Usage: $0 [<filename>...]
+
+Without arguments generated HTML pages of increasing size are used.
+Peak memory is only measured with the tracemalloc module (Python 3).
+"""
+from __future__ import print_function
+import sys
+import os
+import timeit
+sys.path.append(os.getcwd())
+import linkcheck.charsetutil
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def decode_soup(data):
+    """Decode data like UrlBase.get_content() did before."""
+    soup = BeautifulSoup(data, "html.parser")
+    return data.decode(soup.original_encoding), soup.original_encoding
+
+
+def decode_charsetutil(data):
+    """Decode data with the charset detector."""
+    return linkcheck.charsetutil.decode(data)
+
+
+def make_page(numlinks):
+    """Generate an UTF-8 encoded HTML page with given number of links."""
+    parts = [b'<html><head><meta charset="utf-8"><title>bench</title>'
+             b'</head><body>\n']
+    for i in range(numlinks):
+        parts.append(b'<p>Caf\xc3\xa9 <a href="/page%d.html">link %d</a></p>\n'
+                     % (i, i))
+    parts.append(b'</body></html>\n')
+    return b"".join(parts)
+
+
+def measure(func, data):
+    """Return tuple (seconds per call, peak memory in bytes or None)."""
+    number = 3
+    seconds = timeit.timeit(lambda: func(data), number=number) / number
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        func(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def format_peak(peak):
+    """Format peak memory in KB."""
+    if peak is None:
+        return "n/a"
+    return "%dKB" % (peak // 1024)
+
+
+def main(args):
+    """Print timing and memory of both decoding methods."""
+    if BeautifulSoup is None:
+        print("The bs4 module is needed for this benchmark.")
+        return 1
+    if args:
+        pages = []
+        for filename in args:
+            with open(filename, 'rb') as fd:
+                pages.append((filename, fd.read()))
+    else:
+        pages = [("generated", make_page(n)) for n in (1000, 10000, 50000)]
+    for name, data in pages:
+        soup_time, soup_peak = measure(decode_soup, data)
+        new_time, new_peak = measure(decode_charsetutil, data)
+        print("%s (%dKB):" % (name, len(data) // 1024))
+        print("  BeautifulSoup: %8.4fs %10s" % (soup_time, format_peak(soup_peak)))
+        print("  charsetutil:   %8.4fs %10s" % (new_time, format_peak(new_peak)))
+        print("  speedup: %.1fx" % (soup_time / max(new_time, 1e-9)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
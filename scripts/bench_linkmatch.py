@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# Copyright (C) 2012-2014 Bastian Kleineidam
+"""Compare the time to match URLs against large externlinks pattern
+sets one pattern at a time and with the compiled link matcher.
+
+Usage: $0 [<number of patterns> [<number of URLs>]]
+
+Half of the patterns are literal host prefixes, the other half are
+path regular expressions. Most URLs match no pattern, which is the
+worst case for the pattern loop.
+"""
+from __future__ import print_function
+import sys
+import os
+import time
+sys.path.append(os.getcwd())
+from linkcheck import get_link_pat
+from linkcheck.linkmatch import LinkMatcher
+
+
+def naive_match(entries, url):
+    """Match URL against each pattern entry in turn."""
+    for entry in entries:
+        match = entry['pattern'].search(url)
+        if (entry['negate'] and not match) or \
+           (match and not entry['negate']):
+            return entry['strict']
+    return None
+
+
+def make_patterns(num):
+    """Generate host prefix and path patterns."""
+    entries = []
+    for i in range(num):
+        if i % 2:
+            pattern = u"/archive%d/.*\\.pdf$" % i
+        else:
+            pattern = u"^http://host%d\\.example\\.com/" % i
+        entries.append(get_link_pat(pattern, strict=True))
+    return entries
+
+
+def make_urls(num, num_patterns):
+    """Generate URLs of which every tenth matches a pattern."""
+    urls = []
+    for i in range(num):
+        if i % 10:
+            urls.append(u"http://www%d.example.org/page%d.html" % (i, i))
+        else:
+            urls.append(u"http://host%d.example.com/" %
+                        (i % num_patterns & ~1))
+    return urls
+
+
+def report(name, num, seconds):
+    """Print the time per URL."""
+    print("  %-9s %8.3fs %8.2fus/URL" % (name, seconds, seconds * 1e6 / num))
+
+
+def main(args):
+    """Match the URLs with both methods and print the timings."""
+    num_patterns = int(args[0]) if args else 500
+    num = int(args[1]) if len(args) > 1 else 10000
+    entries = make_patterns(num_patterns)
+    urls = make_urls(num, num_patterns)
+    print("%d URLs, %d patterns:" % (num, num_patterns))
+    start = time.time()
+    expected = [naive_match(entries, url) for url in urls]
+    report("naive", num, time.time() - start)
+    start = time.time()
+    matcher = LinkMatcher(entries)
+    print("  %-9s %8.3fs" % ("compile", time.time() - start))
+    start = time.time()
+    result = [matcher.match(url) for url in urls]
+    report("compiled", num, time.time() - start)
+    assert result == expected
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
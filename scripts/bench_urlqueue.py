@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright (C) 2012-2014 Bastian Kleineidam
+"""Measure the put(), promote() and get() times of a URL queue with
+1M entries spread over several hosts and recursion levels.
+
+Usage: $0 [<number of URLs> [<number of hosts>]]
+
+Every 100th URL gets promoted as if its result was cached by a redirect
+before it was checked.
+"""
+from __future__ import print_function
+import sys
+import os
+import time
+sys.path.append(os.getcwd())
+from linkcheck.cache.results import ResultCache
+from linkcheck.cache.urlqueue import UrlQueue
+
+
+class Aggregate(object):
+    """Aggregate with the result cache used by the queue."""
+
+    def __init__(self):
+        self.result_cache = ResultCache(max_size=1000)
+
+
+class UrlData(object):
+    """Queued URL with host and recursion level."""
+
+    has_result = False
+
+    def __init__(self, url, host, recursion_level, aggregate):
+        self.url = self.cache_url = url
+        self.host = host
+        self.recursion_level = recursion_level
+        self.aggregate = aggregate
+
+    def get_throttled_host(self):
+        return self.host
+
+
+def make_urls(num, num_hosts):
+    """Generate URLs of increasing recursion level."""
+    aggregate = Aggregate()
+    urls = []
+    for i in range(num):
+        host = "host%d.example.org" % (i % num_hosts)
+        url = "http://%s/page%d.html" % (host, i)
+        urls.append(UrlData(url, host, i * 5 // num, aggregate))
+    return urls
+
+
+def report(name, num, seconds):
+    """Print the time per operation."""
+    print("  %-8s %8.3fs %8.2fus/op" % (name, seconds, seconds * 1e6 / num))
+
+
+def main(args):
+    """Fill and empty a queue and print the timings."""
+    num = int(args[0]) if args else 1000000
+    num_hosts = int(args[1]) if len(args) > 1 else 1000
+    urls = make_urls(num, num_hosts)
+    urlqueue = UrlQueue()
+    print("%d URLs on %d hosts:" % (num, num_hosts))
+    start = time.time()
+    for url_data in urls:
+        urlqueue.put(url_data)
+    report("put", num, time.time() - start)
+    promoted = urls[::100]
+    start = time.time()
+    for url_data in promoted:
+        urlqueue.promote(url_data.cache_url)
+    report("promote", len(promoted), time.time() - start)
+    start = time.time()
+    for dummy in range(num):
+        urlqueue.get(0)
+    report("get", num, time.time() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -495,7 +495,6 @@ args = dict(
     install_requires = [
         'requests >= 2.4',
         'dnspython',
-        'beautifulsoup4',
         'pyxdg',
         'future',
     ],
@@ -0,0 +1,83 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test the checkpoint file of a check.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from linkcheck.cache.checkpoint import Checkpoint, read_checkpoint
+
+
+class UrlData (object):
+    """URL data with the attributes recorded in a checkpoint."""
+
+    def __init__ (self, url):
+        self.base_url = self.cache_url = url
+        self.recursion_level = 1
+        self.parent_url = u"http://example.org/"
+        self.base_ref = None
+        self.line = self.column = self.page = 1
+        self.name = u"\xe4"
+        self.extern = (0, 0)
+
+
+class TestCheckpoint (unittest.TestCase):
+
+    def setUp (self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "checkpoint")
+
+    def tearDown (self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_records (self):
+        checkpoint = Checkpoint(self.filename)
+        for url in (u"http://example.org/a", u"http://example.org/b"):
+            checkpoint.add_url(UrlData(url))
+        checkpoint.add_result(u"http://example.org/a", u"result")
+        checkpoint.close()
+        # closing twice is ok
+        checkpoint.close()
+        pending, logged = read_checkpoint(self.filename)
+        self.assertEqual(list(pending), [u"http://example.org/b"])
+        self.assertEqual(dict(logged), {u"http://example.org/a": [u"result"]})
+        args = pending[u"http://example.org/b"]
+        self.assertEqual(args["base_url"], u"http://example.org/b")
+        self.assertEqual(args["name"], u"\xe4")
+        self.assertEqual(args["extern"], (0, 0))
+        # records are appended
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.add_result(u"http://example.org/b", u"result")
+        checkpoint.close()
+        pending, logged = read_checkpoint(self.filename)
+        self.assertEqual(len(pending), 0)
+        self.assertEqual(len(logged), 2)
+
+    def test_truncated (self):
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.add_url(UrlData(u"http://example.org/a"))
+        checkpoint.add_url(UrlData(u"http://example.org/b"))
+        checkpoint.close()
+        # cut the last record as if the check was killed while writing
+        size = os.path.getsize(self.filename)
+        with open(self.filename, "rb+") as fd:
+            fd.truncate(size - 5)
+        pending, logged = read_checkpoint(self.filename)
+        self.assertEqual(list(pending), [u"http://example.org/a"])
@@ -0,0 +1,147 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test HTTP connections shared between request sessions.
+"""
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+try:  # Python 3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from SocketServer import ThreadingMixIn
+
+import requests
+from linkcheck.cache.connections import ConnectionPool
+
+
+class KeepAliveHttpRequestHandler (BaseHTTPRequestHandler, object):
+    """Answer all requests over persistent HTTP/1.1 connections.
+    The path /cookie sets a cookie."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET (self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/cookie":
+            self.send_header("Set-Cookie", "test=1; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message (self, format, *args):
+        pass
+
+
+class ThreadingHttpServer (ThreadingMixIn, HTTPServer, object):
+    """HTTP server handling each connection in a thread."""
+
+    daemon_threads = True
+
+
+class TestConnectionPool (unittest.TestCase):
+    """Test connection reuse between request sessions."""
+
+    def setUp (self):
+        self.httpd = ThreadingHttpServer(('localhost', 0),
+                                         KeepAliveHttpRequestHandler)
+        self.url = u"http://localhost:%d/" % self.httpd.server_port
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.start()
+
+    def tearDown (self):
+        self.httpd.shutdown()
+        self.thread.join()
+        self.httpd.server_close()
+
+    def new_session (self, connection_pool):
+        session = requests.Session()
+        connection_pool.mount(session)
+        return session
+
+    def test_reuse (self):
+        connection_pool = ConnectionPool(2, 30)
+        sessions = [self.new_session(connection_pool) for dummy in range(2)]
+        for session in sessions * 2:
+            session.get(self.url).close()
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["handshakes"], 0)
+        # closing one session keeps the shared connections open
+        sessions[0].close()
+        sessions[1].get(self.url).close()
+        self.assertEqual(connection_pool.get_stats()["hits"], 4)
+        connection_pool.clear()
+
+    def test_cookies (self):
+        connection_pool = ConnectionPool(2, 30)
+        session1 = self.new_session(connection_pool)
+        session2 = self.new_session(connection_pool)
+        session1.get(self.url + u"cookie").close()
+        session2.get(self.url).close()
+        self.assertEqual(session1.cookies.get("test"), "1")
+        self.assertEqual(len(session2.cookies), 0)
+        self.assertEqual(connection_pool.get_stats()["hits"], 1)
+        connection_pool.clear()
+
+    def test_idle_timeout (self):
+        connection_pool = ConnectionPool(2, 0)
+        session = self.new_session(connection_pool)
+        session.get(self.url).close()
+        time.sleep(0.01)
+        session.get(self.url).close()
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 0)
+        connection_pool.clear()
+
+    def test_parallel (self):
+        connection_pool = ConnectionPool(2, 30)
+        def get_urls ():
+            session = self.new_session(connection_pool)
+            for dummy in range(10):
+                session.get(self.url).close()
+        threads = [threading.Thread(target=get_urls) for dummy in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 50)
+        self.assertTrue(stats["hits"] > 0)
+        connection_pool.clear()
+
+    def test_exhausted (self):
+        connection_pool = ConnectionPool(1, 30)
+        session = self.new_session(connection_pool)
+        # more open responses than pooled connections do not block
+        responses = [session.get(self.url, stream=True) for dummy in range(3)]
+        for response in responses:
+            self.assertEqual(response.content, b"ok")
+        self.assertEqual(connection_pool.get_stats()["misses"], 3)
+        # only one connection was kept open
+        session.get(self.url).close()
+        session.get(self.url).close()
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
+        connection_pool.clear()
@@ -0,0 +1,123 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test the persistent result cache.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from linkcheck.cache.diskcache import DiskCache
+from linkcheck.checker.urlbase import CompactUrlData, urlDataAttr
+
+
+def get_result (url, valid=True):
+    """Return a compact result object for given URL."""
+    wire = dict((attr, None) for attr in urlDataAttr)
+    wire.update(url=url, cache_url=url, valid=valid, result=u"200 OK",
+                warnings=[(u"tag", u"a warning")], info=[u"info"])
+    return CompactUrlData(wire)
+
+
+class TestDiskCache (unittest.TestCase):
+
+    def setUp (self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "cache", "results.sqlite")
+
+    def tearDown (self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persistent (self):
+        url = u"http://example.org/\xe4"
+        cache = DiskCache(self.filename, 60)
+        self.assertEqual(cache.get_entry(url), None)
+        cache.add_result(url, get_result(url))
+        cache.close()
+        # closing twice is ok
+        cache.close()
+        # a closed cache finds and stores nothing
+        self.assertEqual(cache.get_entry(url), None)
+        self.assertEqual(cache.get_links(url, None), None)
+        cache.add_result(url, get_result(url, valid=False))
+        cache.renew(url)
+        cache = DiskCache(self.filename, 60)
+        entry = cache.get_entry(url)
+        cache.close()
+        self.assertTrue(cache.is_fresh(entry))
+        self.assertEqual(entry.links, None)
+        self.assertEqual(entry.etag, None)
+        self.assertEqual(entry.last_modified, None)
+        result = entry.result
+        self.assertEqual(result.url, url)
+        self.assertEqual(result.result, u"200 OK")
+        self.assertEqual(result.warnings, [(u"tag", u"a warning")])
+        self.assertEqual(result.info, [u"info"])
+
+    def test_invalid (self):
+        url = u"http://example.org/"
+        cache = DiskCache(self.filename, 60)
+        cache.add_result(url, get_result(url, valid=False))
+        self.assertEqual(cache.get_entry(url), None)
+        cache.close()
+
+    def test_max_age (self):
+        url = u"http://example.org/"
+        cache = DiskCache(self.filename, 60)
+        cache.add_result(url, get_result(url))
+        cache.connection.execute("UPDATE results SET checked=checked-61")
+        self.assertFalse(cache.is_fresh(cache.get_entry(url)))
+        cache.renew(url)
+        self.assertTrue(cache.is_fresh(cache.get_entry(url)))
+        cache.close()
+
+    def test_validators (self):
+        url = u"http://example.org/"
+        links = [(u"a.html", 1, 2, 0, u"name", None)]
+        cache = DiskCache(self.filename, 60)
+        cache.add_result(url, get_result(url), links=links, etag=u'"abc"',
+                         last_modified=u"Mon, 07 Jan 2019 10:00:00 GMT")
+        entry = cache.get_entry(url)
+        cache.close()
+        self.assertEqual(entry.links, links)
+        self.assertEqual(entry.etag, u'"abc"')
+        self.assertEqual(entry.last_modified, u"Mon, 07 Jan 2019 10:00:00 GMT")
+
+    def test_links (self):
+        url = u"http://example.org/"
+        links = [(u"a.html", 1, 2, 0, u"name", None)]
+        cache = DiskCache(self.filename, 60)
+        cache.add_result(url, get_result(url), links=links,
+                         content_hash=u"abc")
+        self.assertEqual(cache.get_links(url, u"abc"), links)
+        self.assertEqual(cache.get_links(url, u"def"), None)
+        # results without parsed content have no links
+        cache.add_result(url, get_result(url))
+        self.assertEqual(cache.get_links(url, None), None)
+        cache.close()
+
+    def test_schema_version (self):
+        url = u"http://example.org/"
+        cache = DiskCache(self.filename, 60)
+        cache.add_result(url, get_result(url))
+        cache.connection.execute("PRAGMA user_version=0")
+        cache.close()
+        # results stored with another layout are discarded
+        cache = DiskCache(self.filename, 60)
+        self.assertEqual(cache.get_entry(url), None)
+        cache.close()
@@ -0,0 +1,109 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test the result cache.
+"""
+import sys
+import unittest
+
+from linkcheck.cache.results import ResultCache, get_result_size
+
+
+class Result(object):
+    """Small result object with slots like CompactUrlData."""
+    __slots__ = ('url', 'valid', 'warnings')
+
+    def __init__(self, url):
+        self.url = url
+        self.valid = True
+        self.warnings = []
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_seen(self):
+        cache = ResultCache(max_size=10)
+        self.assertFalse(cache.has_result(u"http://example.org/"))
+        self.assertFalse(cache.has_result(None))
+        cache.add_result(u"http://example.org/", None)
+        self.assertTrue(cache.has_result(u"http://example.org/"))
+        self.assertEqual(cache.get_result(u"http://example.org/"), None)
+        self.assertFalse(cache.has_non_empty_result(u"http://example.org/"))
+        cache.add_result(None, None)
+        self.assertEqual(len(cache), 1)
+
+    def test_lru(self):
+        cache = ResultCache(max_size=2)
+        for key in (u"a", u"b"):
+            cache.add_result(key, Result(key))
+        # use a, so that b is the least recently used result
+        self.assertEqual(cache.get_result(u"a").url, u"a")
+        cache.add_result(u"c", Result(u"c"))
+        self.assertEqual(cache.get_result(u"b"), None)
+        self.assertEqual(cache.get_result(u"a").url, u"a")
+        self.assertEqual(cache.get_result(u"c").url, u"c")
+        # removed results are still seen
+        self.assertTrue(cache.has_result(u"b"))
+        self.assertEqual(len(cache), 3)
+
+    def test_max_bytes(self):
+        size = get_result_size(Result(u"a"))
+        cache = ResultCache(max_bytes=size * 2)
+        for key in (u"a", u"b", u"c"):
+            cache.add_result(key, Result(key))
+        self.assertEqual(list(cache.cache), [u"b", u"c"])
+        self.assertEqual(cache.size, size * 2)
+        # replacing a result does not count twice
+        cache.add_result(u"c", Result(u"c"))
+        self.assertEqual(cache.size, size * 2)
+
+    def test_links(self):
+        cache = ResultCache()
+        key = u"page.html\n\nhttp://example.org/\ntext/html"
+        self.assertFalse(cache.has_link(key))
+        cache.add_link(key)
+        self.assertTrue(cache.has_link(key))
+        # links are not counted as seen URLs
+        self.assertEqual(len(cache), 0)
+
+    def test_million_urls(self):
+        """
+        Test, that crawling 1M URLs keeps the stored results
+        bounded and still finds all duplicates
+        """
+        num = 1000000
+        max_size = 1000
+        cache = ResultCache(max_size=max_size, max_bytes=100*1024)
+        url = u"http://example.org/page%d.html"
+        duplicates = 0
+        for i in range(num):
+            key = url % i
+            # a crawl queues every URL once and finds duplicates later
+            if cache.has_result(key):
+                duplicates += 1
+            cache.add_result(key, None)
+            if cache.has_result(url % (i // 2)):
+                duplicates += 1
+            cache.add_result(key, Result(key))
+            if not i % 10000:
+                self.assertTrue(len(cache.cache) <= max_size)
+                self.assertTrue(cache.size <= 100*1024)
+        self.assertEqual(duplicates, num)
+        self.assertEqual(len(cache), num)
+        self.assertEqual(len(cache.sizes), len(cache.cache))
+        # the seen set needs less memory than the URLs themselves
+        self.assertTrue(sys.getsizeof(cache.seen) < num * sys.getsizeof(key))
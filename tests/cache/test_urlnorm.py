@@ -0,0 +1,45 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test the URL norm cache.
+"""
+import unittest
+from linkcheck.cache.urlnorm import UrlNormCache
+
+
+class TestUrlNormCache (unittest.TestCase):
+    """Test caching of normed URLs."""
+
+    def test_get_add (self):
+        cache = UrlNormCache()
+        key = (None, u"a b.html", None)
+        self.assertEqual(cache.get(key), None)
+        cache.add(key, (u"a%20b.html", False))
+        self.assertEqual(cache.get(key), (u"a%20b.html", False))
+        self.assertEqual(cache.get_stats(), dict(hits=1, misses=1))
+
+    def test_max_size (self):
+        cache = UrlNormCache(max_size=2)
+        cache.add(u"a", 1)
+        cache.add(u"b", 2)
+        # a is used more recently than b
+        cache.get(u"a")
+        cache.add(u"c", 3)
+        self.assertEqual(cache.get(u"b"), None)
+        self.assertEqual(cache.get(u"a"), 1)
+        self.assertEqual(cache.get(u"c"), 3)
+        self.assertEqual(len(cache.cache), 2)
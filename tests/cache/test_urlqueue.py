@@ -15,16 +15,78 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import time
 import unittest
 from collections import namedtuple
 
 from linkcheck.cache.results import ResultCache
-from linkcheck.cache.urlqueue import Empty, NUM_PUTS_CLEANUP, UrlQueue
+from linkcheck.cache.urlqueue import Empty, UrlQueue
 
-UrlData = namedtuple('UrlData', 'url cache_url aggregate has_result')
 Aggregate = namedtuple('Aggregate', 'result_cache')
 
 
+class UrlData(namedtuple('UrlData', 'url cache_url aggregate has_result')):
+    """URL data without host and recursion level."""
+
+    recursion_level = 0
+
+    def get_throttled_host(self):
+        return None
+
+
+class LevelUrlData(object):
+    """URL data with host and recursion level."""
+
+    def __init__(self, url, host, recursion_level, aggregate):
+        self.url = self.cache_url = url
+        self.host = host
+        self.recursion_level = recursion_level
+        self.aggregate = aggregate
+        self.has_result = False
+
+    def get_throttled_host(self):
+        return self.host
+
+
+class RecordUrlData(object):
+    """URL data that can be rebuilt from its record."""
+
+    def __init__(self, base_url, recursion_level, aggregate, parent_url=None,
+                 base_ref=None, line=0, column=0, page=0, name=u"",
+                 extern=None):
+        self.url = self.cache_url = self.base_url = base_url
+        self.recursion_level = recursion_level
+        self.aggregate = aggregate
+        self.parent_url = parent_url
+        self.base_ref = base_ref
+        self.line = line
+        self.column = column
+        self.page = page
+        self.name = name
+        self.extern = extern
+        self.has_result = False
+        self.warnings = []
+        self.info = []
+
+    def get_throttled_host(self):
+        return None
+
+
+class HostUrlData(object):
+    """URL data whose requests to a host are throttled."""
+
+    def __init__(self, url, host, aggregate):
+        self.url = self.cache_url = url
+        self.host = host
+        self.aggregate = aggregate
+        self.has_result = False
+        self.host_throttled = False
+        self.recursion_level = 0
+
+    def get_throttled_host(self):
+        return self.host
+
+
 class TestUrlQueue(unittest.TestCase):
 
     def setUp(self):
@@ -141,14 +203,12 @@ class TestUrlQueue(unittest.TestCase):
         with self.assertRaises(Empty):
             self.assertEqual(self.urlqueue.get(0), None)
 
-    def test_cleanup(self):
+    def test_promote(self):
         """
-        Test, that after adding NUM_PUTS_CLEANUP elements
-        the queue is cleaned up.
-        Whether the cleanup is was performed is determined,
-        that element in cache is now on top of the queue.
+        Test, that a queued element whose result got cached
+        is moved to the top of the queue.
         """
-        for i in range(NUM_PUTS_CLEANUP - 1):
+        for i in range(10):
             self.urlqueue.put(
                 UrlData(
                     url="Bar",
@@ -159,16 +219,272 @@ class TestUrlQueue(unittest.TestCase):
                     has_result=False,
                 ),
             )
-        self.assertEqual(self.urlqueue.qsize(), NUM_PUTS_CLEANUP - 1)
-        urldata = UrlData(
-            url="Bar",
-            cache_url="Bar address",
-            aggregate=Aggregate(
-                result_cache=self.result_cache,
-            ),
-            has_result=False,
-        )
+        self.assertEqual(self.urlqueue.qsize(), 10)
         self.result_cache.add_result("Bar address 2", "asdf")
-        self.urlqueue.put(urldata)
-        self.assertEqual(self.urlqueue.qsize(), NUM_PUTS_CLEANUP)
+        self.urlqueue.promote("Bar address 2")
+        # unknown keys are ignored
+        self.urlqueue.promote("Foo")
+        self.assertEqual(self.urlqueue.qsize(), 10)
         self.assertEqual(self.urlqueue.get().cache_url, "Bar address 2")
+        self.assertEqual(self.urlqueue.get().cache_url, "Bar address 0")
+        self.assertEqual(self.urlqueue.qsize(), 8)
+        self.urlqueue.promote("Bar address 2")
+        self.assertEqual(self.urlqueue.qsize(), 8)
+
+    def test_window(self):
+        """
+        Test, that URLs beyond the window are stored in a file
+        and all URLs are rebuilt in order
+        """
+        with self.assertRaises(ValueError):
+            UrlQueue(window=0)
+        urlqueue = UrlQueue(window=2)
+        aggregate = Aggregate(result_cache=self.result_cache)
+        urls = ["http://example.org/%d" % i for i in range(5)]
+        for i, url in enumerate(urls):
+            urlqueue.put(RecordUrlData(url, 1, aggregate, line=i))
+        self.assertEqual(urlqueue.qsize(), 5)
+        self.assertEqual(urlqueue.num_spilled, 3)
+        # spilled URLs are promoted, too
+        urlqueue.promote(urls[3])
+        self.assertEqual(urlqueue.num_spilled, 2)
+        self.assertEqual(urlqueue.qsize(), 5)
+        for i in [3, 0, 1, 2, 4]:
+            url_data = urlqueue.get(0)
+            self.assertEqual(url_data.url, urls[i])
+            self.assertEqual(url_data.line, i)
+            self.assertEqual(url_data.aggregate, aggregate)
+        self.assertTrue(urlqueue.empty())
+        self.assertEqual(urlqueue.spill_files, {})
+
+    def test_window_levels(self):
+        """
+        Test, that spilled URLs of a lower recursion level
+        are refilled first
+        """
+        urlqueue = UrlQueue(window=2)
+        aggregate = Aggregate(result_cache=self.result_cache)
+        levels = [2, 2, 2, 3, 1, 2, 1]
+        for i, level in enumerate(levels):
+            urlqueue.put(RecordUrlData("http://example.org/%d" % i, level,
+                                       aggregate, line=i))
+        self.assertEqual(urlqueue.num_spilled, 5)
+        self.assertEqual(sorted(urlqueue.spill_files), [1, 2, 3])
+        lines = [urlqueue.get(0).line for i in range(len(levels))]
+        # refilled URLs of level 1 go before the second URL of the
+        # window, URLs of the same level keep the order they were queued
+        self.assertEqual(lines, [0, 4, 6, 1, 2, 5, 3])
+        self.assertTrue(urlqueue.empty())
+        self.assertEqual(urlqueue.spill_files, {})
+
+    def test_window_not_rebuildable(self):
+        """
+        Test, that start URLs and URLs with warnings are kept
+        """
+        urlqueue = UrlQueue(window=1)
+        aggregate = Aggregate(result_cache=self.result_cache)
+        url_data1 = RecordUrlData("a", 0, aggregate)
+        url_data2 = RecordUrlData("b", 1, aggregate)
+        url_data2.warnings.append((u"tag", u"warning"))
+        urlqueue.put(url_data1)
+        urlqueue.put(url_data2)
+        self.assertEqual(urlqueue.num_spilled, 0)
+        self.assertTrue(urlqueue.get(0) is url_data1)
+        self.assertTrue(urlqueue.get(0) is url_data2)
+
+    def test_many_urls(self):
+        """
+        Test, that a queue of 100k URLs hands out the lower recursion
+        levels first and the URLs of each level round-robin over
+        their hosts
+        """
+        num = 100000
+        num_hosts = 100
+        aggregate = Aggregate(result_cache=ResultCache(max_size=1000))
+        for i in range(num):
+            host = "host%d" % (i % num_hosts)
+            url = "http://%s/page%d.html" % (host, i)
+            # later URLs are found on deeper levels
+            level = i * 5 // num
+            self.urlqueue.put(LevelUrlData(url, host, level, aggregate))
+        self.assertEqual(self.urlqueue.qsize(), num)
+        self.urlqueue.promote("http://host0/page%d.html" % (num - num_hosts))
+        self.assertEqual(self.urlqueue.get(0).recursion_level, 4)
+        last_level = 0
+        hosts = set()
+        for i in range(num - 1):
+            url_data = self.urlqueue.get(0)
+            self.assertTrue(url_data.recursion_level >= last_level)
+            last_level = url_data.recursion_level
+            if i < num_hosts:
+                hosts.add(url_data.host)
+        self.assertEqual(len(hosts), num_hosts)
+        self.assertTrue(self.urlqueue.empty())
+        with self.assertRaises(Empty):
+            self.urlqueue.get(0)
+
+
+class TestUrlQueueHosts(unittest.TestCase):
+
+    def setUp(self):
+        self.aggregate = Aggregate(result_cache=ResultCache())
+        # wait between 0.1 and 0.6 seconds before each host request
+        self.urlqueue = UrlQueue(max_requests_per_second=10)
+
+    def put(self, url, host):
+        url_data = HostUrlData(url, host, self.aggregate)
+        self.urlqueue.put(url_data)
+        return url_data
+
+    def test_other_host(self):
+        """
+        Test, that get() hands out the URL of a ready host
+        instead of waiting for a throttled host
+        """
+        a1 = self.put("a1", "a")
+        a2 = self.put("a2", "a")
+        b1 = self.put("b1", "b")
+        self.assertEqual(self.urlqueue.qsize(), 3)
+        self.assertEqual(self.urlqueue.get(0), a1)
+        self.assertTrue(a1.host_throttled)
+        self.assertEqual(self.urlqueue.get(0), b1)
+        with self.assertRaises(Empty):
+            self.urlqueue.get(0)
+        self.assertFalse(self.urlqueue.empty())
+        wait = self.urlqueue.get_wait_time()
+        self.assertTrue(0 < wait <= 0.6)
+        start = time.time()
+        self.assertEqual(self.urlqueue.get(1), a2)
+        self.assertTrue(time.time() - start >= 0.09)
+        self.assertTrue(self.urlqueue.empty())
+        self.assertEqual(self.urlqueue.get_wait_time(), None)
+
+    def test_unthrottled_urls(self):
+        """
+        Test, that URLs without host are not delayed
+        by throttled hosts
+        """
+        a1 = self.put("a1", "a")
+        a2 = self.put("a2", "a")
+        urldata = self.put("Bar", None)
+        self.assertEqual(self.urlqueue.get(0), a1)
+        self.assertEqual(self.urlqueue.get(0), urldata)
+        self.assertEqual(self.urlqueue.get(), a2)
+
+    def test_reserve_host_time(self):
+        """
+        Test, that requests outside of the queue
+        delay the next URL of the host
+        """
+        self.assertEqual(self.urlqueue.reserve_host_time("a"), 0)
+        a1 = self.put("a1", "a")
+        with self.assertRaises(Empty):
+            self.urlqueue.get(0)
+        self.assertEqual(self.urlqueue.get(1), a1)
+        self.assertTrue(self.urlqueue.reserve_host_time("a") > 0)
+
+    def test_round_robin(self):
+        """
+        Test, that the URLs of ready hosts are handed out
+        round-robin and lower recursion levels first
+        """
+        urlqueue = UrlQueue()
+        a1 = LevelUrlData("a1", "a", 1, self.aggregate)
+        a2 = LevelUrlData("a2", "a", 1, self.aggregate)
+        a3 = LevelUrlData("a3", "a", 0, self.aggregate)
+        b1 = LevelUrlData("b1", "b", 1, self.aggregate)
+        for url_data in (a1, a2, a3, b1):
+            urlqueue.put(url_data)
+        self.assertEqual(urlqueue.get(0), a3)
+        self.assertEqual(urlqueue.get(0), a1)
+        self.assertEqual(urlqueue.get(0), b1)
+        self.assertEqual(urlqueue.get(0), a2)
+
+    def test_promote_host(self):
+        """
+        Test, that a cached URL does not wait for its host
+        """
+        a1 = self.put("a1", "a")
+        a2 = self.put("a2", "a")
+        self.assertEqual(self.urlqueue.get(0), a1)
+        self.urlqueue.promote("a2")
+        self.assertEqual(self.urlqueue.qsize(), 1)
+        self.assertEqual(self.urlqueue.get(0), a2)
+        self.assertFalse(a2.host_throttled)
+        self.assertTrue(self.urlqueue.empty())
+
+    def test_shutdown(self):
+        """
+        Test, that shutdown removes the URLs of all hosts
+        """
+        self.put("a1", "a")
+        self.put("b1", "b")
+        self.urlqueue.do_shutdown()
+        self.assertTrue(self.urlqueue.empty())
+        self.assertEqual(self.urlqueue.status(), (0, 0, 0))
+
+    def test_host_delay(self):
+        """
+        Test, that a crawl delay sets the minimum time
+        between two requests to a host
+        """
+        self.urlqueue.set_host_delay("a", 2)
+        self.assertEqual(self.urlqueue.reserve_host_time("a"), 0)
+        wait = self.urlqueue.reserve_host_time("a")
+        self.assertTrue(1.9 < wait <= 2)
+
+    def test_host_overloaded(self):
+        """
+        Test, that an overloaded host gets no requests for
+        the given number of seconds and slows down until it
+        answers normally again
+        """
+        self.urlqueue.add_host_response("a", 0.0, overloaded=True,
+                                        retry_after=5)
+        self.assertTrue(4.9 < self.urlqueue.reserve_host_time("a") <= 5)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 2.0)
+        self.urlqueue.add_host_response("a", 0.0, overloaded=True)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 4.0)
+        self.urlqueue.add_host_response("a", 0.0)
+        self.urlqueue.add_host_response("a", 0.0)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 1.0)
+
+    def test_host_latency(self):
+        """
+        Test, that slow hosts get requests less often
+        """
+        self.urlqueue.add_host_response("a", 3.0)
+        self.assertEqual(self.urlqueue.reserve_host_time("a"), 0)
+        self.assertTrue(self.urlqueue.reserve_host_time("a") > 2.9)
+
+    def test_host_speedup(self):
+        """
+        Test, that fast hosts get requests more often, but not more
+        than the maximum number of requests per second
+        """
+        for dummy in range(20):
+            self.urlqueue.add_host_response("a", 0.01)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 0.1)
+        last_wait = self.urlqueue.reserve_host_time("a")
+        for dummy in range(10):
+            wait = self.urlqueue.reserve_host_time("a")
+            self.assertTrue(0.09 < wait - last_wait <= 0.15)
+            last_wait = wait
+        # slow or overloaded responses end the speedup
+        self.urlqueue.add_host_response("a", 0.5)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 1.0)
+        self.urlqueue.add_host_response("a", 0.01)
+        self.urlqueue.add_host_response("a", 0.0, overloaded=True)
+        self.assertEqual(self.urlqueue.host_stats["a"][1], 2.0)
+
+    def test_host_response_unthrottled(self):
+        """
+        Test, that a queue without maximum request rate
+        ignores host responses
+        """
+        urlqueue = UrlQueue()
+        urlqueue.add_host_response("a", 3.0)
+        urlqueue.add_host_response("a", 0.0, overloaded=True, retry_after=5)
+        self.assertEqual(urlqueue.host_stats, {})
+        self.assertEqual(urlqueue.reserve_host_time("a"), 0)
+        self.assertEqual(urlqueue.reserve_host_time("a"), 0)
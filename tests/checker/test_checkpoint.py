@@ -0,0 +1,121 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test resuming an interrupted check from a checkpoint file.
+"""
+import os
+import shutil
+import tempfile
+from linkcheck.cache.checkpoint import read_checkpoint
+from linkcheck.checker import get_url_from
+import linkcheck.director
+from linkcheck.director import checker
+from . import get_test_aggregate
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+
+class PageHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler serving the page /page.html with two links and recording
+    requested paths except for robots.txt."""
+
+    paths = []
+    body = (b'<html><body><a href="/status/200">a</a>'
+            b'<a href="/status/201">b</a></body></html>')
+
+    def do_GET (self):
+        if self.path.startswith("/robots.txt"):
+            return super(PageHttpRequestHandler, self).do_GET()
+        self.paths.append(self.path)
+        if self.path != "/page.html":
+            return super(PageHttpRequestHandler, self).do_GET()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+class TestCheckpoint (HttpServerTest):
+    """Test checkpoint and resume of a check."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestCheckpoint, self).__init__(methodName=methodName)
+        self.handler = PageHttpRequestHandler
+
+    def setUp (self):
+        super(TestCheckpoint, self).setUp()
+        del self.handler.paths[:]
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "checkpoint")
+        self.url = u"http://localhost:%d/page.html" % self.port
+
+    def tearDown (self):
+        super(TestCheckpoint, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume (self):
+        confargs = dict(checkpoint=self.filename)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        aggregate.logger.start_log_output()
+        aggregate.add_request_session()
+        aggregate.urlqueue.put(get_url_from(self.url, 0, aggregate))
+        # check only the page, then stop
+        url_data = aggregate.urlqueue.get()
+        checker.check_url(url_data, aggregate.logger)
+        aggregate.urlqueue.task_done(url_data)
+        aggregate.finish()
+        self.assertEqual(self.handler.paths, ["/page.html"])
+        pending, logged = read_checkpoint(self.filename)
+        self.assertEqual(len(pending), 2)
+        self.assertEqual(list(logged), [self.url])
+        del self.handler.paths[:]
+        # the resumed check only checks the pending links
+        confargs = dict(checkpoint=self.filename, resume=True)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        self.assertEqual(aggregate.urlqueue.qsize(), 2)
+        aggregate.urlqueue.put(get_url_from(self.url, 0, aggregate))
+        self.assertEqual(aggregate.urlqueue.qsize(), 2)
+        linkcheck.director.check_urls(aggregate)
+        self.assertEqual(sorted(self.handler.paths),
+                         ["/status/200", "/status/201"])
+        pending, logged = read_checkpoint(self.filename)
+        self.assertEqual(len(pending), 0)
+        self.assertEqual(len(logged), 3)
+
+    def test_resume_statistics (self):
+        confargs = dict(checkpoint=self.filename)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        aggregate.logger.start_log_output()
+        aggregate.add_request_session()
+        url = u"http://localhost:%d/status/404" % self.port
+        aggregate.urlqueue.put(get_url_from(url, 0, aggregate))
+        # check only the broken link, then stop
+        url_data = aggregate.urlqueue.get()
+        checker.check_url(url_data, aggregate.logger)
+        aggregate.urlqueue.task_done(url_data)
+        aggregate.finish()
+        # the resumed check counts the error found before
+        confargs = dict(checkpoint=self.filename, resume=True)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        aggregate.urlqueue.put(get_url_from(self.url, 0, aggregate))
+        linkcheck.director.check_urls(aggregate)
+        self.assertEqual(sorted(self.handler.paths),
+                         ["/page.html", "/status/200", "/status/201",
+                          "/status/404"])
+        stats = aggregate.config['logger'].stats
+        self.assertEqual(stats.number, 4)
+        self.assertEqual(stats.errors, 1)
@@ -0,0 +1,190 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test reuse of check results stored in a disk cache.
+"""
+import os
+import shutil
+import tempfile
+from linkcheck.checker import get_url_from
+import linkcheck.director
+import linkcheck.parser
+from linkcheck.htmlutil import linkparse
+from . import get_test_aggregate
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+
+class CountingHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler counting requests except for robots.txt."""
+
+    requests = 0
+
+    def do_GET (self):
+        if not self.path.startswith("/robots.txt"):
+            CountingHttpRequestHandler.requests += 1
+        super(CountingHttpRequestHandler, self).do_GET()
+
+
+class TestDiskCache (HttpServerTest):
+    """Test checking URLs twice with a disk cache."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestDiskCache, self).__init__(methodName=methodName)
+        self.handler = CountingHttpRequestHandler
+
+    def setUp (self):
+        super(TestDiskCache, self).setUp()
+        CountingHttpRequestHandler.requests = 0
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown (self):
+        super(TestDiskCache, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def cache_test (self, path, result, requests):
+        url = u"http://localhost:%d/%s" % (self.port, path)
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            result,
+        ]
+        confargs = dict(cachefile=os.path.join(self.tmpdir, "cache.sqlite"))
+        for dummy in range(2):
+            self.direct(url, resultlines, confargs=confargs)
+        self.assertEqual(CountingHttpRequestHandler.requests, requests)
+
+    def test_valid (self):
+        self.cache_test(u"status/200", u"valid", 1)
+
+    def test_error (self):
+        self.cache_test(u"status/404", u"error", 2)
+
+
+class ETagHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler serving the page /etag.html with an ETag and recording
+    requested paths except for robots.txt. Conditional requests are
+    recorded with a leading "if:"."""
+
+    paths = []
+    etag = '"v1"'
+    body = b'<html><body><a href="/status/200">link</a></body></html>'
+
+    def do_GET (self):
+        if self.path.startswith("/robots.txt"):
+            return super(ETagHttpRequestHandler, self).do_GET()
+        if self.headers.get("If-None-Match"):
+            self.paths.append("if:" + self.path)
+        else:
+            self.paths.append(self.path)
+        if self.path != "/etag.html":
+            return super(ETagHttpRequestHandler, self).do_GET()
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+class TestDiskCacheRevalidation (HttpServerTest):
+    """Test revalidating stored results with conditional requests."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestDiskCacheRevalidation, self).__init__(methodName=methodName)
+        self.handler = ETagHttpRequestHandler
+
+    def setUp (self):
+        super(TestDiskCacheRevalidation, self).setUp()
+        del self.handler.paths[:]
+        self.tmpdir = tempfile.mkdtemp()
+        self.parsed = []
+        self.parse_html = linkcheck.parser.parse_html
+        def parse_html (url_data):
+            self.parsed.append(url_data.url)
+            self.parse_html(url_data)
+        linkcheck.parser.parse_html = parse_html
+        # tags seen by link finders
+        self.link_tags = []
+        self.start_element = linkparse.LinkFinder.__dict__["start_element"]
+        def start_element (handler, tag, attrs):
+            self.link_tags.append(tag)
+            self.start_element(handler, tag, attrs)
+        linkparse.LinkFinder.start_element = start_element
+
+    def tearDown (self):
+        super(TestDiskCacheRevalidation, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+        linkcheck.parser.parse_html = self.parse_html
+        linkparse.LinkFinder.start_element = self.start_element
+
+    def check (self):
+        # stored results are never fresh and always revalidated
+        confargs = dict(cachefile=os.path.join(self.tmpdir, "cache.sqlite"),
+                        cachemaxage=0, recursionlevel=1)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        url = u"http://localhost:%d/etag.html" % self.port
+        aggregate.urlqueue.put(get_url_from(url, 0, aggregate))
+        linkcheck.director.check_urls(aggregate)
+
+    def test_not_modified (self):
+        self.check()
+        self.assertEqual(self.handler.paths, ["/etag.html", "/status/200"])
+        self.assertIn("a", self.link_tags)
+        del self.handler.paths[:]
+        del self.link_tags[:]
+        # the stored links of the unmodified page are still checked
+        self.check()
+        self.assertEqual(self.handler.paths,
+                         ["if:/etag.html", "/status/200"])
+        self.assertEqual(len(self.parsed), 1)
+        self.assertEqual(self.link_tags, [])
+
+    def test_modified (self):
+        self.check()
+        del self.handler.paths[:]
+        del self.link_tags[:]
+        self.handler.etag = '"v2"'
+        try:
+            self.check()
+        finally:
+            self.handler.etag = '"v1"'
+        self.assertEqual(self.handler.paths,
+                         ["if:/etag.html", "/status/200"])
+        # the content is downloaded again, but has the same hash
+        # and no links are searched in it
+        self.assertEqual(len(self.parsed), 1)
+        self.assertEqual(self.link_tags, [])
+
+    def test_changed_content (self):
+        self.check()
+        del self.link_tags[:]
+        body = self.handler.body
+        self.handler.etag = '"v2"'
+        self.handler.body = b'<html><body><a href="/status/201">link</a>'
+        try:
+            self.check()
+        finally:
+            self.handler.etag = '"v1"'
+            self.handler.body = body
+        self.assertEqual(len(self.parsed), 2)
+        self.assertIn("a", self.link_tags)
+        self.assertEqual(self.handler.paths[-1], "/status/201")
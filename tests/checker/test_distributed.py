@@ -0,0 +1,199 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test checking URLs with worker processes.
+"""
+import unittest
+import requests
+from linkcheck.checker import get_url_from
+import linkcheck.director
+from linkcheck.director import distributed
+from . import get_test_aggregate
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+
+class PageHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler serving the page /page.html with links to status URLs.
+    The page /private.html needs the cookie of a login."""
+
+    body = (b'<html><body><a href="/status/200">a</a>'
+            b'<a href="/status/404">b</a>'
+            b'<a href="/page.html">c</a></body></html>')
+
+    def do_GET (self):
+        if self.path == "/private.html":
+            if "login=1" in self.headers.get("Cookie", ""):
+                self.send_response(200)
+            else:
+                self.send_response(403)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path != "/page.html":
+            return super(PageHttpRequestHandler, self).do_GET()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+class MessageConnection (object):
+    """Worker connection storing the sent messages."""
+
+    def __init__ (self):
+        self.messages = []
+
+    def send (self, msg):
+        self.messages.append(msg)
+
+    def close (self):
+        pass
+
+    def get_urls (self):
+        """Get the URLs of the sent messages."""
+        return [msg[2]["base_url"] for msg in self.messages
+                if msg[0] == "url"]
+
+
+class TestCoordinator (unittest.TestCase):
+    """Test handing out URLs to workers."""
+
+    def setUp (self):
+        self.aggregate = get_test_aggregate(dict(workers=2), {'expected': []})
+        self.coordinator = distributed.Coordinator(self.aggregate)
+        self.workers = [distributed.Worker(MessageConnection(), 2)
+                        for dummy in range(2)]
+        self.coordinator.workers.extend(self.workers)
+
+    def tearDown (self):
+        self.coordinator.listener.close()
+
+    def hand_out (self, *urls):
+        for url in urls:
+            url_data = get_url_from(url, 0, self.aggregate)
+            self.coordinator.hand_out(url_data)
+
+    def test_host_affinity (self):
+        self.hand_out(u"http://a.example/1", u"http://a.example/2",
+                      u"http://b.example/1")
+        # all URLs of one host go to the same worker, new hosts
+        # to the worker with the least handed out URLs
+        self.assertEqual(self.workers[0].conn.get_urls(),
+                         [u"http://a.example/1", u"http://a.example/2"])
+        self.assertEqual(self.workers[1].conn.get_urls(),
+                         [u"http://b.example/1"])
+        # a new host goes to the worker with less handed out URLs
+        self.hand_out(u"http://a.example/3", u"http://a.example/4",
+                      u"http://c.example/1")
+        self.assertEqual(len(self.workers[0].urls), 4)
+        self.assertEqual(self.workers[1].conn.get_urls(),
+                         [u"http://b.example/1", u"http://c.example/1"])
+
+    def test_remove_worker (self):
+        self.hand_out(u"http://a.example/1", u"http://a.example/2",
+                      u"http://b.example/1")
+        self.coordinator.remove_worker(self.workers[0])
+        self.assertFalse(self.workers[0].alive)
+        self.assertEqual(self.workers[0].urls, {})
+        # the unfinished URLs are handed out to the remaining worker
+        self.assertEqual(sorted(self.workers[1].conn.get_urls()),
+                         [u"http://a.example/1", u"http://a.example/2",
+                          u"http://b.example/1"])
+        self.assertEqual(len(self.workers[1].urls), 3)
+        # and new URLs of the host go there as well
+        self.hand_out(u"http://a.example/3")
+        self.assertEqual(self.workers[1].conn.get_urls()[-1],
+                         u"http://a.example/3")
+
+    def test_busy_worker (self):
+        urls = [u"http://a.example/%d" % i for i in range(5)]
+        self.hand_out(*urls)
+        # a busy worker does not hold up the URLs of other workers
+        self.hand_out(u"http://b.example/1")
+        self.assertEqual(self.workers[0].conn.get_urls(), urls[:4])
+        self.assertEqual([url_data.url for url_data in
+                          self.workers[0].pending], urls[4:])
+        self.assertEqual(self.workers[1].conn.get_urls(),
+                         [u"http://b.example/1"])
+        # the pending URL is sent when the worker has a free slot
+        with self.coordinator.lock:
+            self.workers[0].urls.popitem()
+            self.coordinator.send_pending(self.workers[0])
+        self.assertEqual(self.workers[0].conn.get_urls(), urls)
+
+    def test_connect_timeout (self):
+        coordinator = distributed.Coordinator(self.aggregate)
+        self.addCleanup(coordinator.listener.close)
+        urlqueue = self.aggregate.urlqueue
+        urlqueue.put(get_url_from(u"http://a.example/", 0, self.aggregate))
+        coordinator.hand_out(urlqueue.get())
+        self.assertEqual(len(coordinator.unassigned), 1)
+        self.assertFalse(coordinator.connect_timed_out())
+        coordinator.no_worker_since -= distributed.WORKER_CONNECT_TIMEOUT
+        self.assertTrue(coordinator.connect_timed_out())
+        self.assertEqual(coordinator.unassigned, [])
+        self.assertEqual(urlqueue.unfinished_tasks, 0)
+        stats = self.aggregate.logger.loggers[0].stats
+        self.assertEqual(stats.internal_errors, 1)
+
+
+class TestDistributed (HttpServerTest):
+    """Test checking URLs with worker processes."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestDistributed, self).__init__(methodName=methodName)
+        self.handler = PageHttpRequestHandler
+
+    def test_workers (self):
+        url = u"http://localhost:%d/page.html" % self.port
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"valid",
+            u"url /status/200",
+            u"cache key http://localhost:%d/status/200" % self.port,
+            u"real url http://localhost:%d/status/200" % self.port,
+            u"name a",
+            u"valid",
+            u"url /status/404",
+            u"cache key http://localhost:%d/status/404" % self.port,
+            u"real url http://localhost:%d/status/404" % self.port,
+            u"name b",
+            u"error",
+        ]
+        self.direct(url, resultlines, recursionlevel=1,
+                    confargs=dict(workers=2, threads=2))
+
+    def test_login_cookies (self):
+        # the workers send the cookies of the coordinator login
+        url = u"http://localhost:%d/private.html" % self.port
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"valid",
+        ]
+        aggregate = get_test_aggregate(dict(workers=1, threads=1),
+                                       {'expected': resultlines})
+        aggregate.cookies = requests.cookies.RequestsCookieJar()
+        aggregate.cookies.set("login", "1")
+        aggregate.urlqueue.put(get_url_from(url, 0, aggregate))
+        linkcheck.director.check_urls(aggregate)
+        diff = aggregate.config['logger'].diff
+        self.assertFalse(diff, u"\n".join(diff))
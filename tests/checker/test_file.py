@@ -23,6 +23,7 @@ import zipfile
 
 import pytest
 
+from linkcheck.checker import urlbase
 from tests import need_word, need_pdflib
 from . import LinkCheckTest, get_file
 
@@ -148,6 +149,10 @@ class TestFile (LinkCheckTest):
         self.direct(url, resultlines)
 
     def test_good_dir_space (self):
+        self._test_good_dir_space()
+
+    def _test_good_dir_space (self, confargs=None):
+        """Check the directory with a space in its name."""
         url = u"file://%(curdir)s/%(datadir)s/a b/" % self.get_attrs()
         nurl = self.norm(url)
         url2 = u"file://%(curdir)s/%(datadir)s/a b/el.html" % self.get_attrs()
@@ -170,4 +175,22 @@ class TestFile (LinkCheckTest):
             u"name t.txt",
             u"valid",
         ]
-        self.direct(url, resultlines, recursionlevel=2)
+        self.direct(url, resultlines, recursionlevel=2, confargs=confargs)
+
+    def test_duplicates (self):
+        # duplicate links of a page are not built again
+        calls = []
+        get_url_from = urlbase.get_url_from
+        def count_get_url_from (*args, **kwargs):
+            calls.append(args[0])
+            return get_url_from(*args, **kwargs)
+        urlbase.get_url_from = count_get_url_from
+        try:
+            self.file_test("duplicates.html")
+        finally:
+            urlbase.get_url_from = get_url_from
+        self.assertEqual(calls, [u"file.txt", u"./file.txt", u"file.txt#x"])
+
+    def test_queue_window (self):
+        # queued URLs are rebuilt from records and a temporary file
+        self._test_good_dir_space(confargs=dict(queuewindow=1))
@@ -0,0 +1,103 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test HEAD requests for http URLs.
+"""
+from linkcheck.checker import get_url_from
+import linkcheck.director
+from . import get_test_aggregate
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+
+class HeadHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler recording request methods except for robots.txt,
+    answering HEAD requests with 405 for paths containing "nohead"."""
+
+    methods = []
+
+    def do_GET (self):
+        if not self.path.startswith("/robots.txt"):
+            self.methods.append("GET")
+        super(HeadHttpRequestHandler, self).do_GET()
+
+    def do_HEAD (self):
+        self.methods.append("HEAD")
+        if "nohead" in self.path:
+            self.send_response(405)
+            self.end_headers()
+        else:
+            super(HeadHttpRequestHandler, self).do_HEAD()
+
+
+class TestHttpHead (HttpServerTest):
+    """Test HEAD requests for URLs whose content is not needed."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestHttpHead, self).__init__(methodName=methodName)
+        self.handler = HeadHttpRequestHandler
+
+    def setUp (self):
+        super(TestHttpHead, self).setUp()
+        del self.handler.methods[:]
+
+    def head_test (self, path, confargs):
+        url = u"http://localhost:%d/%s" % (self.port, path)
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"valid",
+        ]
+        self.direct(url, resultlines, confargs=confargs)
+
+    def test_get (self):
+        self.head_test(u"status/200", {})
+        self.assertEqual(self.handler.methods, ["GET"])
+
+    def test_head (self):
+        self.head_test(u"status/200", dict(headrequests=True))
+        self.assertEqual(self.handler.methods, ["HEAD"])
+
+    def test_head_not_allowed (self):
+        self.head_test(u"nohead/status/200", dict(headrequests=True))
+        self.assertEqual(self.handler.methods, ["HEAD", "GET"])
+
+    def test_head_content_plugins (self):
+        confargs = dict(headrequests=True, enabledplugins=["AnchorCheck"])
+        self.head_test(u"status/200", confargs)
+        self.assertEqual(self.handler.methods, ["GET"])
+
+    def test_head_error (self):
+        url = u"http://localhost:%d/status/404" % self.port
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"error",
+        ]
+        self.direct(url, resultlines, confargs=dict(headrequests=True))
+        # the error is confirmed with GET
+        self.assertEqual(self.handler.methods, ["HEAD", "GET"])
+
+    def test_head_host_fallback (self):
+        confargs = dict(headrequests=True, recursionlevel=0)
+        aggregate = get_test_aggregate(confargs, {'expected': []})
+        for path in (u"nohead/status/200", u"status/200"):
+            url = u"http://localhost:%d/%s" % (self.port, path)
+            aggregate.urlqueue.put(get_url_from(url, 0, aggregate))
+        linkcheck.director.check_urls(aggregate)
+        self.assertEqual(self.handler.methods, ["HEAD", "GET", "GET"])
@@ -0,0 +1,132 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test parsing HTML content while it is downloaded.
+"""
+import time
+from linkcheck.checker import get_url_from
+from linkcheck.plugins import _ContentPlugin
+import linkcheck.director
+from . import get_test_aggregate
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+# number of links on the page
+NumLinks = 4
+
+
+class StreamHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler serving the page /page.html with links to status URLs,
+    spanning several download chunks. The page /chunked.html is sent
+    without a content length, and the download of /broken.html times out
+    before its end."""
+
+    body = b"<html><body>\n" + b"".join(
+        b'<p>%s</p><a href="/status/200?n=%d">link %d</a>\n'
+        % (b"x" * 8000, i, i) for i in range(NumLinks))
+
+    def do_GET (self):
+        if self.path not in ("/page.html", "/chunked.html", "/broken.html"):
+            return super(StreamHttpRequestHandler, self).do_GET()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        if self.path == "/page.html":
+            self.send_header("Content-Length", str(len(self.body)))
+        elif self.path == "/broken.html":
+            self.send_header("Content-Length", str(len(self.body) + 100))
+        self.end_headers()
+        self.wfile.write(self.body)
+        if self.path == "/broken.html":
+            self.wfile.flush()
+            time.sleep(2)
+
+
+class InvalidContentCheck (_ContentPlugin):
+    """Content plugin reading the content and marking all URLs
+    invalid."""
+
+    def applies_to (self, url_data):
+        return True
+
+    def check (self, url_data):
+        url_data.get_content()
+        url_data.set_result(u"invalid content", valid=False)
+
+
+class TestHttpStream (HttpServerTest):
+    """Test parsing HTML content while it is downloaded."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestHttpStream, self).__init__(methodName=methodName)
+        self.handler = StreamHttpRequestHandler
+
+    def stream_test (self, page):
+        url = u"http://localhost:%d/%s" % (self.port, page)
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"valid",
+        ]
+        for i in range(NumLinks):
+            link = u"/status/200?n=%d" % i
+            resultlines.extend([
+                u"url %s" % link,
+                u"cache key http://localhost:%d%s" % (self.port, link),
+                u"real url http://localhost:%d%s" % (self.port, link),
+                u"name link %d" % i,
+                u"valid",
+            ])
+        self.direct(url, resultlines, recursionlevel=1)
+
+    def test_stream (self):
+        self.stream_test(u"page.html")
+
+    def test_chunked (self):
+        self.stream_test(u"chunked.html")
+
+    def test_broken_download (self):
+        # the links of a failed download are not checked
+        url = u"http://localhost:%d/broken.html" % self.port
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"warning could not get content: ConnectionError:"
+            u" SharedHTTPConnectionPool(host='localhost', port=%d):"
+            u" Read timed out." % self.port,
+            u"valid",
+        ]
+        self.direct(url, resultlines, recursionlevel=1,
+                    confargs=dict(timeout=1))
+
+    def test_invalid_content (self):
+        # a content plugin marking the page invalid stops recursion
+        # into the links found during the download
+        url = u"http://localhost:%d/page.html" % self.port
+        resultlines = [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            u"error",
+        ]
+        aggregate = get_test_aggregate({}, {'expected': resultlines})
+        aggregate.plugin_manager.content_plugins.append(
+            InvalidContentCheck({}))
+        aggregate.urlqueue.put(get_url_from(url, 0, aggregate))
+        linkcheck.director.check_urls(aggregate)
+        diff = aggregate.config['logger'].diff
+        self.assertFalse(diff, u"\n".join(diff))
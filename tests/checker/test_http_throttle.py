@@ -0,0 +1,70 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test adaptive throttling of http URLs.
+"""
+from .httpserver import HttpServerTest, NoQueryHttpRequestHandler
+
+
+class BusyHttpRequestHandler (NoQueryHttpRequestHandler):
+    """Handler answering every other request with 429 Too Many Requests."""
+
+    requests = 0
+
+    def do_GET (self):
+        if self.path.startswith("/robots.txt"):
+            return super(BusyHttpRequestHandler, self).do_GET()
+        BusyHttpRequestHandler.requests += 1
+        if BusyHttpRequestHandler.requests % 2:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+        else:
+            super(BusyHttpRequestHandler, self).do_GET()
+
+
+class TestHttpThrottle (HttpServerTest):
+    """Test requests to overloaded hosts."""
+
+    def __init__ (self, methodName='runTest'):
+        super(TestHttpThrottle, self).__init__(methodName=methodName)
+        self.handler = BusyHttpRequestHandler
+
+    def setUp (self):
+        super(TestHttpThrottle, self).setUp()
+        BusyHttpRequestHandler.requests = 0
+
+    def get_resultlines (self, url, result):
+        return [
+            u"url %s" % url,
+            u"cache key %s" % url,
+            u"real url %s" % url,
+            result,
+        ]
+
+    def test_overloaded (self):
+        url = u"http://localhost:%d/status/200" % self.port
+        resultlines = self.get_resultlines(url, u"error")
+        self.direct(url, resultlines, recursionlevel=0)
+        self.assertEqual(BusyHttpRequestHandler.requests, 1)
+
+    def test_adaptive_throttling (self):
+        url = u"http://localhost:%d/status/200" % self.port
+        resultlines = self.get_resultlines(url, u"valid")
+        confargs = dict(adaptivethrottling=True)
+        self.direct(url, resultlines, recursionlevel=0, confargs=confargs)
+        self.assertEqual(BusyHttpRequestHandler.requests, 2)
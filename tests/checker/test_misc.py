@@ -17,8 +17,9 @@
 """
 Test miscellaneous html tag parsing and URL types
 """
+from linkcheck.checker import get_url_from
 from tests import need_network
-from . import LinkCheckTest
+from . import LinkCheckTest, get_test_aggregate
 
 
 class TestMisc (LinkCheckTest):
@@ -54,3 +55,40 @@ class TestMisc (LinkCheckTest):
             u"valid",
         ]
         self.direct(url, resultlines, recursionlevel=1)
+
+    def test_link_key (self):
+        aggregate = get_test_aggregate({}, {'expected': []})
+        def get_key (parent_url, url, base=None):
+            url_data = get_url_from(parent_url, 0, aggregate)
+            return url_data.get_link_key(url, base)
+        page1 = u"http://example.org/a/b.html"
+        page2 = u"http://example.org/a/c.html?x=1"
+        page3 = u"http://example.org/d/"
+        # relative links depend on the directory
+        self.assertEqual(get_key(page1, u"e.html"), get_key(page2, u"e.html"))
+        self.assertNotEqual(get_key(page1, u"e.html"),
+                            get_key(page3, u"e.html"))
+        # absolute links depend on the host
+        self.assertEqual(get_key(page1, u"/e.html"), get_key(page3, u"/e.html"))
+        self.assertNotEqual(get_key(page1, u"/e.html"),
+                            get_key(u"http://example.com/", u"/e.html"))
+        # links with scheme and host depend on nothing
+        self.assertEqual(get_key(page1, u"https://example.net/"),
+                         get_key(u"http://example.com/",
+                                 u"https://example.net/"))
+        # query links and links with a base depend on the whole page URL
+        self.assertNotEqual(get_key(page1, u"?y=2"), get_key(page2, u"?y=2"))
+        self.assertNotEqual(get_key(page1, u"e.html", base=u"f/"),
+                            get_key(page2, u"e.html", base=u"f/"))
+
+    def test_urlnorm_cache (self):
+        aggregate = get_test_aggregate({}, {'expected': []})
+        cache = aggregate.urlnorm_cache
+        for parent_url in (u"http://example.org/a/b.html",
+                           u"http://example.org/a/c.html"):
+            url_data = get_url_from(u"d e.html", 1, aggregate,
+                                    parent_url=parent_url)
+            self.assertEqual(url_data.url, u"http://example.org/a/d%20e.html")
+        # the second link was normed from the cache, and only joined
+        # with the other page URL
+        self.assertEqual(cache.get_stats(), dict(hits=1, misses=3))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2004-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test parsing of file content in parser processes.
+"""
+from tests import need_pdflib
+from . import LinkCheckTest
+
+
+class TestParserPool (LinkCheckTest):
+    """
+    Test file content parsing with a pool of parser processes.
+    """
+
+    def pool_test (self, filename, **confargs):
+        confargs["parseprocesses"] = 2
+        self.file_test(filename, confargs=confargs)
+
+    def test_html (self):
+        self.pool_test("file.html")
+
+    def test_wml (self):
+        self.pool_test("file.wml")
+
+    def test_text (self):
+        self.pool_test("file.txt")
+
+    def test_css (self):
+        self.pool_test("file.css")
+
+    @need_pdflib
+    def test_pdf (self):
+        self.pool_test("file.pdf", enabledplugins=["PdfParser"])
+
+    def test_markdown (self):
+        self.pool_test("file.markdown", enabledplugins=["MarkdownCheck"])
@@ -0,0 +1,71 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2010-2014 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test charset detection.
+"""
+
+import unittest
+import codecs
+import linkcheck.charsetutil
+
+
+class TestCharsetutil (unittest.TestCase):
+    """Test charset detection of content data."""
+
+    def decode_test (self, data, text_expected, encoding_expected,
+                     charset=None):
+        text, encoding = linkcheck.charsetutil.decode(data, charset=charset)
+        self.assertEqual(text, text_expected)
+        self.assertEqual(encoding, encoding_expected)
+
+    def test_charset (self):
+        data = b'<meta charset="utf-8">\xe9'
+        self.decode_test(data, u'<meta charset="utf-8">\xe9', "iso-8859-1",
+                         charset="ISO-8859-1")
+        self.decode_test(b"abc", u"abc", "ascii", charset="nonexistent")
+
+    def test_bom (self):
+        self.decode_test(codecs.BOM_UTF8 + b"caf\xc3\xa9", u"caf\xe9", "utf-8")
+        data = codecs.BOM_UTF16_LE + u"caf\xe9".encode("utf-16-le")
+        self.decode_test(data, u"caf\xe9", "utf-16-le")
+
+    def test_meta (self):
+        data = b'<meta charset="koi8-r">\xc1'
+        self.decode_test(data, u'<meta charset="koi8-r">\u0430', "koi8-r")
+        data = (b'<meta http-equiv="Content-Type" '
+                b'content="text/html; charset=ISO-8859-15">\xa4')
+        self.decode_test(data, data[:-1].decode("ascii") + u"\u20ac",
+                         "iso-8859-15")
+        data = b'<meta charset="utf-16">abc'
+        self.decode_test(data, data.decode("ascii"), "utf-8")
+
+    def test_meta_late (self):
+        # declarations after the sniffed content start are not used
+        data = b" " * linkcheck.charsetutil.MaxSniffBytes + \
+            b'<meta charset="koi8-r">'
+        self.decode_test(data, data.decode("ascii"), "ascii")
+
+    def test_xml (self):
+        data = b'<?xml version="1.0" encoding="ISO-8859-1"?><a>\xe9</a>'
+        self.decode_test(data, data.decode("latin-1"), "iso-8859-1")
+
+    def test_heuristic (self):
+        self.decode_test(b"", u"", "ascii")
+        self.decode_test(b"abc", u"abc", "ascii")
+        self.decode_test(b"caf\xc3\xa9", u"caf\xe9", "utf-8")
+        text, encoding = linkcheck.charsetutil.decode(b"caf\xe9 au lait")
+        self.assertEqual(text, u"caf\xe9 au lait")
@@ -0,0 +1,100 @@
+# -*- coding: iso-8859-1 -*-
+# Copyright (C) 2019 Bastian Kleineidam
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+Test matching of extern and intern link patterns.
+"""
+
+import unittest
+from linkcheck import get_link_pat
+from linkcheck.linkmatch import LinkMatcher, get_literal_prefix
+
+
+def naive_match (entries, url):
+    """Match URL against each pattern entry in turn."""
+    for entry in entries:
+        match = entry['pattern'].search(url)
+        if (entry['negate'] and not match) or \
+           (match and not entry['negate']):
+            return entry['strict']
+    return None
+
+
+class TestLinkMatch (unittest.TestCase):
+    """
+    Test the compiled link pattern matcher.
+    """
+
+    urls = [
+        u"http://www.example.com/",
+        u"http://www.example.com/a/b.html",
+        u"https://www.example.org/x",
+        u"ftp://ftp.example.net/pub/",
+        u"mailto:calvin@example.com",
+        u"http://host.example.com/images/logo.png",
+        u"file:///tmp/x",
+        u"http://www.example.de/\xe4",
+    ]
+
+    def check (self, patterns):
+        entries = [get_link_pat(pattern, strict) for pattern, strict
+                   in patterns]
+        matcher = LinkMatcher(entries)
+        self.assertEqual(matcher.size, len(entries))
+        for url in self.urls:
+            self.assertEqual(matcher.match(url), naive_match(entries, url),
+                             url)
+
+    def test_literal_prefix (self):
+        p = get_literal_prefix
+        self.assertEqual(p(u"^http://www\\.example\\.com/"),
+                         "http://www.example.com/")
+        self.assertEqual(p(u"^mailto:"), "mailto:")
+        self.assertEqual(p(u"http://"), None)
+        self.assertEqual(p(u"^http://www.example.com/"), None)
+        self.assertEqual(p(u"^https?://"), None)
+        self.assertEqual(p(u"^http\\d"), None)
+        self.assertEqual(p(u"^"), None)
+        self.assertEqual(p(u"^\xe4"), None)
+
+    def test_empty (self):
+        self.check([])
+
+    def test_prefixes (self):
+        self.check([(u"^http://www\\.example\\.com/", False),
+                    (u"^mailto:", False)])
+
+    def test_regexes (self):
+        self.check([(u"example\\.(org|net)", True), (u"\\.png$", True),
+                    (u"^https?://host", True), (u"(?i)FILE:", True)])
+
+    def test_negate (self):
+        self.check([(u"^mailto:", True), (u"!^http", True),
+                    (u"\\.png$", False)])
+        self.check([(u"!example", False), (u"^file:", True)])
+
+    def test_order (self):
+        # the first matching pattern determines the strict flag
+        self.check([(u"^http://www\\.example\\.com/", True),
+                    (u"example", False), (u"^http://www", True)])
+        self.check([(u"\\.png$", False), (u"^http://host", True)])
+
+    def test_many (self):
+        patterns = [(u"^http://host%d\\.example\\.com/" % i, i % 3 == 0)
+                    for i in range(200)]
+        patterns.extend((u"/path%d/.*\\.html$" % i, False) for i in range(200))
+        patterns.append((u"example\\.(org|net)", True))
+        self.check(patterns)
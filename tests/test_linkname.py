@@ -61,3 +61,5 @@ class TestLinkname (unittest.TestCase):
         self.href_name_test('"</a>"foo', '"')
         self.href_name_test("<img src='' alt=''></a>", '')
         self.href_name_test("<img src alt=abc></a>", 'abc')
+        self.href_name_test("a &amp; b</a>", 'a & b')
+        self.href_name_test("a & b</a>", 'a & b')
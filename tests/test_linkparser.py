@@ -18,9 +18,15 @@
 Test linkparser routines.
 """
 
+import threading
+import timeit
 import unittest
+from linkcheck import log, LOG_CHECK
 from linkcheck.htmlutil import linkparse
 import linkcheck.HtmlParser.htmlsax
+from linkcheck.parser import LinkStream, find_links, get_parse_end, \
+    get_scan_start, parse_html, scan_html
+from linkcheck.plugins.anchorcheck import AnchorCheck, AnchorFinder
 
 
 class TestLinkparser (unittest.TestCase):
@@ -129,3 +135,320 @@ class TestLinkparser (unittest.TestCase):
         url = u'http://example.com/bla/a=b'
         content = u'<a href="%s&quot;">'
         self._test_one_link(content % url, url + u'"')
+
+    def test_link_names (self):
+        content = (b'<a href="a.html">A &amp; B</a>'
+                   b'<a href="c.html" title="C"><img src="d.png" alt="D"></a>'
+                   b'<img src="e.png" title="E">')
+        urls = _parse_document(content)
+        self.assertEqual([x[3] for x in urls], [u"A & B", u"D", u"D", u"E"])
+        # without link names the same links are found
+        urls_nonames = _parse_document(content, link_names=False)
+        self.assertEqual([x[3] for x in urls_nonames], [u""] * 4)
+        self.assertEqual([x[:3] for x in urls_nonames],
+                         [x[:3] for x in urls])
+
+
+def _make_document (num):
+    """Return a HTML document with a number of links depending on num."""
+    links = u"".join(u'<a href="link%d-%d">name %d</a>\n<img src="img%d">\n'
+                     % (num, i, i, i) for i in range(num % 50 + 10))
+    return (u"<html><head><title>%d</title></head><body>\n%s</body></html>"
+            % (num, links)).encode("ascii")
+
+
+def _parse_document (content, link_names=True):
+    """Parse content and return the list of found links."""
+    urls = []
+    def callback (url, line, column, name, base):
+        urls.append((url, line, column, name, base))
+    h = linkparse.LinkFinder(callback, linkparse.LinkTags,
+                             link_names=link_names)
+    p = linkcheck.HtmlParser.htmlsax.parser(h)
+    h.parser = p
+    # feed in small chunks to exercise the scanner buffer handling
+    for i in range(0, len(content), 97):
+        p.feed(content[i:i+97])
+    p.flush()
+    h.parser = None
+    p.handler = None
+    return urls
+
+
+class TestLinkparserThreads (unittest.TestCase):
+    """
+    Test parallel link parsing in several threads.
+    """
+
+    def test_parallel_parsing (self):
+        documents = [_make_document(i) for i in range(40)]
+        expected = [_parse_document(doc) for doc in documents]
+        errors = []
+        def run (offset):
+            try:
+                for i in range(len(documents)):
+                    num = (i + offset) % len(documents)
+                    urls = _parse_document(documents[num])
+                    if urls != expected[num]:
+                        errors.append("document %d: %r" % (num, urls))
+            except Exception as msg:
+                errors.append(msg)
+        threads = [threading.Thread(target=run, args=(i * 7,))
+                   for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    def test_shared_parser (self):
+        # a parser object used while it is already parsing raises an error
+        errors = []
+        class Handler (object):
+            def start_element (self, tag, attrs):
+                try:
+                    p.feed(b"<b>")
+                except RuntimeError as msg:
+                    errors.append(msg)
+        p = linkcheck.HtmlParser.htmlsax.parser(Handler())
+        p.feed(b"<a href='x'>")
+        p.flush()
+        self.assertEqual(len(errors), 1)
+
+
+class TestLinkparserSpeed (unittest.TestCase):
+    """
+    Microbenchmark of the link parser compared to a parser run that
+    only calls an empty handler.
+    """
+
+    # allowed ratio of the link parser and empty handler run times
+    max_slowdown = 3.0
+
+    def setUp (self):
+        self.content = b"".join(_make_document(num) for num in range(40, 50))
+
+    def parse (self, handler):
+        p = linkcheck.HtmlParser.htmlsax.parser(handler)
+        handler.parser = p
+        p.feed(self.content)
+        p.flush()
+        handler.parser = None
+        p.handler = None
+
+    def best_times (self, *handler_factories):
+        """Return the best time of several parser runs for each handler
+        factory. The runs alternate between the factories so that
+        load changes of the machine affect all of them alike."""
+        times = [[] for dummy in handler_factories]
+        for dummy in range(7):
+            for factory, factory_times in zip(handler_factories, times):
+                factory_times.append(timeit.timeit(
+                    lambda: self.parse(factory()), number=2))
+        return [min(factory_times) for factory_times in times]
+
+    def test_no_debug_calls (self):
+        if log.is_debug(LOG_CHECK):
+            self.skipTest("debug logging is enabled")
+        calls = []
+        debug = log.debug
+        def count_debug (*args, **kwargs):
+            calls.append(args)
+        log.debug = count_debug
+        try:
+            self.parse(linkparse.LinkFinder(lambda *args, **kwargs: None,
+                                            linkparse.LinkTags))
+        finally:
+            log.debug = debug
+        self.assertEqual(calls, [])
+
+    def test_parse_speed (self):
+        if log.is_debug(LOG_CHECK):
+            self.skipTest("debug logging is enabled")
+        def callback (url, line, column, name, base):
+            pass
+        empty_time, link_time = self.best_times(linkparse.TagFinder,
+            lambda: linkparse.LinkFinder(callback, linkparse.LinkTags))
+        self.assertTrue(link_time < self.max_slowdown * empty_time,
+                        "link parsing %.4fs, empty handler %.4fs" %
+                        (link_time, empty_time))
+
+
+class TestLinkStream (unittest.TestCase):
+    """
+    Test parsing HTML content while it is downloaded.
+    """
+
+    def stream_links (self, content, chunk_size, hold_links=False):
+        """Parse content in chunks with a link stream and return the
+        queued links, the links queued after the download and the
+        link stream."""
+        url_data = StreamUrlData()
+        stream = LinkStream(url_data, hold_links)
+        url_data.link_stream = stream
+        for i in range(0, len(content), chunk_size):
+            stream.feed(content[i:i + chunk_size])
+            # links of a download that could still fail are held
+            self.assertEqual(url_data.urls, [])
+        stream.finish()
+        finished = list(url_data.urls)
+        parse_html(url_data)
+        return url_data.urls, finished, stream
+
+    def test_link_stream (self):
+        content = (b'<html><head><base href="http://example.org/">'
+                   b'<link rel="stylesheet" href="a.css"></head>\n<body>'
+                   b'<a href="b.html">B <b>bold</b></a>\n'
+                   b'<a href="c.html" title="C"><img src="c.png" alt="ALT">'
+                   b'</A >\n<a href="d.html">D &amp; E</a>'
+                   b'<p style="background: url(e.png)">F</p>\n'
+                   b'<a href="g.html">G</a></body></html>')
+        url_data = StreamUrlData()
+        url_data.content = content
+        find_links(url_data, url_data.add_url, linkparse.LinkTags)
+        expected = url_data.urls
+        self.assertEqual(len(expected), 7)
+        for chunk_size in (1, 2, 5, 16, 100, len(content)):
+            urls, finished, stream = self.stream_links(content, chunk_size)
+            self.assertEqual(urls, expected, chunk_size)
+            self.assertEqual(stream.size, len(content))
+            # the links are queued when the download has finished
+            self.assertEqual(finished, expected, chunk_size)
+            urls, finished, stream = self.stream_links(content, chunk_size,
+                                                       hold_links=True)
+            self.assertEqual(urls, expected, chunk_size)
+            self.assertEqual(finished, [])
+
+    def test_link_stream_nofollow (self):
+        content = (b'<html><head><link rel="stylesheet" href="a.css">'
+                   b'<meta name="robots" content="noindex,nofollow">'
+                   b'</head><body><a href="b.html">B</a></body></html>')
+        for chunk_size in (1, 7, len(content)):
+            urls, finished, stream = self.stream_links(content, chunk_size)
+            self.assertEqual(urls, [])
+            self.assertFalse(stream.follow)
+
+    def test_scan_html (self):
+        content = (b'<html><head><title>T</title></head><body id="top">'
+                   b'<a name="a1" href="b.html">B</a>\n'
+                   b'<p id="p1">P <img src="c.png" id="i1"></p>'
+                   b'<a name="a2">A2</a></body></html>')
+        url_data = StreamUrlData()
+        url_data.content = content
+        find_links(url_data, url_data.add_url, linkparse.LinkTags)
+        links = url_data.urls
+        url_data.urls = []
+        find_links(url_data, url_data.add_url, linkparse.AnchorTags)
+        anchors = set(x[0] for x in url_data.urls)
+        url_data.urls = []
+        stream = scan_html(url_data)
+        self.assertTrue(stream is scan_html(url_data))
+        self.assertTrue(stream.follow)
+        handler = stream.get_handler(AnchorCheck({}))
+        self.assertFalse(handler.found)
+        self.assertEqual(handler.anchors, anchors)
+        self.assertEqual(url_data.urls, [])
+        parse_html(url_data)
+        self.assertEqual(url_data.urls, links)
+
+    def test_scan_html_nofollow (self):
+        content = (b'<html><head><meta name="robots" content="nofollow">'
+                   b'</head><body><a name="a1" href="b.html">B</a>'
+                   b'</body></html>')
+        url_data = StreamUrlData()
+        url_data.content = content
+        stream = scan_html(url_data)
+        self.assertFalse(stream.follow)
+        # the anchors are searched without the links
+        anchors = stream.get_handler(AnchorCheck({})).anchors
+        self.assertEqual(anchors, set([u"a1"]))
+        self.assertEqual(stream.links, [])
+
+    def test_tag_dispatcher (self):
+        robots = linkparse.MetaRobotsFinder()
+        anchors = AnchorFinder(u"y", None)
+        handler = linkparse.TagDispatcher([robots, anchors])
+        p = linkcheck.HtmlParser.htmlsax.parser(handler)
+        handler.parser = p
+        self.assertTrue(anchors.parser is p)
+        p.feed(b'<html><body><a name="x">X</a>')
+        # the robots finder stops at the body tag
+        self.assertFalse(handler.handles(robots))
+        self.assertTrue(robots.parser is None)
+        self.assertTrue(handler.handles(anchors))
+        self.assertEqual(anchors.anchors, set([u"x"]))
+        # the anchor finder stops at the searched anchor, and then
+        # no handler is left
+        self.assertRaises(linkparse.StopParse, p.feed,
+                          b'<p id="y">Y</p><p id="z">Z</p>')
+        self.assertTrue(anchors.found)
+        self.assertEqual(anchors.anchors, set([u"x", u"y"]))
+        self.assertFalse(handler.handles(anchors))
+
+    def test_parse_end (self):
+        self.assertEqual(get_parse_end(b"<a href='x'>x"), 0)
+        self.assertEqual(get_parse_end(b"<a href='x'>x</a>"), 0)
+        self.assertEqual(get_parse_end(b"<a href='x'>x</a><"), 18)
+        self.assertEqual(get_parse_end(b"x</A ><a>y</a"), 7)
+        self.assertEqual(get_parse_end(b"x</a>y</b>z</abbr>"), 6)
+
+    def test_scan_start (self):
+        self.assertEqual(get_scan_start(b"x</b>y", 0), 6)
+        self.assertEqual(get_scan_start(b"x<", 0), 1)
+        self.assertEqual(get_scan_start(b"x</A  ", 0), 1)
+        self.assertEqual(get_scan_start(b"x</a>", 0), 1)
+        self.assertEqual(get_scan_start(b"x</ab", 0), 5)
+        self.assertEqual(get_scan_start(b"x</a>y<", 6), 6)
+
+    def test_link_stream_tail (self):
+        # content without </a> end tags is neither joined nor searched
+        # again for each chunk
+        url_data = StreamUrlData()
+        stream = LinkStream(url_data, False)
+        chunk = b"<p>" + b"x" * 100 + b"</p></"
+        for dummy in range(10):
+            stream.feed(chunk)
+        self.assertEqual(len(stream.tail), 10)
+        self.assertEqual(stream.scan_data, b"</")
+        stream.feed(b"a><a href='y'>y</a>")
+        # the parser gets one byte more than the </a> end tag
+        self.assertEqual(stream.tail, [b"a href='y'>y</a>"])
+        self.assertEqual(stream.scan_data, b"</a>")
+
+
+class StreamPluginManager (object):
+    """Plugin manager with an enabled AnchorCheck plugin."""
+
+    def get_tag_handlers (self, url_data):
+        return {"AnchorCheck": AnchorFinder(u"missing", None)}
+
+
+class StreamAggregate (object):
+    """Aggregate with the configuration used by link streams."""
+
+    config = {"maxfilesizeparse": 1024*1024}
+    link_names = True
+    parser_pool = None
+    disk_cache = None
+    plugin_manager = StreamPluginManager()
+
+
+class StreamUrlData (object):
+    """URL data recording the added URLs."""
+
+    charset = None
+    link_stream = None
+    aggregate = StreamAggregate()
+
+    def __init__ (self):
+        self.urls = []
+
+    def get_raw_content (self):
+        self.size = len(self.content)
+        return self.content
+
+    def allows_simple_recursion (self):
+        return True
+
+    def add_url (self, url, line=0, column=0, page=0, name=u"", base=None):
+        self.urls.append((url, line, column, name, base))
@@ -301,3 +301,52 @@ class TestRobotsTxt (unittest.TestCase):
         self.rp.parse(lines)
         self.assertTrue(len(self.rp.sitemap_urls) > 0)
         self.assertTrue(self.rp.sitemap_urls[0] == ("bla", 1))
+
+    def test_longest_match (self):
+        lines = [
+            "User-agent: *",
+            "Disallow: /",
+            "Allow: /public",
+            "Disallow: /public/private",
+            "Allow: /page",
+            "Disallow: /page",
+        ]
+        self.rp.parse(lines)
+        good = ['/public', '/public/index.html', '/page.html']
+        bad = ['/', '/index.html', '/public/private/a.html']
+        self.check_urls(good, bad)
+
+    def test_wildcards (self):
+        lines = [
+            "User-agent: *",
+            "Disallow: /*.php$",
+            "Disallow: /*?session=",
+            "Disallow: /tmp*/cache",
+            "Allow: /tmp/cache/*.html$",
+            "Disallow: /exact$",
+        ]
+        self.rp.parse(lines)
+        lines[2] = "Disallow: /*%3Fsession%3D"
+        self.assertEqual(str(self.rp), "\n".join(lines))
+        good = ['/index.php?a=1', '/a.php5', '/search?q=1', '/tmp/other',
+                '/tmp/cache/a.html', '/exact/a.html', '/exact?a=1']
+        bad = ['/index.php', '/a/b.php', '/search?session=1',
+               '/tmp/cache/a.png', '/tmp2/x/cache', '/exact']
+        self.check_urls(good, bad)
+
+    def test_agent_entry (self):
+        lines = [
+            "User-agent: Example",
+            "Disallow: /example",
+            "",
+            "User-agent: *",
+            "Disallow: /cgi-bin",
+        ]
+        self.rp.parse(lines)
+        entry = self.rp.get_entry("Example/1.0")
+        self.assertEqual(entry.useragents, ["Example"])
+        self.assertTrue(self.rp.get_entry("Example/1.0") is entry)
+        self.assertEqual(self.rp.get_entry("spam").useragents, ["*"])
+        # parsing more lines forgets the found entries
+        self.rp.parse(["User-agent: Other", "Disallow: /"])
+        self.assertEqual(self.rp.agent_entries, {})